@@ -1,10 +1,53 @@
 from src.image_quality.managers.analyze_image_real_time import AnalyzeImageRealTime
 from src.image_quality.managers.analyze_image_gallery import AnalyzeImageGallery
-from flask import Flask, render_template
+from src.image_quality.managers.analyze_image_batch import AnalyzeImageBatch
+from src.image_quality.managers.stream_image_real_time import StreamImageRealTime
+from src.image_quality.processors.persistence_queue import get_persistence_queue
+from src.image_quality.processors.result_cache import get_result_cache
+from src.image_quality.processors.image_store import get_image_store
+from src.image_quality.processors.result_store import FILTER_COLUMNS, get_result_store
+from src.image_quality.processors.image_processor import ImageProcessor
+from src.image_quality.processors.capabilities import capabilities
+from src.image_quality.utils.properties import ImageStoreProperties
+from src.image_quality.utils.metrics import observe_request, render_metrics, set_endpoint
+from src.image_quality.utils.logging_config import configure_logging, start_request_sampling
+from flask import Flask, Response, g, render_template, jsonify, request
+import logging
+import time
 import os
 
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__, static_folder="src/static", template_folder="src/templates")
 app.config['MAX_CONTENT_LENGTH'] = 20000 * 1024 * 1024
+
+@app.before_request
+def start_request_metrics():
+    """
+    Etiqueta las métricas de la petición con su endpoint, guarda el instante de inicio y decide
+    si se conservan sus registros de éxito.
+    """
+    configure_logging()
+    start_request_sampling()
+    set_endpoint(request.endpoint)
+    g.request_start_time = time.perf_counter()
+
+@app.after_request
+def finish_request_metrics(response):
+    """
+    Registra la duración, el tamaño y el código de estado de la petición.
+    """
+    start_time = g.get("request_start_time")
+    if start_time is not None:
+        observe_request(request.endpoint, response.status_code, time.perf_counter() - start_time, request.content_length)
+    return response
+
 @app.route("/")
 def index():
     return render_template("index.html")
@@ -25,6 +68,88 @@ def analyze_image_gallery():
     """
     return AnalyzeImageGallery.analyze_image_gallery()
 
+@app.route("/analyze_image_batch", methods=["POST"])
+def analyze_image_batch():
+    """
+    Endpoint para analizar un lote de imágenes (multipart o flujo tar).
+    Devuelve un resultado NDJSON por imagen en cuanto está listo.
+    """
+    return AnalyzeImageBatch.analyze_image_batch()
+
+@app.route("/capabilities", methods=["GET"])
+def get_capabilities():
+    """
+    Endpoint con la resolución objetivo y la calidad JPEG recomendadas para que los clientes reduzcan
+    y compriman la imagen antes de subirla.
+    """
+    return jsonify(capabilities())
+
+@app.route("/persistence_stats", methods=["GET"])
+def persistence_stats():
+    """
+    Endpoint que devuelve las métricas de contrapresión de la cola de persistencia del worker actual.
+    """
+    return jsonify(get_persistence_queue().stats())
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Endpoint con los histogramas de latencia por etapa y los contadores de errores y peticiones
+    en formato de texto de Prometheus.
+    """
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+@app.route("/cache_stats", methods=["GET"])
+def cache_stats():
+    """
+    Endpoint que devuelve los aciertos, fallos y entradas de la caché de resultados de galería.
+    """
+    result_cache = get_result_cache()
+    return jsonify(result_cache.stats() if result_cache is not None else {"enabled": False})
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    """
+    Endpoint de consultas agregadas sobre los resultados guardados: tasas de aprobados por métrica y
+    percentiles calculados en SQL. Filtros opcionales por query string: endpoint, platform, make, model,
+    since y until (epoch en segundos), group_by y percentiles (por ejemplo "50,95").
+    """
+    result_store = get_result_store()
+    if result_store is None:
+        return jsonify({"enabled": False})
+    try:
+        filters = {column: request.args.get(column) for column in FILTER_COLUMNS}
+        since = request.args.get("since", type=float)
+        until = request.args.get("until", type=float)
+        percentiles = [float(value) for value in request.args["percentiles"].split(",")] \
+            if request.args.get("percentiles") else None
+        return jsonify(result_store.stats(filters, since, until, request.args.get("group_by"), percentiles))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/image_store_stats", methods=["GET"])
+def image_store_stats():
+    """
+    Endpoint que devuelve el tamaño, los duplicados evitados y las expulsiones del almacén de imágenes.
+    """
+    if not ImageStoreProperties.enabled:
+        return jsonify({"enabled": False})
+    return jsonify(get_image_store(ImageProcessor().save_dir).stats())
+
+if Sock is not None:
+    sock = Sock(app)
+
+    @sock.route("/stream_real_time")
+    def stream_real_time(ws):
+        """
+        Sesión WebSocket persistente para la captura en tiempo real: el cliente envía fotogramas binarios
+        y recibe por la misma conexión el análisis del más reciente.
+        """
+        StreamImageRealTime.handle(ws)
+else:
+    logger.warning("flask-sock no está instalado; el endpoint /stream_real_time no estará disponible.")
+
 from flask import Flask, request, jsonify
 from PIL import Image
 from PIL.ExifTags import TAGS
@@ -0,0 +1,52 @@
+"""
+Benchmark de rendimiento del motor de análisis en procesos frente al análisis en el hilo de la petición.
+
+Lanza N hilos "cliente" que analizan fotogramas 1920x1080 en paralelo y mide fotogramas por segundo
+para el modo en línea y para el motor con distintos números de procesos.
+
+Uso: python -m benchmarks.benchmark_analysis_engine [--frames 64] [--workers 1 2 4]
+"""
+from src.image_quality.processors.analysis_engine import AnalysisEngine, analyze_frame
+from src.image_quality.processors.analyzer_registry import endpoint_analyzers
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+import functools
+import numpy as np
+import argparse
+import logging
+import time
+import os
+
+def frames_per_second(analyze: Callable, image: np.ndarray, frames: int, clients: int) -> float:
+    """
+    Mide cuántos fotogramas por segundo se analizan con el número de clientes concurrentes indicado.
+    """
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(lambda _: analyze(image), range(frames)))
+    return frames / (time.perf_counter() - start_time)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    image = np.random.default_rng(0).integers(0, 256, (1080, 1920, 3), dtype=np.uint8)
+
+    names = endpoint_analyzers("gallery")
+    clients = max(args.workers)
+    print(f"{'mode':>12} {'workers':>8} {'fps':>8}")
+    print(f"{'inline':>12} {'-':>8} {frames_per_second(analyze_frame, image, args.frames, clients):>8.1f}")
+    for workers in sorted(set(args.workers)):
+        engine = AnalysisEngine(workers=workers)
+        try:
+            engine.analyze(image, names=names)
+            fps = frames_per_second(functools.partial(engine.analyze, names=names), image, args.frames, clients)
+        finally:
+            engine.shutdown()
+        print(f"{'engine':>12} {workers:>8} {fps:>8.1f}")
+
+if __name__ == "__main__":
+    main()
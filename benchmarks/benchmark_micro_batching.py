@@ -0,0 +1,47 @@
+"""
+Benchmark del planificador de micro-lotes sobre una métrica de pyiqa (requiere pyiqa y torch instalados).
+
+Lanza N hilos "cliente" que puntúan fotogramas 1920x1080 en paralelo y mide fotogramas por segundo
+sin lotes y con distintos tamaños máximos de lote.
+
+Uso: python -m benchmarks.benchmark_micro_batching [--metric niqe] [--frames 64] [--clients 8] [--batch-sizes 1 4 8 16]
+"""
+from src.image_quality.processors.micro_batching import MicroBatcher
+from src.image_quality.utils.properties import MicroBatchingProperties
+from src.image_quality.services.pyiqa_metric import PyiqaMetric
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import argparse
+import logging
+import time
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--metric", default="niqe")
+    parser.add_argument("--frames", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--max-wait-ms", type=float, default=MicroBatchingProperties.max_wait_ms)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    MicroBatchingProperties.enabled = False
+    metric = PyiqaMetric(args.metric)
+    image = np.random.default_rng(0).integers(0, 256, (1080, 1920, 3), dtype=np.uint8)
+    tensor = metric.to_tensor(image)
+
+    print(f"{'mode':>12} {'batch':>6} {'fps':>8}")
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        list(executor.map(lambda _: metric.score_batch([tensor]), range(args.frames)))
+    print(f"{'unbatched':>12} {'-':>6} {args.frames / (time.perf_counter() - start_time):>8.1f}")
+
+    for batch_size in args.batch_sizes:
+        batcher = MicroBatcher(args.metric, metric.score_batch, max_batch_size=batch_size, max_wait_ms=args.max_wait_ms)
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as executor:
+            list(executor.map(lambda _: batcher.submit(tensor), range(args.frames)))
+        print(f"{'batched':>12} {batch_size:>6} {args.frames / (time.perf_counter() - start_time):>8.1f}")
+
+if __name__ == "__main__":
+    main()
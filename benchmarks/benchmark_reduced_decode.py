@@ -0,0 +1,109 @@
+"""
+Benchmark de la decodificación JPEG a escala reducida guiada por la cabecera.
+
+Para cada resolución compara la decodificación completa + redimensionado (comportamiento anterior)
+con la decodificación reducida (IMREAD_REDUCED_COLOR_*) + redimensionado. Cada medición de memoria
+se hace en un proceso hijo nuevo para que el pico de RSS no se contamine entre modos.
+
+Uso: python -m benchmarks.benchmark_reduced_decode [--repeats 5]
+"""
+from src.image_quality.processors.image_processor import ImageProcessor
+from typing import Dict, List, Tuple
+import multiprocessing
+import numpy as np
+import argparse
+import resource
+import logging
+import time
+import cv2
+
+RESOLUTIONS = [(1920, 1080), (3840, 2160), (4032, 3024), (8000, 6000)]
+
+def build_jpeg(width: int, height: int, seed: int = 0) -> bytes:
+    """
+    Genera un JPEG sintético reproducible con textura suficiente para no comprimirse trivialmente.
+    """
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (max(1, height // 16), max(1, width // 16), 3), dtype=np.uint8)
+    image = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 92])[1].tobytes()
+
+def decode_and_resize(processor: ImageProcessor, image_bytes: bytes, reduced: bool) -> Tuple[int, int]:
+    """
+    Decodifica y redimensiona al objetivo usando el modo indicado.
+    """
+    if reduced:
+        image, (width, height) = processor.decode_for_target(image_bytes)
+    else:
+        image = processor.read_image_from_bytes(image_bytes)
+        height, width = image.shape[:2]
+    new_width, new_height = processor.target_dimensions(width, height)
+    if image.shape[1] != new_width or image.shape[0] != new_height:
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    return image.shape[1], image.shape[0]
+
+def _measure_child(image_bytes: bytes, reduced: bool, repeats: int, connection):
+    logging.disable(logging.INFO)
+    processor = ImageProcessor()
+    baseline_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    samples = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        decode_and_resize(processor, image_bytes, reduced)
+        samples.append((time.perf_counter() - start_time) * 1000)
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    connection.send({
+        "median_ms": float(np.median(samples)),
+        "peak_rss_mb": peak_rss_kb / 1024,
+        "peak_rss_delta_mb": (peak_rss_kb - baseline_rss_kb) / 1024,
+    })
+    connection.close()
+
+def measure(image_bytes: bytes, reduced: bool, repeats: int) -> Dict[str, float]:
+    """
+    Mide la mediana de tiempo y el pico de RSS (absoluto y sobre la línea base tras importar) en un proceso hijo.
+    """
+    context = multiprocessing.get_context("spawn")
+    parent_connection, child_connection = context.Pipe(duplex=False)
+    process = context.Process(target=_measure_child, args=(image_bytes, reduced, repeats, child_connection))
+    process.start()
+    result = parent_connection.recv()
+    process.join()
+    return result
+
+def run(repeats: int, resolutions: List[Tuple[int, int]]) -> List[Dict[str, float]]:
+    """
+    Ejecuta el benchmark para cada resolución y devuelve las filas de resultados.
+    """
+    processor = ImageProcessor()
+    rows = []
+    for width, height in resolutions:
+        image_bytes = build_jpeg(width, height)
+        _, factor = processor.reduced_decode_flag(image_bytes)
+        full = measure(image_bytes, False, repeats)
+        reduced = measure(image_bytes, True, repeats)
+        rows.append({
+            "resolution": f"{width}x{height}",
+            "factor": factor,
+            "full_ms": round(full["median_ms"], 1),
+            "reduced_ms": round(reduced["median_ms"], 1),
+            "full_peak_mb": round(full["peak_rss_mb"], 1),
+            "reduced_peak_mb": round(reduced["peak_rss_mb"], 1),
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rows = run(args.repeats, RESOLUTIONS)
+
+    columns = ["resolution", "factor", "full_ms", "reduced_ms", "full_peak_mb", "reduced_peak_mb"]
+    print(" ".join(f"{column:>16}" for column in columns))
+    for row in rows:
+        print(" ".join(f"{row[column]!s:>16}" for column in columns))
+
+if __name__ == "__main__":
+    main()
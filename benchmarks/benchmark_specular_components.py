@@ -0,0 +1,97 @@
+"""
+Benchmark del filtrado de componentes conexas en SpecularReflections.
+
+Compara el bucle original (una comparación de fotograma completo por componente) con el
+filtrado vectorizado actual, variando el número de componentes en la imagen.
+
+Uso: python -m benchmarks.benchmark_specular_components [--width 1920] [--height 1080] [--repeats 5]
+"""
+from src.image_quality.services.specular_reflections import SpecularReflections
+from typing import Dict, List
+import numpy as np
+import argparse
+import logging
+import time
+import cv2
+
+def build_glossy_image(width: int, height: int, components: int, seed: int = 0) -> np.ndarray:
+    """
+    Genera una imagen oscura con el número indicado de manchas blancas no saturadas.
+
+    :param width: Ancho de la imagen.
+    :param height: Alto de la imagen.
+    :param components: Número aproximado de manchas (componentes conexas).
+    :param seed: Semilla para que el corpus sea reproducible.
+    :return: Imagen BGR sintética.
+    """
+    rng = np.random.default_rng(seed)
+    image = np.full((height, width, 3), 40, dtype=np.uint8)
+    centers_x = rng.integers(0, width, components)
+    centers_y = rng.integers(0, height, components)
+    radii = rng.integers(3, 15, components)
+    for x, y, r in zip(centers_x, centers_y, radii):
+        cv2.circle(image, (int(x), int(y)), int(r), (255, 255, 255), -1)
+    return image
+
+def legacy_filter(labels: np.ndarray, stats: np.ndarray, num_labels: int, min_region_size: int) -> int:
+    """
+    Reproduce el bucle original por etiqueta y devuelve el número de píxeles especulares.
+    """
+    mask_final = np.zeros(labels.shape, dtype=np.uint8)
+    for i in range(1, num_labels):
+        if stats[i, cv2.CC_STAT_AREA] >= min_region_size:
+            mask_final[labels == i] = 255
+    return int(np.count_nonzero(mask_final))
+
+def time_call(func, repeats: int) -> float:
+    """
+    Devuelve la mediana en milisegundos de varias ejecuciones de func.
+    """
+    samples = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start_time) * 1000)
+    return float(np.median(samples))
+
+def run(width: int, height: int, repeats: int, component_counts: List[int]) -> List[Dict[str, float]]:
+    """
+    Ejecuta el benchmark para cada número de componentes y devuelve las filas de resultados.
+    """
+    analyzer = SpecularReflections()
+    rows = []
+    for components in component_counts:
+        image = build_glossy_image(width, height, components)
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsv, (0, 0, analyzer.intensity_threshold + 1), (180, analyzer.saturation_threshold, 255))
+        num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+
+        legacy_ms = time_call(lambda: legacy_filter(labels, stats, num_labels, analyzer.min_region_size), repeats)
+        score_ms = time_call(lambda: analyzer.detect_specular_reflections(image), repeats)
+        mask_ms = time_call(lambda: analyzer.detect_specular_reflections(image, return_mask=True), repeats)
+
+        rows.append({
+            "labels": num_labels - 1,
+            "legacy_filter_ms": round(legacy_ms, 2),
+            "detect_score_only_ms": round(score_ms, 2),
+            "detect_with_mask_ms": round(mask_ms, 2),
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--components", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rows = run(args.width, args.height, args.repeats, args.components)
+
+    print(f"{'labels':>8} {'legacy_filter_ms':>18} {'detect_score_only_ms':>22} {'detect_with_mask_ms':>21}")
+    for row in rows:
+        print(f"{row['labels']:>8} {row['legacy_filter_ms']:>18} {row['detect_score_only_ms']:>22} {row['detect_with_mask_ms']:>21}")
+
+if __name__ == "__main__":
+    main()
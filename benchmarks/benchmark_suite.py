@@ -0,0 +1,283 @@
+"""
+Suite reproducible de micro-benchmarks de las rutas críticas de procesamiento y análisis.
+
+Genera un corpus sintético determinista (resoluciones de VGA a 48MP, escenas limpias y escenas
+con muchos reflejos) y mide cada etapa por separado y de extremo a extremo: mediana y p95 de
+tiempo, pico de memoria asignada (tracemalloc) y pico de RSS. Cada caso se ejecuta en un proceso
+hijo nuevo para que el pico de RSS no se contamine entre casos.
+
+Los resultados se guardan en JSON y se pueden comparar con una ejecución de referencia; el proceso
+termina con código 1 si alguna etapa es más lenta que la referencia por encima del umbral.
+
+Uso:
+    python -m benchmarks.benchmark_suite --output benchmarks/results/baseline.json
+    python -m benchmarks.benchmark_suite --baseline benchmarks/results/baseline.json --threshold 0.15
+    python -m benchmarks.benchmark_suite --resolutions vga fhd --scenes clean --repeats 3
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import multiprocessing
+import numpy as np
+import tracemalloc
+import tempfile
+import platform
+import argparse
+import resource
+import logging
+import base64
+import json
+import time
+import sys
+import cv2
+import os
+
+RESOLUTIONS = {
+    "vga": (640, 480),
+    "hd": (1280, 720),
+    "fhd": (1920, 1080),
+    "4k": (3840, 2160),
+    "12mp": (4032, 3024),
+    "48mp": (8000, 6000),
+}
+
+SCENES = ("clean", "glossy")
+
+def build_scene(width: int, height: int, scene: str, seed: int = 0) -> np.ndarray:
+    """
+    Genera una escena sintética reproducible.
+
+    - "clean": textura suave con detalle suficiente para no comprimirse trivialmente.
+    - "glossy": la misma textura oscurecida con muchas manchas blancas (muchas componentes especulares),
+      aproximadamente una por cada 2000 píxeles.
+
+    :param width: Ancho de la imagen.
+    :param height: Alto de la imagen.
+    :param scene: "clean" o "glossy".
+    :param seed: Semilla del generador.
+    :return: Imagen BGR (uint8).
+    """
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (max(1, height // 16), max(1, width // 16), 3), dtype=np.uint8)
+    image = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    if scene == "clean":
+        return image
+
+    image = (image // 3).astype(np.uint8)
+    components = max(10, (width * height) // 2000)
+    centers_x = rng.integers(0, width, components)
+    centers_y = rng.integers(0, height, components)
+    radii = rng.integers(3, 15, components)
+    for x, y, r in zip(centers_x, centers_y, radii):
+        cv2.circle(image, (int(x), int(y)), int(r), (255, 255, 255), -1)
+    return image
+
+def measure_stage(func: Callable[[], Any], repeats: int, warmup: int = 1) -> Dict[str, float]:
+    """
+    Mide una etapa: mediana y p95 en milisegundos y pico de memoria asignada (MB) durante una ejecución.
+    La asignación se mide en una pasada aparte para que tracemalloc no altere los tiempos.
+    """
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start_time) * 1000)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "median_ms": round(float(np.median(samples)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "alloc_peak_mb": round((peak - baseline) / (1024 * 1024), 2),
+    }
+
+def run_case(width: int, height: int, scene: str, repeats: int) -> Dict[str, Any]:
+    """
+    Ejecuta todas las etapas de un caso (resolución y escena) en el proceso actual.
+    """
+    logging.disable(logging.CRITICAL)
+    from src.image_quality.processors.persistence_queue import write_image
+    from src.image_quality.processors.analysis_engine import analyze_frame
+    from src.image_quality.processors.image_processor import ImageProcessor
+    from src.image_quality.processors.image_output import ImageOutput
+    from src.image_quality.processors.prepared_image import PreparedImage
+    from src.image_quality.services.specular_reflections import SpecularReflections
+    from src.image_quality.services.sharpness import SharpnessAnalyzer
+    from src.image_quality.services.exposure import ExposureAnalyzer
+    from src.image_quality.utils.properties import PersistenceProperties
+
+    PersistenceProperties.enabled = False
+    baseline_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    image = build_scene(width, height, scene)
+    image_bytes = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 92])[1].tobytes()
+    image_base64 = base64.b64encode(image_bytes).decode("ascii")
+    del image
+
+    with tempfile.TemporaryDirectory() as save_dir:
+        processor = ImageProcessor(save_dir=save_dir)
+        decoded = processor.read_image_from_bytes(image_bytes)
+        target_width, target_height = processor.target_dimensions(decoded.shape[1], decoded.shape[0])
+        resized = cv2.resize(decoded, (target_width, target_height), interpolation=cv2.INTER_LINEAR)
+        sharpness_analyzer = SharpnessAnalyzer()
+        specular_analyzer = SpecularReflections()
+        output_path = os.path.join(save_dir, "output.jpg")
+
+        def prepare():
+            prepared = PreparedImage(resized)
+            return prepared.gray, prepared.hsv_channels
+
+        def end_to_end():
+            result = processor.resize_and_save_image(image_bytes=image_bytes, return_decoded=True)
+            return analyze_frame(result["resized_image"])
+
+        stages = {
+            "base64_decode": lambda: processor.decode_base64(image_base64),
+            "image_decode": lambda: processor.read_image_from_bytes(image_bytes),
+            "decode_for_target": lambda: processor.decode_for_target(image_bytes),
+            "resize": lambda: cv2.resize(decoded, (target_width, target_height), interpolation=cv2.INTER_LINEAR),
+            "prepare": prepare,
+            "sharpness": lambda: sharpness_analyzer.detect_sharpness(resized),
+            "exposure": lambda: ExposureAnalyzer.detect_exposure(resized),
+            "specular_reflections": lambda: specular_analyzer.detect_specular_reflections(resized),
+            "image_write": lambda: write_image(output_path, ImageOutput(resized)),
+            "end_to_end": end_to_end,
+        }
+        results = {name: measure_stage(func, repeats) for name, func in stages.items()}
+
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "resolution": f"{width}x{height}",
+        "scene": scene,
+        "jpeg_bytes": len(image_bytes),
+        "stages": results,
+        "peak_rss_mb": round(peak_rss_kb / 1024, 1),
+        "peak_rss_delta_mb": round((peak_rss_kb - baseline_rss_kb) / 1024, 1),
+    }
+
+def _case_child(width: int, height: int, scene: str, repeats: int, threads: Optional[int], connection):
+    if threads is not None:
+        cv2.setNumThreads(threads)
+    try:
+        connection.send(run_case(width, height, scene, repeats))
+    except Exception as e:
+        connection.send({"error": repr(e)})
+    connection.close()
+
+def run_suite(resolutions: List[str], scenes: List[str], repeats: int, threads: Optional[int]) -> Dict[str, Any]:
+    """
+    Ejecuta cada caso en un proceso hijo nuevo y devuelve el informe completo.
+    """
+    context = multiprocessing.get_context("spawn")
+    cases = {}
+    for name in resolutions:
+        width, height = RESOLUTIONS[name]
+        for scene in scenes:
+            parent_connection, child_connection = context.Pipe(duplex=False)
+            process = context.Process(target=_case_child,
+                                      args=(width, height, scene, repeats, threads, child_connection))
+            process.start()
+            result = parent_connection.recv()
+            process.join()
+            if "error" in result:
+                raise RuntimeError(f"El caso {name}/{scene} falló: {result['error']}")
+            cases[f"{name}/{scene}"] = result
+            print(f"  {name}/{scene}: end_to_end {result['stages']['end_to_end']['median_ms']} ms, "
+                  f"peak RSS {result['peak_rss_mb']} MB", file=sys.stderr)
+
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "opencv_threads": threads,
+            "repeats": repeats,
+        },
+        "cases": cases,
+    }
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Tuple[str, str, float, float, float]]:
+    """
+    Compara las medianas de cada etapa con la referencia.
+
+    :param threshold: Aumento relativo máximo tolerado (0.10 = 10 %).
+    :return: Lista de regresiones (caso, etapa, referencia ms, actual ms, cambio relativo).
+    """
+    regressions = []
+    for case, result in report["cases"].items():
+        baseline_case = baseline.get("cases", {}).get(case)
+        if baseline_case is None:
+            continue
+        for stage, metrics in result["stages"].items():
+            baseline_stage = baseline_case["stages"].get(stage)
+            if baseline_stage is None or baseline_stage["median_ms"] <= 0:
+                continue
+            change = metrics["median_ms"] / baseline_stage["median_ms"] - 1
+            if change > threshold:
+                regressions.append((case, stage, baseline_stage["median_ms"], metrics["median_ms"], change))
+    return regressions
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]]):
+    """
+    Imprime una tabla con la mediana de cada etapa (y el cambio frente a la referencia si existe).
+    """
+    print(f"{'case':>14} {'stage':>22} {'median_ms':>10} {'p95_ms':>10} {'alloc_mb':>9} {'vs_base':>8}")
+    for case, result in report["cases"].items():
+        baseline_case = (baseline or {}).get("cases", {}).get(case, {})
+        for stage, metrics in result["stages"].items():
+            baseline_stage = baseline_case.get("stages", {}).get(stage)
+            change = "-"
+            if baseline_stage and baseline_stage["median_ms"] > 0:
+                change = f"{(metrics['median_ms'] / baseline_stage['median_ms'] - 1) * 100:+.1f}%"
+            print(f"{case:>14} {stage:>22} {metrics['median_ms']:>10} {metrics['p95_ms']:>10} "
+                  f"{metrics['alloc_peak_mb']:>9} {change:>8}")
+        print(f"{case:>14} {'peak_rss_mb':>22} {result['peak_rss_mb']:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument("--scenes", nargs="+", choices=SCENES, default=list(SCENES))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Hilos de OpenCV (cv2.setNumThreads) para resultados comparables entre máquinas.")
+    parser.add_argument("--output", help="Ruta del JSON donde guardar los resultados.")
+    parser.add_argument("--baseline", help="JSON de una ejecución anterior con la que comparar.")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Aumento relativo de la mediana considerado regresión (0.10 = 10 %%).")
+    args = parser.parse_args()
+
+    report = run_suite(args.resolutions, args.scenes, args.repeats, args.threads)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print_report(report, baseline)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados guardados en {args.output}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.threshold)
+        for case, stage, baseline_ms, current_ms, change in regressions:
+            print(f"REGRESIÓN {case} {stage}: {baseline_ms} ms -> {current_ms} ms ({change * 100:+.1f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"Sin regresiones por encima del {args.threshold * 100:.0f}%.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+Harness de carga y reproducción de peticiones contra los endpoints de análisis servidos por gunicorn.
+
+Arranca app.py en local con gunicorn (workers y threads configurables), reproduce peticiones
+grabadas o sintéticas contra /analyze_image_real_time y /analyze_image_gallery, con concurrencia
+fija (bucle cerrado) o con tasa de llegada fija (bucle abierto), e informa de throughput,
+latencias p50/p95/p99 y tasa de error. Barriendo configuraciones de workers/threads (y tasas)
+se localiza el punto de saturación. Todo funciona sin red, en una sola máquina Linux.
+
+El servidor se ejecuta en un directorio temporal para que las imágenes y respuestas guardadas
+durante la prueba no se mezclen con data/ del repositorio.
+
+Formato de las peticiones grabadas (JSONL, una por línea):
+    {"endpoint": "/analyze_image_gallery", "image_path": "foto.jpg", "mode": "raw", "client_info": {...}}
+    {"endpoint": "/analyze_image_real_time", "image_base64": "...", "mode": "json"}
+"mode" puede ser "raw" (cuerpo binario, por defecto), "multipart" o "json" (Base64 heredado).
+
+Uso:
+    python -m benchmarks.load_test --workers 1 2 4 --threads 1 4 --concurrency 8 --duration 20
+    python -m benchmarks.load_test --rates 5 10 20 40 --duration 15 --output /tmp/load.json
+    python -m benchmarks.load_test --payloads grabacion.jsonl --endpoints /analyze_image_gallery
+"""
+from benchmarks.benchmark_suite import build_scene
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import http.client
+import numpy as np
+import subprocess
+import itertools
+import threading
+import argparse
+import tempfile
+import socket
+import base64
+import struct
+import uuid
+import json
+import time
+import sys
+import cv2
+import os
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_ENDPOINTS = ("/analyze_image_real_time", "/analyze_image_gallery")
+
+class Payload:
+    """
+    Petición preparada: endpoint, cuerpo y cabeceras listos para enviar.
+    """
+    def __init__(self, endpoint: str, image_bytes: bytes, mode: str = "raw",
+                 client_info: Optional[Dict[str, Any]] = None):
+        self.endpoint = endpoint
+        self.image_bytes = image_bytes
+        self.mode = mode
+        self.client_info = client_info or {"userAgent": "load-test"}
+
+    def build(self, unique_id: Optional[int] = None) -> Tuple[bytes, Dict[str, str]]:
+        """
+        Construye el cuerpo y las cabeceras. Con unique_id se inserta un comentario JPEG para que
+        cada petición tenga bytes distintos y no acierte en la caché de resultados.
+        """
+        image_bytes = self.image_bytes
+        if unique_id is not None and image_bytes[:2] == b"\xff\xd8":
+            comment = f"load-test-{unique_id}".encode("ascii")
+            image_bytes = b"\xff\xd8\xff\xfe" + struct.pack(">H", len(comment) + 2) + comment + image_bytes[2:]
+
+        client_info = json.dumps(self.client_info)
+        if self.mode == "json":
+            body = json.dumps({**self.client_info, "image": base64.b64encode(image_bytes).decode("ascii")})
+            return body.encode("utf-8"), {"Content-Type": "application/json"}
+        if self.mode == "multipart":
+            boundary = uuid.uuid4().hex
+            body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"client_info\"\r\n\r\n{client_info}\r\n"
+                    f"--{boundary}\r\nContent-Disposition: form-data; name=\"image\"; filename=\"image.jpg\"\r\n"
+                    f"Content-Type: image/jpeg\r\n\r\n").encode("utf-8") + image_bytes + f"\r\n--{boundary}--\r\n".encode("utf-8")
+            return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        return image_bytes, {"Content-Type": "image/jpeg", "X-Client-Info": client_info}
+
+def load_payloads(path: str, endpoints: List[str]) -> List[Payload]:
+    """
+    Lee peticiones grabadas en JSONL. Las rutas de imagen relativas se resuelven respecto al archivo.
+    """
+    payloads = []
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            endpoint = record.get("endpoint", endpoints[0])
+            if endpoint not in endpoints:
+                continue
+            if record.get("image_path"):
+                with open(os.path.join(base_dir, record["image_path"]), "rb") as image_file:
+                    image_bytes = image_file.read()
+            else:
+                image_bytes = base64.b64decode(record["image_base64"])
+            payloads.append(Payload(endpoint, image_bytes, record.get("mode", "raw"), record.get("client_info")))
+    if not payloads:
+        raise ValueError(f"No hay peticiones para {endpoints} en {path}")
+    return payloads
+
+def synthetic_payloads(endpoints: List[str], width: int, height: int, count: int, mode: str) -> List[Payload]:
+    """
+    Genera peticiones sintéticas deterministas (mitad escenas limpias, mitad con reflejos).
+    """
+    payloads = []
+    for i in range(count):
+        scene = "clean" if i % 2 == 0 else "glossy"
+        image = build_scene(width, height, scene, seed=i)
+        image_bytes = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+        payloads.append(Payload(endpoints[i % len(endpoints)], image_bytes, mode))
+    return payloads
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class Server:
+    """
+    Proceso gunicorn con app:app en un directorio de trabajo temporal.
+    """
+    def __init__(self, workers: int, threads: int, extra_args: Optional[List[str]] = None):
+        self.workers = workers
+        self.threads = threads
+        self.extra_args = extra_args or []
+        self.port = free_port()
+        self.work_dir = tempfile.TemporaryDirectory(prefix="load-test-")
+        self.process: Optional[subprocess.Popen] = None
+        self.log = None
+
+    def __enter__(self) -> "Server":
+        self.log = open(os.path.join(self.work_dir.name, "gunicorn.log"), "wb")
+        command = [sys.executable, "-m", "gunicorn", "app:app", "--pythonpath", REPO_ROOT,
+                   "--bind", f"127.0.0.1:{self.port}", "--workers", str(self.workers),
+                   "--threads", str(self.threads), "--worker-class", "gthread",
+                   "--timeout", "120"] + self.extra_args
+        self.process = subprocess.Popen(command, cwd=self.work_dir.name, stdout=self.log, stderr=subprocess.STDOUT)
+        self._wait_ready()
+        return self
+
+    def _wait_ready(self, timeout: float = 60.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn terminó al arrancar; ver {self.log.name}")
+            try:
+                connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=2)
+                connection.request("GET", "/")
+                connection.getresponse().read()
+                connection.close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise TimeoutError("gunicorn no respondió a tiempo.")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+        self.work_dir.cleanup()
+
+class LoadClient:
+    """
+    Cliente HTTP con una conexión persistente por hilo y registro de latencias.
+    """
+    def __init__(self, port: int, payloads: List[Payload], bust_cache: bool):
+        self.port = port
+        self.payloads = payloads
+        self.bust_cache = bust_cache
+        self._local = threading.local()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=120)
+            self._local.connection = connection
+        return connection
+
+    def send(self, scheduled_at: Optional[float] = None):
+        """
+        Envía la siguiente petición. En bucle abierto la latencia se mide desde el instante programado
+        para no ocultar la cola de espera (omisión coordinada).
+        """
+        index = next(self._counter)
+        payload = self.payloads[index % len(self.payloads)]
+        body, headers = payload.build(index if self.bust_cache else None)
+        start_time = scheduled_at if scheduled_at is not None else time.perf_counter()
+        ok = False
+        try:
+            connection = self._connection()
+            connection.request("POST", payload.endpoint, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            ok = 200 <= response.status < 300
+        except (OSError, http.client.HTTPException):
+            self._local.connection = None
+        latency = time.perf_counter() - start_time
+        with self._lock:
+            self.latencies.append(latency)
+            if not ok:
+                self.errors += 1
+
+    def summary(self, elapsed: float) -> Dict[str, float]:
+        latencies_ms = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        total = len(self.latencies)
+        return {
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed > 0 else 0.0,
+            "p50_ms": round(float(np.percentile(latencies_ms, 50)), 1),
+            "p95_ms": round(float(np.percentile(latencies_ms, 95)), 1),
+            "p99_ms": round(float(np.percentile(latencies_ms, 99)), 1),
+            "error_rate": round(self.errors / total, 4) if total else 0.0,
+        }
+
+def run_closed_loop(client: LoadClient, concurrency: int, duration: float) -> Dict[str, float]:
+    """
+    Concurrencia fija: cada hilo envía la siguiente petición en cuanto recibe la respuesta anterior.
+    """
+    deadline = time.perf_counter() + duration
+
+    def _loop():
+        while time.perf_counter() < deadline:
+            client.send()
+
+    start_time = time.perf_counter()
+    threads = [threading.Thread(target=_loop) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return client.summary(time.perf_counter() - start_time)
+
+def run_open_loop(client: LoadClient, rate: float, duration: float, max_in_flight: int) -> Dict[str, float]:
+    """
+    Tasa de llegada fija: las peticiones se programan cada 1/rate segundos con independencia de las respuestas.
+    """
+    interval = 1.0 / rate
+    total = int(rate * duration)
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for i in range(total):
+            scheduled_at = start_time + i * interval
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(client.send, scheduled_at)
+    summary = client.summary(time.perf_counter() - start_time)
+    summary["offered_rps"] = rate
+    return summary
+
+def find_saturation(rows: List[Dict[str, Any]], open_loop: bool) -> Optional[Dict[str, Any]]:
+    """
+    Bucle cerrado: la configuración con más throughput sin errores.
+    Bucle abierto: la mayor tasa atendida (throughput >= 95 % de lo ofrecido y < 1 % de errores).
+    """
+    healthy = [row for row in rows if row["error_rate"] < 0.01]
+    if open_loop:
+        healthy = [row for row in healthy if row["throughput_rps"] >= 0.95 * row["offered_rps"]]
+        return max(healthy, key=lambda row: row["offered_rps"], default=None)
+    return max(healthy, key=lambda row: row["throughput_rps"], default=None)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--endpoints", nargs="+", default=list(DEFAULT_ENDPOINTS))
+    parser.add_argument("--payloads", help="JSONL con peticiones grabadas; si no, se generan sintéticas.")
+    parser.add_argument("--synthetic-size", type=int, nargs=2, default=[1920, 1080], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--synthetic-count", type=int, default=8)
+    parser.add_argument("--mode", choices=("raw", "multipart", "json"), default="raw")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clientes simultáneos en bucle cerrado.")
+    parser.add_argument("--rates", type=float, nargs="+", help="Tasas de llegada (peticiones/s) en bucle abierto.")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Peticiones simultáneas máximas en bucle abierto.")
+    parser.add_argument("--duration", type=float, default=15.0, help="Segundos por medición.")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Segundos de calentamiento por servidor.")
+    parser.add_argument("--allow-cache-hits", action="store_true",
+                        help="Reenvía los mismos bytes (por defecto cada petición es única para no acertar en la caché).")
+    parser.add_argument("--output", help="Ruta del JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    if args.payloads:
+        payloads = load_payloads(args.payloads, args.endpoints)
+    else:
+        payloads = synthetic_payloads(args.endpoints, *args.synthetic_size, args.synthetic_count, args.mode)
+
+    rows = []
+    for workers, threads in itertools.product(args.workers, args.threads):
+        with Server(workers, threads) as server:
+            warmup_client = LoadClient(server.port, payloads, not args.allow_cache_hits)
+            run_closed_loop(warmup_client, max(1, workers * threads), args.warmup)
+
+            for rate in (args.rates or [None]):
+                client = LoadClient(server.port, payloads, not args.allow_cache_hits)
+                if rate is None:
+                    summary = run_closed_loop(client, args.concurrency, args.duration)
+                else:
+                    summary = run_open_loop(client, rate, args.duration, args.max_in_flight)
+                row = {"workers": workers, "threads": threads, **summary}
+                rows.append(row)
+                print(json.dumps(row), file=sys.stderr)
+
+    columns = ["workers", "threads"] + (["offered_rps"] if args.rates else []) + \
+              ["requests", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "error_rate"]
+    print(" ".join(f"{column:>14}" for column in columns))
+    for row in rows:
+        print(" ".join(f"{row[column]!s:>14}" for column in columns))
+
+    saturation = find_saturation(rows, bool(args.rates))
+    if saturation is not None:
+        print(f"Punto de saturación: {json.dumps(saturation)}")
+    else:
+        print("Ninguna configuración se mantuvo sin errores.")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"arguments": vars(args), "rows": rows, "saturation": saturation}, f, indent=2)
+        print(f"Resultados guardados en {args.output}")
+
+if __name__ == "__main__":
+    main()
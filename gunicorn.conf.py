@@ -0,0 +1,54 @@
+"""
+Configuración de gunicorn para el modo de producción.
+
+Uso: gunicorn -c gunicorn.conf.py app:app
+"""
+from src.image_quality.utils.properties import MetricsProperties, ServingProperties
+import shutil
+import os
+
+# Métricas agregadas entre workers: prometheus_client lee la variable al importarse, así que debe
+# definirse antes de importar cualquier módulo de la aplicación. El directorio se vacía en cada
+# arranque para no conservar valores de una ejecución anterior; se hace aquí y no en on_starting
+# porque la precarga de la aplicación ocurre antes de ese hook
+metrics_dir = (os.environ.get("PROMETHEUS_MULTIPROC_DIR") or MetricsProperties.multiprocess_dir
+               or ServingProperties.metrics_multiprocess_dir)
+shutil.rmtree(metrics_dir, ignore_errors=True)
+os.makedirs(metrics_dir, exist_ok=True)
+os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+
+from src.image_quality.utils import serving
+
+bind = f"0.0.0.0:{os.environ.get('PORT', ServingProperties.port)}"
+
+# Worker con hilos: necesario para las sesiones WebSocket y para solapar la recepción de subidas
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_CONCURRENCY", serving.worker_count()))
+threads = serving.thread_count()
+opencv_threads = serving.opencv_thread_count(workers)
+
+preload_app = ServingProperties.preload
+timeout = ServingProperties.timeout
+graceful_timeout = ServingProperties.graceful_timeout
+max_requests = ServingProperties.max_requests
+max_requests_jitter = ServingProperties.max_requests_jitter
+
+def post_fork(server, worker):
+    """
+    Fija los hilos de OpenCV del worker y reconfigura su logging.
+    """
+    serving.configure_worker(opencv_threads)
+
+def post_worker_init(worker):
+    """
+    Calienta los analizadores antes de que el worker acepte peticiones.
+    """
+    if ServingProperties.warmup:
+        serving.warm_up()
+
+def child_exit(server, worker):
+    """
+    Elimina los ficheros de métricas del worker terminado.
+    """
+    from src.image_quality.utils.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
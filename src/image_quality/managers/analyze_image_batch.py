@@ -0,0 +1,138 @@
+from src.image_quality.processors.request_payload import CLIENT_INFO_FORM_FIELD, CLIENT_INFO_HEADER, parse_client_fields
+from src.image_quality.managers.analyze_image_gallery import AnalyzeImageGallery
+from src.image_quality.processors.client_metadata import client_metadata
+from src.image_quality.processors.response_handler import ResponseHandler
+from src.image_quality.processors.client_info import client_info
+from src.image_quality.utils.properties import BatchProperties
+from src.image_quality.utils.metrics import current_endpoint, set_endpoint
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, Future, wait
+from flask import Response, request, stream_with_context
+from werkzeug.formparser import parse_form_data
+from werkzeug.datastructures import MultiDict
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+import logging
+import tarfile
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+class AnalyzeImageBatch:
+    """
+    Clase para analizar muchas imágenes en una sola petición y devolver los resultados en NDJSON.
+    """
+    @staticmethod
+    def analyze_image_batch() -> Any:
+        """
+        Recibe un lote de imágenes (multipart con varios archivos "images" o un flujo tar),
+        las analiza en un conjunto de hilos y devuelve cada resultado como una línea NDJSON
+        en cuanto está listo, sin esperar al lote completo.
+
+        :return: Respuesta en streaming con un resultado por línea.
+        """
+        if request.mimetype == "multipart/form-data":
+            _, form, files = parse_form_data(request.environ)
+            fields = parse_client_fields(form.get(CLIENT_INFO_FORM_FIELD))
+            items = AnalyzeImageBatch.iter_multipart_images(files)
+        else:
+            fields = parse_client_fields(request.headers.get(CLIENT_INFO_HEADER))
+            items = AnalyzeImageBatch.iter_tar_images(request.stream)
+
+        client_data = client_info(fields)
+        metadata = client_metadata(fields)
+        results = AnalyzeImageBatch.stream_results(items, client_data, metadata, current_endpoint())
+        return Response(stream_with_context(results), mimetype="application/x-ndjson")
+
+    @staticmethod
+    def iter_multipart_images(files: MultiDict) -> Iterator[Tuple[str, bytes]]:
+        """
+        Recorre los archivos subidos en multipart; cada archivo (volcado a disco por werkzeug si es grande)
+        se lee solo cuando se va a analizar y se cierra a continuación.
+
+        :param files: Archivos del formulario, parseados fuera de la petición para que Flask no los
+                      cierre antes de terminar la respuesta en streaming.
+        """
+        try:
+            for field_name, upload in files.items(multi=True):
+                image_bytes = upload.read()
+                upload.close()
+                yield upload.filename or field_name, image_bytes
+        finally:
+            for _, upload in files.items(multi=True):
+                upload.close()
+
+    @staticmethod
+    def iter_tar_images(stream: Any) -> Iterator[Tuple[str, bytes]]:
+        """
+        Recorre un archivo tar en modo streaming (sin búsquedas), leyendo cada imagen al llegar a ella.
+
+        :param stream: Flujo de entrada de la petición.
+        """
+        with tarfile.open(fileobj=stream, mode="r|*") as archive:
+            for member in archive:
+                if not member.isfile() or not member.name.lower().endswith(BatchProperties.tar_image_extensions):
+                    continue
+                extracted = archive.extractfile(member)
+                if extracted is not None:
+                    yield member.name, extracted.read()
+
+    @staticmethod
+    def analyze_item(index: int, filename: str, image_bytes: bytes, client_data: Dict[str, Any],
+                     metadata: Dict[str, Any], endpoint: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Analiza una imagen del lote con el mismo flujo que el endpoint de galería.
+
+        :param endpoint: Endpoint con el que se etiquetan las métricas en el hilo del lote.
+        :return: Resultado con el mismo esquema que /analyze_image_gallery más la posición en el lote.
+        """
+        set_endpoint(endpoint)
+        try:
+            results, status_code = AnalyzeImageGallery.analyze(None, image_bytes, client_data, metadata)
+        except Exception as e:
+            logger.error(f"Error inesperado al analizar {filename} del lote: {e}", exc_info=True)
+            results, status_code = AnalyzeImageGallery.error_analyze_image_gallery(client_data, 0.0, 0.0), 500
+        results = dict(results)
+        results["batch_index"] = index
+        results["filename"] = filename
+        results["status_code"] = status_code
+        return results
+
+    @staticmethod
+    def stream_results(items: Iterator[Tuple[str, bytes]], client_data: Dict[str, Any],
+                       metadata: Dict[str, Any], endpoint: Optional[str] = None) -> Iterator[str]:
+        """
+        Reparte las imágenes en un conjunto de hilos y va emitiendo las líneas NDJSON a medida que terminan.
+        Nunca hay más de max_workers * max_in_flight_per_worker imágenes leídas a la vez.
+        """
+        max_workers = BatchProperties.max_workers or os.cpu_count() or 1
+        max_in_flight = max_workers * BatchProperties.max_in_flight_per_worker
+        start_time = time.time()
+        total = 0
+
+        def _lines(done: Set[Future]) -> Iterator[str]:
+            for future in done:
+                yield json.dumps(ResponseHandler.convert_to_native(future.result()), ensure_ascii=False) + "\n"
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-worker") as executor:
+            pending: Set[Future] = set()
+            try:
+                for index, (filename, image_bytes) in enumerate(items):
+                    pending.add(executor.submit(AnalyzeImageBatch.analyze_item, index, filename,
+                                                image_bytes, client_data, metadata, endpoint))
+                    total += 1
+
+                    timeout = None if len(pending) >= max_in_flight else 0
+                    done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                    yield from _lines(done)
+            except tarfile.TarError as e:
+                logger.error(f"Error al leer el archivo tar del lote: {e}")
+                yield json.dumps({"error": "TarError", "detail": str(e), "is_valid": False}) + "\n"
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from _lines(done)
+
+        elapsed_time_seconds = time.time() - start_time
+        logger.info("Lote de %d imágenes analizado en %.4fs", total, elapsed_time_seconds,
+                    extra={"stage": "analyze_image_batch", "duration_ms": int(elapsed_time_seconds * 1000)})
@@ -1,20 +1,20 @@
-from src.image_quality.services.specular_reflections import SpecularReflections
+from src.image_quality.processors.result_cache import cache_key, get_result_cache
+from src.image_quality.processors.analysis_engine import analyze_frame
+from src.image_quality.processors.analyzer_registry import endpoint_analyzers
 from src.image_quality.processors.response_handler import ResponseHandler
+from src.image_quality.processors.persistence_queue import persist_response
 from src.image_quality.processors.image_processor import ImageProcessor
 from src.image_quality.processors.client_metadata import client_metadata
 from src.image_quality.utils.properties import ResponseHandlerPaths
-from src.image_quality.services.sharpness import SharpnessAnalyzer
-from src.image_quality.services.exposure import ExposureAnalyzer
-from src.image_quality.processors.client_info import client_info
-from flask import request, jsonify
-from typing import Dict, Any
+from src.image_quality.processors.request_payload import request_payload
+from src.image_quality.processors.client_info import capture_dimensions, client_info
+from src.image_quality.utils.metrics import observe_upload
+from flask import jsonify
+from typing import Optional, Tuple, Dict, Any
 import logging
 import time
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-)
+logger = logging.getLogger(__name__)
 
 class AnalyzeImageGallery:
     """
@@ -23,62 +23,90 @@ class AnalyzeImageGallery:
     @staticmethod
     def analyze_image_gallery() -> Any:
         """
-        Procesa la imagen adjuntada en formato Base64, realiza análisis de métricas
+        Procesa la imagen adjuntada (Base64 en JSON, multipart o binaria), realiza análisis de métricas
         y devuelve los resultados.
 
         :return: Respuesta JSON con los resultados o un diccionario de error.
         """
-        client_data = client_info()
+        payload = request_payload()
+        client_data = client_info(payload["fields"])
+        results, status_code = AnalyzeImageGallery.analyze(payload["image_base64"], payload["image_bytes"], client_data, client_metadata(payload["fields"]))
+        return jsonify(results), status_code
+
+    @staticmethod
+    def analyze(image_base64: Optional[str], image_bytes: Optional[bytes], client_data: Dict[str, Any], metadata: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], int]:
+        """
+        Ejecuta el procesamiento y el análisis de métricas sin depender de la petición de Flask,
+        para poder reutilizarlo desde otros endpoints (por ejemplo, el análisis por lotes).
+
+        :param image_base64: Imagen codificada en Base64 (o None).
+        :param image_bytes: Imagen binaria (o None).
+        :param client_data: Información del cliente.
+        :param metadata: Metadatos EXIF enviados por el cliente.
+        :return: Tupla con el diccionario de resultados y el código de estado HTTP.
+
+        Si la caché de resultados está activa y la misma imagen ya se analizó con los mismos parámetros,
+        se devuelve el resultado guardado (marcado con "cached") sin decodificar, analizar ni guardar nada.
+        """
         start_time = time.time()
-        data = request.get_json()
-        image_base64 = data.get("image", "")
-        metadata = client_metadata()
 
-        if not image_base64:
+        if not image_base64 and not image_bytes:
             elapsed_time_seconds = time.time() - start_time
             elapsed_time_milliseconds = elapsed_time_seconds * 1000
             empty_results = AnalyzeImageGallery.error_analyze_image_gallery(client_data, elapsed_time_seconds, elapsed_time_milliseconds)
-            return jsonify(empty_results), 400
+            return empty_results, 400
+
+        result_cache = get_result_cache()
+        key = None
+        if result_cache is not None:
+            if image_bytes is None:
+                image_bytes = ImageProcessor.decode_base64(image_base64)
+            if image_bytes:
+                key = cache_key(image_bytes)
+                cached_results = result_cache.get(key)
+                if cached_results is not None:
+                    return AnalyzeImageGallery.cached_results(cached_results, client_data, metadata, start_time), 200
 
         processor = ImageProcessor()
         try:
-            processor_result = processor.resize_and_save_image(image_base64, return_decoded=True)
+            processor_result = processor.resize_and_save_image(image_base64, return_decoded=True, image_bytes=image_bytes)
 
             if not processor_result or not processor_result.get("is_valid", False):
-                logging.error("El resultado del procesador indica un error.")
+                logger.error("El resultado del procesador indica un error.")
                 elapsed_time_seconds = time.time() - start_time
                 elapsed_time_milliseconds = elapsed_time_seconds * 1000
                 empty_results = AnalyzeImageGallery.error_analyze_image_gallery(client_data, elapsed_time_seconds, elapsed_time_milliseconds)
-                return jsonify(empty_results), 400
+                return empty_results, 400
 
             resized_image = processor_result.get("resized_image")
             image_id = processor_result.get("image_id")
             original_dims = processor_result.get("original_dimensions")
             resized_dims = processor_result.get("resized_dimensions")
             saved_path = processor_result.get("image_path")
+            observe_upload(processor_result["uploaded_bytes"], original_dims, capture_dimensions(client_data))
 
         except Exception as e:
-            logging.error(f"Error durante el procesamiento de la imagen: {e}")
+            logger.error(f"Error durante el procesamiento de la imagen: {e}")
             elapsed_time_seconds = time.time() - start_time
             elapsed_time_milliseconds = elapsed_time_seconds * 1000
             empty_results = AnalyzeImageGallery.error_analyze_image_gallery(client_data, elapsed_time_seconds, elapsed_time_milliseconds)
-            return jsonify(empty_results), 400
+            return empty_results, 400
 
         try:
-            sharpness = SharpnessAnalyzer().detect_sharpness(resized_image)
-            exposure = ExposureAnalyzer().detect_exposure(resized_image)
-            specular_reflections = SpecularReflections().detect_specular_reflections(resized_image)
+            metrics = analyze_frame(resized_image, endpoint_analyzers("gallery"))
 
         except Exception as e:
-            logging.error(f"Error durante el análisis en una de las métricas: {e}")
+            logger.error(f"Error durante el análisis en una de las métricas: {e}")
             elapsed_time_seconds = time.time() - start_time
             elapsed_time_milliseconds = elapsed_time_seconds * 1000
             empty_results = AnalyzeImageGallery.error_analyze_image_gallery(client_data, elapsed_time_seconds, elapsed_time_milliseconds)
-            return jsonify(empty_results), 400
+            return empty_results, 400
 
         elapsed_time_seconds = time.time() - start_time
         elapsed_time_milliseconds = elapsed_time_seconds * 1000
-        logging.info(f"Tiempo de procesamiento en Analyze Image Gallery: {elapsed_time_seconds}s ({elapsed_time_milliseconds}ms)")
+        logger.info("Análisis de galería completado", extra={"stage": "analyze_image_gallery",
+                                                             "duration_ms": int(elapsed_time_milliseconds),
+                                                             "image_id": image_id})
 
         results_analyze_image_gallery = {
             "client_info": client_data,
@@ -86,28 +114,52 @@ class AnalyzeImageGallery:
             "image_id": image_id,
             "original_dimensions": {"width": original_dims[0], "height": original_dims[1]},
             "resized_dimensions": {"width": resized_dims[0], "height": resized_dims[1]},
-            "sharpness": sharpness,
-            "exposure": exposure,
-            "specular_reflections": specular_reflections,
+            **metrics,
             "saved_path": saved_path,
             "processing_time_seconds": round(elapsed_time_seconds, 4),
             "processing_time_milliseconds": round(elapsed_time_milliseconds, 2),
+            "cached": False,
             "is_valid": True
         }
 
         try:
-            response_handler = ResponseHandler(ResponseHandlerPaths.responses_hander_images_gallery)
-            results_analyze_image_gallery = response_handler.convert_to_native(results_analyze_image_gallery)
-            response_handler.save_response(results_analyze_image_gallery)
+            results_analyze_image_gallery = ResponseHandler.convert_to_native(results_analyze_image_gallery)
+            persist_response(ResponseHandlerPaths.responses_hander_images_gallery, results_analyze_image_gallery)
+            if key is not None:
+                result_cache.put(key, results_analyze_image_gallery)
 
         except Exception:
             elapsed_time_seconds = time.time() - start_time
             elapsed_time_milliseconds = elapsed_time_seconds * 1000
             empty_results = AnalyzeImageGallery.error_analyze_image_gallery(client_data, elapsed_time_seconds, elapsed_time_milliseconds)
-            return jsonify(empty_results), 500
+            return empty_results, 500
+
+        return results_analyze_image_gallery, 200
+
+    @staticmethod
+    def cached_results(cached_results: Dict[str, Any], client_data: Dict[str, Any], metadata: Optional[Dict[str, Any]],
+                       start_time: float) -> Dict[str, Any]:
+        """
+        Construye la respuesta de una imagen ya analizada a partir del resultado guardado en la caché.
+
+        :param cached_results: Resultado del análisis original.
+        :param client_data: Información del cliente de esta petición.
+        :param metadata: Metadatos EXIF de esta petición.
+        :param start_time: Tiempo inicial del proceso.
+        :return: Diccionario de resultados con "cached" a True y el identificador de la imagen original.
+        """
+        elapsed_time_seconds = time.time() - start_time
+        elapsed_time_milliseconds = elapsed_time_seconds * 1000
+        logger.info("Imagen ya analizada; se devuelve el resultado en caché de %s", cached_results.get("image_id"))
+
+        results = dict(cached_results)
+        results["client_info"] = client_data
+        results["metadata"] = metadata
+        results["processing_time_seconds"] = round(elapsed_time_seconds, 4)
+        results["processing_time_milliseconds"] = round(elapsed_time_milliseconds, 2)
+        results["cached"] = True
+        return results
 
-        return jsonify(results_analyze_image_gallery)
-    
 
     @staticmethod
     def error_analyze_image_gallery(client_data: Dict[str, Any], elapsed_time_seconds: float, elapsed_time_milliseconds: float) -> Dict[str, Any]:
@@ -125,11 +177,10 @@ class AnalyzeImageGallery:
             "image_id": None,
             "original_dimensions": {"width": None, "height": None},
             "resized_dimensions": {"width": None, "height": None},
-            "sharpness": None,
-            "exposure": None,
-            "specular_reflections": None,
+            **{name: None for name in endpoint_analyzers("gallery")},
             "saved_path": None,
             "processing_time_seconds": round(elapsed_time_seconds, 4),
             "processing_time_milliseconds": round(elapsed_time_milliseconds, 2),
+            "cached": False,
             "is_valid": False
         }
\ No newline at end of file
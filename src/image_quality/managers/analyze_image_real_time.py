@@ -1,19 +1,20 @@
-from src.image_quality.services.specular_reflections import SpecularReflections
+from src.image_quality.processors.temporal_reuse import TemporalReuseSession, frame_signature, get_reuse_session
+from src.image_quality.processors.analysis_engine import analyze_frame
+from src.image_quality.processors.analyzer_registry import endpoint_analyzers
+from src.image_quality.processors.evaluation_cascade import analyze_cascade
 from src.image_quality.processors.response_handler import ResponseHandler
+from src.image_quality.processors.persistence_queue import persist_response
 from src.image_quality.processors.image_processor import ImageProcessor
-from src.image_quality.utils.properties import ResponseHandlerPaths
-from src.image_quality.services.sharpness import SharpnessAnalyzer
-from src.image_quality.services.exposure import ExposureAnalyzer
-from src.image_quality.processors.client_info import client_info
-from flask import request, jsonify
-from typing import Dict, Any
+from src.image_quality.utils.properties import CascadeProperties, ResponseHandlerPaths
+from src.image_quality.processors.request_payload import request_payload
+from src.image_quality.processors.client_info import capture_dimensions, client_info
+from src.image_quality.utils.metrics import observe_upload
+from flask import jsonify
+from typing import Optional, Tuple, Dict, Any
 import logging
 import time
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-)
+logger = logging.getLogger(__name__)
 
 class AnalyzeImageRealTime:
     """
@@ -22,89 +23,147 @@ class AnalyzeImageRealTime:
     @staticmethod
     def analyze_image_real_time() -> Any:
         """
-        Procesa la imagen enviada en formato Base64, realiza análisis de métricas
+        Procesa la imagen enviada (Base64 en JSON, multipart o binaria), realiza análisis de métricas
         y devuelve los resultados.
 
         :return: Respuesta JSON con los resultados o un diccionario de error.
         """
-        client_data = client_info()
+        payload = request_payload()
+        client_data = client_info(payload["fields"])
+        reuse_session = get_reuse_session(payload["fields"].get("sessionId"))
+        results, status_code = AnalyzeImageRealTime.analyze(payload["image_base64"], payload["image_bytes"], client_data,
+                                                             reuse_session)
+        return jsonify(results), status_code
+
+    @staticmethod
+    def analyze(image_base64: Optional[str], image_bytes: Optional[bytes], client_data: Dict[str, Any],
+                reuse_session: Optional[TemporalReuseSession] = None) -> Tuple[Dict[str, Any], int]:
+        """
+        Ejecuta el procesamiento y el análisis de métricas sin depender de la petición de Flask,
+        para poder reutilizarlo desde otros endpoints (por ejemplo, el análisis por lotes).
+
+        Si se indica una sesión y el fotograma es casi idéntico al último analizado, se devuelve el
+        resultado anterior marcado con "reused" sin decodificar, analizar ni guardar nada.
+
+        :param image_base64: Imagen codificada en Base64 (o None).
+        :param image_bytes: Imagen binaria (o None).
+        :param client_data: Información del cliente.
+        :param reuse_session: Estado de reutilización temporal del cliente (o None para analizar siempre).
+        :return: Tupla con el diccionario de resultados y el código de estado HTTP.
+        """
         start_time = time.time()
-        data = request.get_json()
-        image_base64 = data.get("image", "")
 
-        if not image_base64:
+        if not image_base64 and not image_bytes:
             elapsed_time_seconds = time.time() - start_time
             elapsed_time_milliseconds = elapsed_time_seconds * 1000
             empty_results = AnalyzeImageRealTime.error_analyze_image_real_time(client_data, elapsed_time_seconds, elapsed_time_milliseconds)
-            return jsonify(empty_results), 400
+            return empty_results, 400
+
+        signature = None
+        if reuse_session is not None:
+            if image_bytes is None:
+                image_bytes = ImageProcessor.decode_base64(image_base64)
+            signature = frame_signature(image_bytes)
+            previous_results = reuse_session.lookup(signature)
+            if previous_results is not None:
+                return AnalyzeImageRealTime.reused_results(previous_results, client_data, start_time), 200
 
         processor = ImageProcessor()
         try:
-            processor_result = processor.resize_and_save_image(image_base64, return_decoded=True)
+            processor_result = processor.resize_and_save_image(image_base64, return_decoded=True, image_bytes=image_bytes)
 
             if not processor_result or not processor_result.get("is_valid", False):
-                logging.error("El resultado del procesador indica un error.")
+                logger.error("El resultado del procesador indica un error.")
                 elapsed_time_seconds = time.time() - start_time
                 elapsed_time_milliseconds = elapsed_time_seconds * 1000
                 empty_results = AnalyzeImageRealTime.error_analyze_image_real_time(client_data, elapsed_time_seconds, elapsed_time_milliseconds)
-                return jsonify(empty_results), 400
+                return empty_results, 400
 
             resized_image = processor_result.get("resized_image")
             image_id = processor_result.get("image_id")
             original_dims = processor_result.get("original_dimensions")
             resized_dims = processor_result.get("resized_dimensions")
             saved_path = processor_result.get("image_path")
+            observe_upload(processor_result["uploaded_bytes"], original_dims, capture_dimensions(client_data))
 
         except Exception as e:
-            logging.error(f"Error durante el procesamiento de la imagen: {e}")
+            logger.error(f"Error durante el procesamiento de la imagen: {e}")
             elapsed_time_seconds = time.time() - start_time
             elapsed_time_milliseconds = elapsed_time_seconds * 1000
             empty_results = AnalyzeImageRealTime.error_analyze_image_real_time(client_data, elapsed_time_seconds, elapsed_time_milliseconds)
-            return jsonify(empty_results), 400
+            return empty_results, 400
 
         try:
-            sharpness = SharpnessAnalyzer().detect_sharpness(resized_image)
-            exposure = ExposureAnalyzer().detect_exposure(resized_image)
-            specular_reflections = SpecularReflections().detect_specular_reflections(resized_image)
+            analyzers = endpoint_analyzers("real_time")
+            cascade = None
+            if CascadeProperties.enabled:
+                metrics, cascade = analyze_cascade(resized_image, analyzers)
+            else:
+                metrics = analyze_frame(resized_image, analyzers)
 
         except Exception as e:
-            logging.error(f"Error durante el análisis en una de las métricas: {e}")
+            logger.error(f"Error durante el análisis en una de las métricas: {e}")
             elapsed_time_seconds = time.time() - start_time
             elapsed_time_milliseconds = elapsed_time_seconds * 1000
             empty_results = AnalyzeImageRealTime.error_analyze_image_real_time(client_data, elapsed_time_seconds, elapsed_time_milliseconds)
-            return jsonify(empty_results), 400
+            return empty_results, 400
 
         elapsed_time_seconds = time.time() - start_time
         elapsed_time_milliseconds = elapsed_time_seconds * 1000
-        logging.info(f"Tiempo de procesamiento en Analyze Image Real Time: {elapsed_time_seconds}s ({elapsed_time_milliseconds}ms)")
+        logger.info("Análisis en tiempo real completado", extra={"stage": "analyze_image_real_time",
+                                                                "duration_ms": int(elapsed_time_milliseconds),
+                                                                "image_id": image_id})
 
         results_analyze_image_real_time = {
             "client_info": client_data,
             "image_id": image_id,
             "original_dimensions": {"width": original_dims[0], "height": original_dims[1]},
             "resized_dimensions": {"width": resized_dims[0], "height": resized_dims[1]},
-            "sharpness": sharpness,
-            "exposure": exposure,
-            "specular_reflections": specular_reflections,
+            **metrics,
+            "cascade": cascade,
             "saved_path": saved_path,
             "processing_time_seconds": round(elapsed_time_seconds, 4),
             "processing_time_milliseconds": round(elapsed_time_milliseconds, 2),
+            "reused": False,
             "is_valid": True
         }
 
         try:
-            response_handler = ResponseHandler(ResponseHandlerPaths.responses_hander_images_real_time)
-            results_analyze_image_real_time = response_handler.convert_to_native(results_analyze_image_real_time)
-            response_handler.save_response(results_analyze_image_real_time)
+            results_analyze_image_real_time = ResponseHandler.convert_to_native(results_analyze_image_real_time)
+            persist_response(ResponseHandlerPaths.responses_hander_images_real_time, results_analyze_image_real_time)
+            if reuse_session is not None:
+                reuse_session.update(signature, results_analyze_image_real_time)
 
         except Exception:
             elapsed_time_seconds = time.time() - start_time
             elapsed_time_milliseconds = elapsed_time_seconds * 1000
             empty_results = AnalyzeImageRealTime.error_analyze_image_real_time(client_data, elapsed_time_seconds, elapsed_time_milliseconds)
-            return jsonify(empty_results), 500
+            return empty_results, 500
+
+        return results_analyze_image_real_time, 200
+
+    @staticmethod
+    def reused_results(previous_results: Dict[str, Any], client_data: Dict[str, Any], start_time: float) -> Dict[str, Any]:
+        """
+        Construye la respuesta de un fotograma que reutiliza el último análisis de la sesión.
+        No se guarda ni la imagen ni la respuesta: el análisis de referencia ya está persistido.
+
+        :param previous_results: Resultado del último análisis completo.
+        :param client_data: Información del cliente.
+        :param start_time: Tiempo inicial del proceso.
+        :return: Diccionario de resultados con "reused" a True y el identificador de la imagen analizada.
+        """
+        elapsed_time_seconds = time.time() - start_time
+        elapsed_time_milliseconds = elapsed_time_seconds * 1000
+        logger.info("Fotograma casi idéntico al anterior; se reutiliza el análisis de %s", previous_results.get("image_id"))
+
+        results = dict(previous_results)
+        results["client_info"] = client_data
+        results["processing_time_seconds"] = round(elapsed_time_seconds, 4)
+        results["processing_time_milliseconds"] = round(elapsed_time_milliseconds, 2)
+        results["reused"] = True
+        return results
 
-        return jsonify(results_analyze_image_real_time)
-    
 
     @staticmethod
     def error_analyze_image_real_time(client_data: Dict[str, Any], elapsed_time_seconds: float, elapsed_time_milliseconds: float) -> Dict[str, Any]:
@@ -121,11 +180,11 @@ class AnalyzeImageRealTime:
             "image_id": None,
             "original_dimensions": {"width": None, "height": None},
             "resized_dimensions": {"width": None, "height": None},
-            "sharpness": None,
-            "exposure": None,
-            "specular_reflections": None,
+            **{name: None for name in endpoint_analyzers("real_time")},
+            "cascade": None,
             "saved_path": None,
             "processing_time_seconds": round(elapsed_time_seconds, 4),
             "processing_time_milliseconds": round(elapsed_time_milliseconds, 2),
+            "reused": False,
             "is_valid": False
         }
\ No newline at end of file
@@ -0,0 +1,84 @@
+from src.image_quality.managers.analyze_image_real_time import AnalyzeImageRealTime
+from src.image_quality.processors.response_handler import ResponseHandler
+from src.image_quality.processors.request_payload import parse_client_fields
+from src.image_quality.processors.client_info import client_info
+from src.image_quality.processors.temporal_reuse import TemporalReuseSession
+from src.image_quality.utils.properties import StreamingProperties, TemporalReuseProperties
+from typing import Any, Dict, Optional, Tuple
+import logging
+import json
+
+logger = logging.getLogger(__name__)
+
+class StreamImageRealTime:
+    """
+    Clase para analizar en tiempo real los fotogramas recibidos por una sesión WebSocket persistente.
+
+    Protocolo:
+    - Mensaje de texto {"type": "client_info", ...}: fija la información del cliente para la sesión.
+    - Mensaje binario: un fotograma JPEG/PNG. Solo se analiza el más reciente; los que llegan mientras
+      se analiza otro se descartan ("el último fotograma gana").
+    - Cada análisis se devuelve por la misma conexión como texto JSON con el esquema de
+      /analyze_image_real_time más el campo "stream" con los contadores de la sesión.
+    - Los fotogramas casi idénticos al último analizado reutilizan su resultado ("reused": true).
+    """
+    @staticmethod
+    def handle(ws: Any):
+        """
+        Atiende una sesión WebSocket hasta que el cliente la cierra o supera el tiempo de inactividad.
+
+        :param ws: Conexión WebSocket (flask-sock).
+        """
+        client_data = client_info({})
+        counters = {"frames_received": 0, "frames_dropped": 0, "frames_analyzed": 0}
+        reuse_session = TemporalReuseSession() if TemporalReuseProperties.enabled else None
+
+        while True:
+            message = ws.receive(timeout=StreamingProperties.idle_timeout_seconds)
+            if message is None:
+                logger.info("Sesión de streaming cerrada por inactividad.")
+                break
+
+            frame, fields = StreamImageRealTime.latest_frame(ws, message, counters)
+            if fields is not None:
+                client_data = client_info(fields)
+            if frame is None:
+                continue
+
+            results, status_code = AnalyzeImageRealTime.analyze(None, frame, client_data, reuse_session)
+            counters["frames_analyzed"] += 1
+            results = dict(results)
+            results["status_code"] = status_code
+            results["stream"] = dict(counters)
+            ws.send(json.dumps(ResponseHandler.convert_to_native(results), ensure_ascii=False))
+
+        ws.close()
+
+    @staticmethod
+    def latest_frame(ws: Any, message: Any, counters: Dict[str, int]) -> Tuple[Optional[bytes], Optional[Dict[str, Any]]]:
+        """
+        Vacía sin bloquear los mensajes ya recibidos y se queda solo con el último fotograma.
+
+        :param ws: Conexión WebSocket.
+        :param message: Primer mensaje recibido.
+        :param counters: Contadores de la sesión; se actualizan los recibidos y descartados.
+        :return: Tupla con el último fotograma (o None) y los últimos campos de cliente recibidos (o None).
+        """
+        frame = None
+        fields = None
+        while message is not None:
+            if isinstance(message, str):
+                data = parse_client_fields(message)
+                if data.get("type") == "client_info":
+                    fields = data
+            elif len(message) > StreamingProperties.max_frame_bytes:
+                logger.warning(f"Fotograma de {len(message)} bytes descartado por superar el tamaño máximo.")
+                counters["frames_received"] += 1
+                counters["frames_dropped"] += 1
+            else:
+                counters["frames_received"] += 1
+                if frame is not None:
+                    counters["frames_dropped"] += 1
+                frame = bytes(message)
+            message = ws.receive(timeout=0)
+        return frame, fields
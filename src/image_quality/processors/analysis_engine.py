@@ -0,0 +1,239 @@
+from src.image_quality.processors.analyzer_registry import endpoint_analyzers, run_analyzers
+from src.image_quality.utils.properties import AnalysisEngineProperties, MicroBatchingProperties
+from src.image_quality.processors.prepared_image import PreparedImage
+from src.image_quality.utils.metrics import observe_stage, record_error
+from src.image_quality.utils.logging_config import configure_logging
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import multiprocessing
+import numpy as np
+import threading
+import logging
+import atexit
+import queue
+import cv2
+import os
+
+logger = logging.getLogger(__name__)
+
+def observe_timings(timings: Dict[str, float]):
+    """
+    Registra en las métricas del proceso actual la duración de cada métrica de un fotograma.
+    """
+    for stage, seconds in timings.items():
+        observe_stage(stage, seconds)
+
+def _engine_worker(connection: Any, opencv_threads: int):
+    """
+    Bucle de un proceso de análisis: mantiene los analizadores en memoria (el registro los carga en el
+    primer fotograma que los pide) y lee cada fotograma directamente del segmento de memoria compartida
+    indicado, sin serializar píxeles.
+    """
+    configure_logging()
+    cv2.setNumThreads(opencv_threads)
+    # Cada proceso recibe un único fotograma cada vez: agrupar solo añadiría la espera del lote
+    MicroBatchingProperties.enabled = False
+    segment: Optional[shared_memory.SharedMemory] = None
+
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+
+        segment_name, shape, names = message
+        if segment is None or segment.name != segment_name:
+            if segment is not None:
+                segment.close()
+            segment = shared_memory.SharedMemory(name=segment_name)
+
+        frame = np.ndarray(shape, dtype=np.uint8, buffer=segment.buf)
+        timings: Dict[str, float] = {}
+        try:
+            results = run_analyzers(PreparedImage(frame), names, timings)
+        except Exception as e:
+            results = {"error": str(e)}
+        del frame
+        connection.send((results, timings))
+
+    if segment is not None:
+        segment.close()
+
+class _EngineWorker:
+    """
+    Proceso de análisis junto con su canal y su segmento de memoria compartida reutilizable.
+    """
+    def __init__(self, context: Any, index: int):
+        self.context = context
+        self.index = index
+        self.process = None
+        self.connection = None
+        self.segment: Optional[shared_memory.SharedMemory] = None
+        self.restarts = 0
+        self.start()
+
+    def start(self):
+        parent_connection, child_connection = self.context.Pipe()
+        self.process = self.context.Process(
+            target=_engine_worker,
+            args=(child_connection, AnalysisEngineProperties.opencv_threads_per_worker),
+            name=f"analysis-worker-{self.index}",
+            daemon=True,
+        )
+        self.process.start()
+        child_connection.close()
+        self.connection = parent_connection
+
+    def restart(self):
+        logger.warning(f"Reiniciando el proceso de análisis {self.index}.")
+        self.restarts += 1
+        self.stop(graceful=False)
+        self.start()
+
+    def stop(self, graceful: bool = True):
+        if self.process is None:
+            return
+        if graceful and self.process.is_alive():
+            try:
+                self.connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=5)
+        self.connection.close()
+        self.process = None
+
+    def release_segment(self):
+        if self.segment is not None:
+            self.segment.close()
+            self.segment.unlink()
+            self.segment = None
+
+    def _ensure_segment(self, nbytes: int):
+        if self.segment is None or self.segment.size < nbytes:
+            self.release_segment()
+            self.segment = shared_memory.SharedMemory(create=True, size=nbytes)
+
+    def analyze(self, image: np.ndarray, names: Sequence[str],
+                timeout: float) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, float]]:
+        """
+        Copia el fotograma al segmento compartido y espera el resultado del proceso.
+
+        :param names: Métricas a ejecutar.
+        :return: Tupla con los resultados y la duración de cada métrica medida en el proceso.
+        """
+        if not self.process.is_alive():
+            self.restart()
+
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        self._ensure_segment(image.nbytes)
+        view = np.ndarray(image.shape, dtype=np.uint8, buffer=self.segment.buf)
+        view[...] = image
+        del view
+
+        self.connection.send((self.segment.name, image.shape, tuple(names)))
+        if not self.connection.poll(timeout):
+            raise TimeoutError(f"El proceso de análisis {self.index} no respondió en {timeout}s.")
+        return self.connection.recv()
+
+class AnalysisEngine:
+    """
+    Motor de análisis en un conjunto persistente de procesos. Los fotogramas se entregan a través de
+    multiprocessing.shared_memory (un segmento reutilizable por proceso), los analizadores se mantienen
+    cargados en cada proceso y los procesos caídos se reinician automáticamente.
+    """
+    def __init__(self, workers: Optional[int] = None, task_timeout_seconds: Optional[float] = None):
+        """
+        Inicializa y arranca los procesos de análisis.
+
+        :param workers: Número de procesos; por defecto AnalysisEngineProperties.workers o el número de núcleos.
+        :param task_timeout_seconds: Tiempo máximo por fotograma.
+        """
+        self.workers = workers or AnalysisEngineProperties.workers or os.cpu_count() or 1
+        self.task_timeout_seconds = task_timeout_seconds or AnalysisEngineProperties.task_timeout_seconds
+        context = multiprocessing.get_context("spawn")
+        self._workers: List[_EngineWorker] = [_EngineWorker(context, i) for i in range(self.workers)]
+        self._idle: "queue.Queue[_EngineWorker]" = queue.Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+
+    def analyze(self, image: np.ndarray, names: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Analiza un fotograma en el primer proceso libre. Si el proceso cae, se reinicia y se reintenta una vez.
+
+        :param image: Imagen BGR (uint8) en formato OpenCV.
+        :param names: Métricas a ejecutar.
+        :return: Diccionario con el resultado de cada métrica.
+        """
+        worker = self._idle.get()
+        try:
+            for attempt in range(2):
+                try:
+                    results, timings = worker.analyze(image, names, self.task_timeout_seconds)
+                    if "error" in results:
+                        raise RuntimeError(results["error"])
+                    observe_timings(timings)
+                    return results
+                except (EOFError, BrokenPipeError, ConnectionResetError, TimeoutError) as e:
+                    logger.error(f"Fallo en el proceso de análisis {worker.index}: {e}")
+                    worker.restart()
+            raise RuntimeError("El motor de análisis no pudo procesar el fotograma.")
+        finally:
+            self._idle.put(worker)
+
+    @property
+    def restarts(self) -> int:
+        """
+        Número total de procesos reiniciados por caídas o bloqueos.
+        """
+        return sum(worker.restarts for worker in self._workers)
+
+    def shutdown(self):
+        """
+        Detiene los procesos y libera los segmentos de memoria compartida.
+        """
+        for worker in self._workers:
+            worker.stop()
+            worker.release_segment()
+
+_analysis_engine: Optional[AnalysisEngine] = None
+_analysis_engine_pid: Optional[int] = None
+_analysis_engine_lock = threading.Lock()
+
+def get_analysis_engine() -> AnalysisEngine:
+    """
+    Devuelve el motor de análisis del proceso actual, creándolo en el primer uso (también tras un fork).
+    """
+    global _analysis_engine, _analysis_engine_pid
+    with _analysis_engine_lock:
+        if _analysis_engine is None or _analysis_engine_pid != os.getpid():
+            _analysis_engine = AnalysisEngine()
+            _analysis_engine_pid = os.getpid()
+            atexit.register(_analysis_engine.shutdown)
+        return _analysis_engine
+
+def analyze_frame(image: np.ndarray, analyzers: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Ejecuta las métricas de calidad sobre un fotograma, en el motor de procesos si está activo
+    o en el hilo actual compartiendo un único PreparedImage.
+
+    :param image: Imagen BGR en formato OpenCV.
+    :param analyzers: Métricas a ejecutar (por defecto las del endpoint "gallery").
+    :return: Diccionario con el resultado de cada métrica.
+    """
+    if analyzers is None:
+        analyzers = endpoint_analyzers("gallery")
+    try:
+        if AnalysisEngineProperties.enabled:
+            return get_analysis_engine().analyze(image, analyzers)
+        timings: Dict[str, float] = {}
+        results = run_analyzers(PreparedImage(image), analyzers, timings)
+        observe_timings(timings)
+        return results
+    except Exception:
+        record_error("analysis")
+        raise
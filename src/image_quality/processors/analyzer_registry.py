@@ -0,0 +1,142 @@
+from src.image_quality.utils.properties import AnalyzerProperties, PyiqaProperties
+from src.image_quality.processors.prepared_image import PreparedImage
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+import functools
+import threading
+import logging
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+AnalyzerFunction = Callable[[PreparedImage], Dict[str, Any]]
+
+class AnalyzerSpec:
+    """
+    Entrada del registro: nombre de la métrica, clave de su resultado que indica si cumple el umbral
+    y función que construye el analizador. La función se llama solo la primera vez que el proceso
+    necesita la métrica, así que los módulos que importa (por ejemplo torch) no se cargan si la
+    métrica no está activa en ningún endpoint.
+    """
+    def __init__(self, name: str, loader: Callable[[], AnalyzerFunction], passed_key: Optional[str] = None):
+        """
+        :param name: Nombre de la métrica, que es también la clave de su resultado en la respuesta.
+        :param loader: Función sin argumentos que devuelve el analizador (PreparedImage -> diccionario).
+        :param passed_key: Clave del resultado que indica si la imagen cumple (por defecto "is_correct_<name>").
+        """
+        self.name = name
+        self.loader = loader
+        self.passed_key = passed_key or f"is_correct_{name}"
+
+_registry: Dict[str, AnalyzerSpec] = {}
+_loaded: Dict[str, AnalyzerFunction] = {}
+_loaded_pid: Optional[int] = None
+_loaded_lock = threading.Lock()
+
+def register_analyzer(name: str, loader: Callable[[], AnalyzerFunction], passed_key: Optional[str] = None):
+    """
+    Registra (o sustituye) una métrica.
+
+    :param name: Nombre de la métrica.
+    :param loader: Función sin argumentos que devuelve el analizador.
+    :param passed_key: Clave del resultado que indica si la imagen cumple.
+    """
+    _registry[name] = AnalyzerSpec(name, loader, passed_key)
+    _loaded.pop(name, None)
+
+def registered_analyzers() -> Tuple[str, ...]:
+    """
+    Nombres de las métricas registradas.
+    """
+    return tuple(_registry)
+
+def get_spec(name: str) -> AnalyzerSpec:
+    """
+    Devuelve la entrada del registro de una métrica.
+    """
+    try:
+        return _registry[name]
+    except KeyError:
+        raise ValueError(f"Métrica desconocida: {name}") from None
+
+def get_analyzer(name: str) -> AnalyzerFunction:
+    """
+    Devuelve el analizador de una métrica, construyéndolo en el primer uso del proceso actual
+    (también tras un fork) y reutilizándolo después.
+    """
+    global _loaded_pid
+    analyzer = _loaded.get(name) if _loaded_pid == os.getpid() else None
+    if analyzer is not None:
+        return analyzer
+
+    spec = get_spec(name)
+    with _loaded_lock:
+        if _loaded_pid != os.getpid():
+            _loaded.clear()
+            _loaded_pid = os.getpid()
+        if name not in _loaded:
+            start_time = time.time()
+            _loaded[name] = spec.loader()
+            logger.debug("Analizador %s cargado", name,
+                         extra={"stage": "analyzer_load", "duration_ms": int((time.time() - start_time) * 1000)})
+        return _loaded[name]
+
+def endpoint_analyzers(endpoint: str) -> Tuple[str, ...]:
+    """
+    Métricas activas de un endpoint según AnalyzerProperties.endpoints.
+
+    :param endpoint: "real_time" o "gallery".
+    :return: Nombres de las métricas en el orden configurado.
+    """
+    names = tuple(AnalyzerProperties.endpoints.get(endpoint, ()))
+    for name in names:
+        get_spec(name)
+    return names
+
+def load_analyzers(names: Sequence[str]):
+    """
+    Construye por adelantado los analizadores indicados (por ejemplo durante el calentamiento del worker).
+    """
+    for name in names:
+        get_analyzer(name)
+
+def run_analyzers(prepared: PreparedImage, names: Sequence[str],
+                  timings: Optional[Dict[str, float]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Ejecuta las métricas indicadas sobre un PreparedImage compartido.
+
+    :param prepared: Imagen preparada.
+    :param names: Nombres de las métricas.
+    :param timings: Diccionario opcional donde se anota la duración en segundos de cada métrica.
+    :return: Diccionario con el resultado de cada métrica.
+    """
+    results = {}
+    for name in names:
+        analyzer = get_analyzer(name)
+        start_time = time.perf_counter()
+        results[name] = analyzer(prepared)
+        if timings is not None:
+            timings[name] = time.perf_counter() - start_time
+    return results
+
+def _load_sharpness() -> AnalyzerFunction:
+    from src.image_quality.services.sharpness import SharpnessAnalyzer
+    return SharpnessAnalyzer().detect_sharpness
+
+def _load_exposure() -> AnalyzerFunction:
+    from src.image_quality.services.exposure import ExposureAnalyzer
+    return ExposureAnalyzer.detect_exposure
+
+def _load_specular_reflections() -> AnalyzerFunction:
+    from src.image_quality.services.specular_reflections import SpecularReflections
+    return SpecularReflections().detect_specular_reflections
+
+def _load_pyiqa(metric_name: str) -> AnalyzerFunction:
+    from src.image_quality.services.pyiqa_metric import PyiqaMetric
+    return PyiqaMetric(metric_name).detect_quality
+
+register_analyzer("sharpness", _load_sharpness)
+register_analyzer("exposure", _load_exposure)
+register_analyzer("specular_reflections", _load_specular_reflections)
+for _metric_name in PyiqaProperties.thresholds:
+    register_analyzer(_metric_name, functools.partial(_load_pyiqa, _metric_name))
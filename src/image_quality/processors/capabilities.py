@@ -0,0 +1,19 @@
+from src.image_quality.utils.properties import CaptureProperties, ImageDimensionProperties
+from typing import Any, Dict
+
+def capabilities() -> Dict[str, Any]:
+    """
+    Resolución objetivo y calidad JPEG recomendadas a los clientes. Las dimensiones son las mismas a las
+    que el servidor redimensiona (ImageDimensionProperties), así que una imagen reducida en el dispositivo
+    con la misma regla llega ya con el tamaño final y el servidor no la vuelve a redimensionar.
+
+    :return: Diccionario con "client_downscale", "target_horizontal", "target_vertical" y "jpeg_quality".
+    """
+    horizontal_width, horizontal_height = ImageDimensionProperties.target_horizontal
+    vertical_width, vertical_height = ImageDimensionProperties.target_vertical
+    return {
+        "client_downscale": CaptureProperties.client_downscale,
+        "target_horizontal": {"width": horizontal_width, "height": horizontal_height},
+        "target_vertical": {"width": vertical_width, "height": vertical_height},
+        "jpeg_quality": CaptureProperties.client_jpeg_quality,
+    }
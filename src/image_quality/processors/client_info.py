@@ -1,8 +1,10 @@
+from typing import Any, Dict, Optional, Tuple
 from flask import request
 import logging
 
-def client_info():
-    data = request.json
+def client_info(data: Optional[Dict[str, Any]] = None):
+    if data is None:
+        data = request.json
 
     user_agent = data.get("userAgent", "N/A")
     platform = data.get("platform", "N/A")
@@ -12,6 +14,8 @@ def client_info():
     color_depth = data.get("colorDepth", "N/A")
     touch_points = data.get("touchPoints", "N/A")
     cpu_cores = data.get("cpuCores", "N/A")
+    capture_width = data.get("captureWidth", "N/A")
+    capture_height = data.get("captureHeight", "N/A")
     
     info = {
         "user_agent": user_agent,
@@ -22,5 +26,20 @@ def client_info():
         "color_depth": color_depth,
         "touch_points": touch_points,
         "cpu_cores": cpu_cores,
+        "capture_width": capture_width,
+        "capture_height": capture_height,
     }
-    return info
\ No newline at end of file
+    return info
+
+def capture_dimensions(client_data: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """
+    Dimensiones de la captura original declaradas por el cliente antes de reducir la imagen.
+
+    :param client_data: Información del cliente devuelta por client_info.
+    :return: Tupla (ancho, alto) o None si el cliente no las declara.
+    """
+    try:
+        width, height = int(client_data.get("capture_width")), int(client_data.get("capture_height"))
+    except (TypeError, ValueError):
+        return None
+    return (width, height) if width > 0 and height > 0 else None
@@ -1,8 +1,10 @@
+from typing import Any, Dict, Optional
 from flask import request
 
-def client_metadata():
-    data = request.json
-    metadata_raw = data.get('metadata', "")
+def client_metadata(data: Optional[Dict[str, Any]] = None):
+    if data is None:
+        data = request.json
+    metadata_raw = data.get('metadata') or {}
     return {
         # Fotografía General
         "Make": metadata_raw.get("Make"),
@@ -0,0 +1,95 @@
+from src.image_quality.processors.analyzer_registry import endpoint_analyzers, get_analyzer, get_spec
+from src.image_quality.processors.prepared_image import PreparedImage
+from src.image_quality.services.exposure import ExposureAnalyzer
+from src.image_quality.utils.metrics import observe_stage, record_error
+from src.image_quality.utils.properties import CascadeProperties
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import time
+import cv2
+
+def _exposure(prepared: PreparedImage) -> Dict[str, Any]:
+    """
+    Exposición sobre una muestra del fotograma: se toma un píxel de cada paso x paso sin promediar, de modo
+    que el histograma sigue siendo una muestra sin sesgo de los niveles originales. Reducir con INTER_AREA
+    no sirve: al promediar borra los pequeños brillos saturados y subestima la sobreexposición.
+    La muestra se toma de la imagen BGR y solo ella se convierte a grises, para que un fotograma rechazado
+    aquí no pague la conversión a resolución completa de prepared.gray.
+    """
+    max_side = CascadeProperties.exposure_max_side
+    height, width = prepared.shape[:2]
+    if not max_side or max(height, width) <= max_side:
+        return ExposureAnalyzer.detect_exposure(prepared)
+    step = -(-max(height, width) // max_side)
+    sample = np.ascontiguousarray(prepared.image[::step, ::step])
+    if prepared.is_color:
+        sample = cv2.cvtColor(sample, cv2.COLOR_BGR2GRAY)
+    results = ExposureAnalyzer.detect_exposure(sample)
+    results["evaluated_dimensions"] = {"width": sample.shape[1], "height": sample.shape[0]}
+    return results
+
+# Variantes propias de la cascada; el resto de métricas se toman del registro de analizadores
+OVERRIDES: Dict[str, Callable[[PreparedImage], Dict[str, Any]]] = {
+    "exposure": _exposure,
+}
+
+def cascade_order(analyzers: Sequence[str]) -> List[str]:
+    """
+    Orden de evaluación: las métricas activas que aparecen en CascadeProperties.order, en ese orden,
+    seguidas del resto de métricas activas (normalmente las más costosas, como las de pyiqa).
+    """
+    order = [name for name in CascadeProperties.order if name in analyzers]
+    return order + [name for name in analyzers if name not in order]
+
+def not_evaluated(rejected_by: str) -> Dict[str, Any]:
+    """
+    Resultado de una métrica omitida porque el fotograma ya se rechazó en una etapa anterior.
+    """
+    return {"evaluated": False, "skipped_because": rejected_by, "is_valid": False}
+
+def analyze_cascade(image: np.ndarray,
+                    analyzers: Optional[Sequence[str]] = None) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    """
+    Evalúa las métricas en el orden de cascade_order() y, con la política "first_failure",
+    deja de evaluar en cuanto una métrica no cumple su umbral. Las etapas se ejecutan en el hilo actual,
+    no en el motor de análisis en procesos.
+
+    :param image: Imagen BGR en formato OpenCV.
+    :param analyzers: Métricas activas (por defecto las del endpoint "real_time").
+    :return: Tupla con los resultados por métrica (las omitidas con "evaluated" a False) y el resumen
+             de la cascada ("order", "evaluated", "skipped" y "rejected_by").
+    """
+    order = cascade_order(endpoint_analyzers("real_time") if analyzers is None else analyzers)
+    prepared = PreparedImage(image)
+    results: Dict[str, Dict[str, Any]] = {}
+    evaluated = []
+    rejected_by = None
+
+    for name in order:
+        if rejected_by is not None and CascadeProperties.short_circuit == "first_failure":
+            results[name] = not_evaluated(rejected_by)
+            continue
+
+        analyzer = OVERRIDES.get(name) or get_analyzer(name)
+        passed_key = get_spec(name).passed_key
+        start_time = time.perf_counter()
+        try:
+            metric = analyzer(prepared)
+        except Exception:
+            record_error(name)
+            raise
+        observe_stage(name, time.perf_counter() - start_time)
+        metric["evaluated"] = True
+        results[name] = metric
+        evaluated.append(name)
+
+        if rejected_by is None and not (metric.get("is_valid") and metric.get(passed_key)):
+            rejected_by = name
+
+    cascade = {
+        "order": order,
+        "evaluated": evaluated,
+        "skipped": [name for name in order if name not in evaluated],
+        "rejected_by": rejected_by,
+    }
+    return results, cascade
@@ -0,0 +1,70 @@
+from typing import Optional, Tuple
+import struct
+
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8, 0xD9}
+
+def detect_image_format(image_bytes: Optional[bytes]) -> Optional[str]:
+    """
+    Detecta el formato de una imagen codificada a partir de sus bytes mágicos.
+
+    :param image_bytes: Bytes de la imagen codificada.
+    :return: "jpg", "png", "webp" o None si no se reconoce.
+    """
+    if not image_bytes:
+        return None
+    header = bytes(image_bytes[:12])
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+def _jpeg_dimensions(image_bytes: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Recorre los segmentos JPEG hasta el primer SOF y devuelve (ancho, alto) sin decodificar píxeles.
+    """
+    view = memoryview(image_bytes)
+    length = len(view)
+    offset = 2
+    while offset + 4 <= length:
+        if view[offset] != 0xFF:
+            return None
+        marker = view[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker in JPEG_STANDALONE_MARKERS:
+            offset += 2
+            continue
+        segment_length = struct.unpack(">H", view[offset + 2:offset + 4])[0]
+        if marker in JPEG_SOF_MARKERS:
+            if offset + 9 > length:
+                return None
+            height, width = struct.unpack(">HH", view[offset + 5:offset + 9])
+            return width, height
+        if marker == 0xDA:
+            return None
+        offset += 2 + segment_length
+    return None
+
+def read_image_dimensions(image_bytes: Optional[bytes]) -> Optional[Tuple[int, int]]:
+    """
+    Lee el ancho y alto de una imagen JPEG o PNG a partir de su cabecera, sin decodificar píxeles.
+    Las dimensiones son las almacenadas en el archivo (sin aplicar la orientación EXIF).
+
+    :param image_bytes: Bytes de la imagen codificada.
+    :return: Tupla (ancho, alto) o None si el formato no se reconoce o la cabecera está dañada.
+    """
+    image_format = detect_image_format(image_bytes)
+    try:
+        if image_format == "jpg":
+            return _jpeg_dimensions(image_bytes)
+        if image_format == "png" and len(image_bytes) >= 24:
+            width, height = struct.unpack(">II", bytes(image_bytes[16:24]))
+            return width, height
+    except struct.error:
+        return None
+    return None
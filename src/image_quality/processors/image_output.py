@@ -0,0 +1,68 @@
+from src.image_quality.processors.image_header import detect_image_format
+from src.image_quality.utils.properties import ImageOutputProperties
+from typing import List, Optional
+import numpy as np
+import threading
+import base64
+import cv2
+
+FORMAT_EXTENSIONS = {"jpg": ".jpg", "jpeg": ".jpg", "webp": ".webp", "png": ".png"}
+
+class ImageOutput:
+    """
+    Etapa de salida que codifica la imagen como máximo una vez y solo cuando un consumidor lo pide.
+
+    Si la imagen no se redimensionó y el formato original coincide con el de almacenamiento,
+    se reutilizan los bytes originales sin recodificar.
+    """
+    def __init__(self, image: np.ndarray, source_bytes: Optional[bytes] = None,
+                 resized: bool = True, storage_format: Optional[str] = None):
+        """
+        Inicializa la etapa de salida.
+
+        :param image: Imagen (ya redimensionada si procede) en formato OpenCV.
+        :param source_bytes: Bytes originales subidos por el cliente.
+        :param resized: Indica si la imagen difiere de la original.
+        :param storage_format: Formato de almacenamiento; por defecto el de ImageOutputProperties.
+        """
+        self.image = image
+        self.storage_format = (storage_format or ImageOutputProperties.storage_format).lower()
+        if self.storage_format not in FORMAT_EXTENSIONS:
+            raise ValueError(f"Formato de almacenamiento no soportado: {self.storage_format}")
+        self.extension = FORMAT_EXTENSIONS[self.storage_format]
+        self.is_passthrough = (ImageOutputProperties.passthrough_original and not resized and
+                               detect_image_format(source_bytes) == self.extension.lstrip("."))
+        self._source_bytes = source_bytes if self.is_passthrough else None
+        self._encoded: Optional[bytes] = None
+        self._lock = threading.Lock()
+
+    def encode_params(self) -> List[int]:
+        """
+        Parámetros de codificación de OpenCV según el formato de almacenamiento.
+        """
+        if self.extension == ".jpg":
+            return [cv2.IMWRITE_JPEG_QUALITY, int(ImageOutputProperties.jpeg_quality)]
+        if self.extension == ".webp":
+            return [cv2.IMWRITE_WEBP_QUALITY, int(ImageOutputProperties.webp_quality)]
+        return [cv2.IMWRITE_PNG_COMPRESSION, int(ImageOutputProperties.png_compression)]
+
+    def encoded(self) -> bytes:
+        """
+        Devuelve la imagen codificada, codificándola la primera vez que se solicita.
+        """
+        with self._lock:
+            if self._encoded is None:
+                if self._source_bytes is not None:
+                    self._encoded = bytes(self._source_bytes)
+                else:
+                    success, buffer = cv2.imencode(self.extension, self.image, self.encode_params())
+                    if not success:
+                        raise ValueError(f"No se pudo codificar la imagen en {self.extension}.")
+                    self._encoded = buffer.tobytes()
+            return self._encoded
+
+    def base64(self) -> str:
+        """
+        Devuelve la imagen codificada en Base64 reutilizando la codificación existente.
+        """
+        return base64.b64encode(self.encoded()).decode("utf-8")
@@ -1,5 +1,9 @@
+from src.image_quality.processors.persistence_queue import persist_image
+from src.image_quality.processors.image_header import detect_image_format, read_image_dimensions
+from src.image_quality.processors.image_output import ImageOutput
 from src.image_quality.utils.properties import ImageDimensionProperties
-from typing import Optional, Tuple, Dict, Any
+from src.image_quality.utils.metrics import stage_timer
+from typing import Optional, Tuple, Union, Dict, Any
 import numpy as np
 import logging
 import base64
@@ -8,10 +12,7 @@ import time
 import cv2
 import os
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-)
+logger = logging.getLogger(__name__)
 
 class ImageProcessor:
     """
@@ -34,41 +35,72 @@ class ImageProcessor:
         :param image_base64: Imagen codificada en Base64.
         :return: Imagen en formato OpenCV o None si falla.
         """
+        return self.read_image_from_bytes(self.decode_base64(image_base64))
+
+    @staticmethod
+    def decode_base64(image_base64: str) -> Optional[bytes]:
+        """
+        Decodifica el Base64 de una imagen a bytes.
+
+        :param image_base64: Imagen codificada en Base64.
+        :return: Bytes de la imagen o None si falla.
+        """
         if not image_base64:
-            logging.error("El string de la imagen en Base64 está vacío.")
+            logger.error("El string de la imagen en Base64 está vacío.")
             return None
 
         try:
-            image_data = base64.b64decode(image_base64)
-            image_array = np.frombuffer(image_data, dtype=np.uint8)
-            image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-            if image is None:
-                raise ValueError("Error al decodificar la imagen.")
-            return image
+            with stage_timer("base64_decode"):
+                return base64.b64decode(image_base64)
         except Exception as e:
-            logging.error(f"Error al decodificar la imagen: {e}", exc_info=True)
+            logger.error(f"Error al decodificar la imagen: {e}", exc_info=True)
             return None
 
-    def resize_and_save_image(self, image_base64: str, return_decoded: bool = False) -> Optional[Dict[str, Any]]:
+    def read_image_from_bytes(self, image_bytes: Union[bytes, bytearray, memoryview],
+                              flags: int = cv2.IMREAD_COLOR) -> Optional[np.ndarray]:
         """
-        Redimensiona y guarda una imagen. Puede devolver la imagen redimensionada en Base64.
+        Decodifica una imagen binaria (JPEG/PNG) directamente desde el buffer, sin copias intermedias.
 
-        :param image_base64: Imagen codificada en Base64.
-        :param return_decoded: Si True, devuelve la imagen decodificada en OpenCV.
-        :return: Diccionario con los resultados del procesamiento o None en caso de error.
+        :param image_bytes: Bytes de la imagen codificada.
+        :param flags: Modo de lectura de OpenCV (por ejemplo IMREAD_REDUCED_COLOR_2).
+        :return: Imagen en formato OpenCV o None si falla.
         """
-        start_time = time.time()
+        if not image_bytes:
+            logger.error("El buffer de la imagen está vacío.")
+            return None
 
-        image = self.read_image_from_base64(image_base64)
-        if image is None:
-            return self.error_result_image_processor(start_time)
+        try:
+            image_array = np.frombuffer(image_bytes, dtype=np.uint8)
+            with stage_timer("image_decode"):
+                image = cv2.imdecode(image_array, flags)
+                if image is None:
+                    raise ValueError("Error al decodificar la imagen.")
+            return image
+        except Exception as e:
+            logger.error(f"Error al decodificar la imagen: {e}", exc_info=True)
+            return None
 
-        original_height, original_width = image.shape[:2]
-        logging.info(f"Dimensiones originales de la imagen: {original_width}x{original_height}")
+    def target_dimensions(self, original_width: int, original_height: int) -> Tuple[int, int]:
+        """
+        Calcula las dimensiones finales conservando la relación de aspecto.
 
+        :param original_width: Ancho original.
+        :param original_height: Alto original.
+        :return: Tupla (ancho, alto) de destino.
+        """
         target_resolution = self.target_horizontal if original_width > original_height else self.target_vertical
         target_width, target_height = target_resolution
 
+        if (not ImageDimensionProperties.allow_upscale and
+                original_width <= target_width and original_height <= target_height):
+            return original_width, original_height
+
+        # Imagen ya ajustada a la caja objetivo (por ejemplo, reducida en el cliente según /capabilities):
+        # se conserva para no redimensionarla un píxel por redondeo.
+        if ((original_width == target_width and original_height <= target_height) or
+                (original_height == target_height and original_width <= target_width)):
+            return original_width, original_height
+
         aspect_ratio = original_width / original_height
         if aspect_ratio > target_width / target_height:
             new_width = target_width
@@ -76,32 +108,106 @@ class ImageProcessor:
         else:
             new_height = target_height
             new_width = int(target_height * aspect_ratio)
+        return new_width, new_height
+
+    def reduced_decode_flag(self, image_bytes: Optional[bytes]) -> Tuple[int, int]:
+        """
+        Elige la mayor escala de decodificación reducida (1/2, 1/4 u 1/8) que sigue cubriendo las
+        dimensiones objetivo, leyendo solo la cabecera JPEG.
 
-        resized_image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
-        logging.info(f"Dimensiones de la imagen redimensionada: {new_width}x{new_height}")
+        :param image_bytes: Bytes de la imagen codificada.
+        :return: Tupla (flag de OpenCV, factor de reducción).
+        """
+        if not ImageDimensionProperties.reduced_decode or detect_image_format(image_bytes) != "jpg":
+            return cv2.IMREAD_COLOR, 1
+
+        dimensions = read_image_dimensions(image_bytes)
+        if dimensions is None or min(dimensions) <= 0:
+            return cv2.IMREAD_COLOR, 1
+
+        width, height = dimensions
+        new_width, new_height = self.target_dimensions(width, height)
+        for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                             (2, cv2.IMREAD_REDUCED_COLOR_2)):
+            if width // factor >= new_width and height // factor >= new_height:
+                return flag, factor
+        return cv2.IMREAD_COLOR, 1
+
+    def decode_for_target(self, image_bytes: Optional[bytes]) -> Tuple[Optional[np.ndarray], Optional[Tuple[int, int]]]:
+        """
+        Decodifica la imagen directamente a la menor escala útil y devuelve sus dimensiones originales.
 
-        os.makedirs(self.save_dir, exist_ok=True)
-        image_id = str(uuid.uuid4())
-        image_path = os.path.join(self.save_dir, f"image_{image_id}.jpg")
-        cv2.imwrite(image_path, resized_image)
-        logging.info(f"Imagen guardada en: {image_path}")
+        :param image_bytes: Bytes de la imagen codificada.
+        :return: Tupla (imagen decodificada o None, (ancho, alto) originales con la orientación aplicada).
+        """
+        flag, factor = self.reduced_decode_flag(image_bytes)
+        image = self.read_image_from_bytes(image_bytes, flag)
+        if image is None:
+            return None, None
+
+        decoded_height, decoded_width = image.shape[:2]
+        if factor == 1:
+            return image, (decoded_width, decoded_height)
 
-        _, buffer = cv2.imencode('.jpg', resized_image)
-        resized_image_base64 = base64.b64encode(buffer).decode('utf-8')
+        width, height = read_image_dimensions(image_bytes)
+        if (decoded_width > decoded_height) != (width > height):
+            width, height = height, width
+        logger.debug("Decodificación reducida 1/%d: %dx%d -> %dx%d", factor, width, height, decoded_width, decoded_height)
+        return image, (width, height)
+
+    def resize_and_save_image(self, image_base64: Optional[str] = None, return_decoded: bool = False,
+                              image_bytes: Optional[bytes] = None, return_base64: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Redimensiona y guarda una imagen. Puede devolver la imagen redimensionada en Base64.
+
+        La imagen se codifica como máximo una vez (en el hilo de persistencia) y, si no necesita
+        redimensionarse, se guardan los bytes originales sin recodificar.
+
+        :param image_base64: Imagen codificada en Base64.
+        :param return_decoded: Si True, devuelve la imagen decodificada en OpenCV.
+        :param image_bytes: Imagen binaria; si se indica, se usa en lugar de image_base64.
+        :param return_base64: Si True, incluye la imagen guardada en Base64 (reutiliza la misma codificación).
+        :return: Diccionario con los resultados del procesamiento o None en caso de error.
+        """
+        start_time = time.time()
+
+        if image_bytes is None:
+            image_bytes = self.decode_base64(image_base64)
+        image, original_dimensions = self.decode_for_target(image_bytes)
+        if image is None:
+            return self.error_result_image_processor(start_time)
+
+        original_width, original_height = original_dimensions
+
+        new_width, new_height = self.target_dimensions(original_width, original_height)
+        is_resized = (new_width, new_height) != (original_width, original_height)
+        if image.shape[1] != new_width or image.shape[0] != new_height:
+            with stage_timer("resize"):
+                resized_image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        else:
+            resized_image = image
+
+        image_output = ImageOutput(resized_image, source_bytes=image_bytes, resized=is_resized)
+        image_id = str(uuid.uuid4())
+        image_path = os.path.join(self.save_dir, f"image_{image_id}{image_output.extension}")
+        persist_image(image_path, image_output)
 
         end_time = time.time()
         elapsed_time_seconds = round(end_time - start_time, 4)
         elapsed_time_milliseconds = int((end_time - start_time) * 1000)
 
-        logging.info(f"Tiempo de procesamiento en Image Processor: {elapsed_time_seconds}s ({elapsed_time_milliseconds}ms)")
+        logger.info("Imagen procesada: %dx%d -> %dx%d, encolada en %s", original_width, original_height,
+                    new_width, new_height, image_path,
+                    extra={"stage": "image_processor", "duration_ms": elapsed_time_milliseconds, "image_id": image_id})
 
         return {
-            "resized_image_base64": resized_image_base64,
+            "resized_image_base64": image_output.base64() if return_base64 else None,
             "image_path": image_path,
             "resized_image": resized_image,
             "image_id": image_id,
             "original_dimensions": (original_width, original_height),
             "resized_dimensions": (new_width, new_height),
+            "uploaded_bytes": len(image_bytes),
             "is_valid": True
         }
 
@@ -117,7 +223,7 @@ class ImageProcessor:
         elapsed_time_seconds = round(end_time - start_time, 4)
         elapsed_time_milliseconds = int((end_time - start_time) * 1000)
 
-        logging.error(f"Error en el procesamiento. Tiempo transcurrido en Image Processor: {elapsed_time_seconds}s ({elapsed_time_milliseconds}ms)")
+        logger.error(f"Error en el procesamiento. Tiempo transcurrido en Image Processor: {elapsed_time_seconds}s ({elapsed_time_milliseconds}ms)")
 
         return {
             "resized_image_base64": None,
@@ -126,5 +232,6 @@ class ImageProcessor:
             "image_id": None,
             "original_dimensions": None,
             "resized_dimensions": None,
+            "uploaded_bytes": None,
             "is_valid": False
         }
\ No newline at end of file
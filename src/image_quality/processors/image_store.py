@@ -0,0 +1,374 @@
+from src.image_quality.utils.properties import ImageStoreProperties
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+import threading
+import hashlib
+import logging
+import sqlite3
+import time
+import os
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class ImageStore:
+    """
+    Almacén de imágenes direccionado por contenido.
+
+    Cada imagen se guarda una sola vez en objects/<aa>/<bb>/<sha256><ext> (subdirectorios por prefijo del hash)
+    y un índice SQLite asocia la ruta lógica que se devuelve en las respuestas (image_<id>.jpg) con su
+    contenido. La retención por antigüedad, tamaño total y cuota por endpoint se aplica en segundo plano.
+    """
+    eviction_lock_filename = "eviction.lock"
+
+    def __init__(self, root: str, shard_depth: Optional[int] = None, shard_width: Optional[int] = None):
+        """
+        :param root: Directorio raíz del almacén (el mismo que usaban las rutas planas).
+        :param shard_depth: Número de niveles de subdirectorios.
+        :param shard_width: Caracteres del hash por nivel.
+        """
+        self.root = root
+        self.shard_depth = shard_depth if shard_depth is not None else ImageStoreProperties.shard_depth
+        self.shard_width = shard_width or ImageStoreProperties.shard_width
+        self.objects_dir = os.path.join(root, "objects")
+        self.index_path = os.path.join(root, ImageStoreProperties.index_filename)
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._eviction_lock_fd: Optional[int] = None
+        self._stats = {"stored": 0, "deduplicated": 0, "evicted_references": 0, "evicted_objects": 0,
+                       "evicted_bytes": 0}
+        with self._connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS objects ("
+                               "digest TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL, "
+                               "created_at REAL NOT NULL, last_referenced_at REAL NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS objects_last_referenced_at ON objects (last_referenced_at)")
+            connection.execute("CREATE TABLE IF NOT EXISTS refs ("
+                               "name TEXT PRIMARY KEY, digest TEXT NOT NULL, endpoint TEXT NOT NULL, "
+                               "created_at REAL NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS refs_created_at ON refs (created_at)")
+            connection.execute("CREATE INDEX IF NOT EXISTS refs_digest ON refs (digest)")
+            connection.execute("CREATE INDEX IF NOT EXISTS refs_endpoint_created_at ON refs (endpoint, created_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Conexión propia de cada hilo (sqlite3 no permite compartirlas entre hilos).
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.index_path, timeout=10.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def object_path(self, digest: str, extension: str) -> str:
+        """
+        Ruta física del contenido con el hash indicado.
+        """
+        shards = [digest[i * self.shard_width:(i + 1) * self.shard_width] for i in range(self.shard_depth)]
+        return os.path.join(self.objects_dir, *shards, digest + extension)
+
+    def _increment(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    @staticmethod
+    def _write_file(path: str, data: bytes):
+        """
+        Escribe el archivo de forma atómica (temporal en el mismo directorio y os.replace).
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(data)
+        os.replace(temporary_path, path)
+
+    def put(self, reference: str, data: bytes, endpoint: Optional[str] = None) -> str:
+        """
+        Guarda una imagen codificada bajo su ruta lógica. Si el mismo contenido ya existe, solo se
+        añade la referencia y no se vuelve a escribir.
+
+        :param reference: Ruta lógica devuelta en las respuestas (se usa su nombre de archivo como clave).
+        :param data: Bytes de la imagen codificada.
+        :param endpoint: Endpoint que originó la imagen (para las cuotas).
+        :return: Ruta física del contenido.
+        """
+        name = os.path.basename(reference)
+        extension = os.path.splitext(name)[1]
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest, extension)
+        connection = self._connection()
+
+        exists = connection.execute("SELECT 1 FROM objects WHERE digest = ?", (digest,)).fetchone() is not None
+        if not exists:
+            self._write_file(path, data)
+
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("INSERT OR IGNORE INTO objects VALUES (?, ?, ?, ?, ?)",
+                               (digest, path, len(data), now, now))
+            connection.execute("UPDATE objects SET last_referenced_at = ? WHERE digest = ?", (now, digest))
+            connection.execute("INSERT OR REPLACE INTO refs VALUES (?, ?, ?, ?)",
+                               (name, digest, endpoint or "none", now))
+            if not os.path.exists(path):
+                # Una expulsión concurrente pudo borrar el archivo entre la consulta y el bloqueo.
+                self._write_file(path, data)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        self._increment("deduplicated" if exists else "stored")
+        return path
+
+    def resolve(self, reference: str) -> Optional[str]:
+        """
+        Devuelve la ruta física de una imagen a partir de la ruta lógica de una respuesta o de su image_id.
+        Las imágenes guardadas antes del almacén (rutas planas) se resuelven tal cual si siguen existiendo.
+
+        :param reference: Ruta lógica, nombre de archivo o image_id.
+        :return: Ruta del archivo o None si no existe o ya se expulsó.
+        """
+        if os.path.isfile(reference):
+            return reference
+        name = os.path.basename(reference)
+        if name.startswith("image_"):
+            row = self._connection().execute(
+                "SELECT objects.path FROM refs JOIN objects ON objects.digest = refs.digest WHERE refs.name = ?",
+                (name,)).fetchone()
+        else:
+            row = self._connection().execute(
+                "SELECT objects.path FROM refs JOIN objects ON objects.digest = refs.digest "
+                "WHERE refs.name >= ? AND refs.name < ? LIMIT 1", (f"image_{name}.", f"image_{name}/")).fetchone()
+        if row is None or not os.path.exists(row[0]):
+            return None
+        return row[0]
+
+    def read(self, reference: str) -> Optional[bytes]:
+        """
+        Lee los bytes de una imagen a partir de su ruta lógica o image_id.
+        """
+        path = self.resolve(reference)
+        if path is None:
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def acquire_eviction_lock(self) -> bool:
+        """
+        Intenta convertir este proceso en el único que aplica la retención del almacén. El bloqueo de
+        archivo se conserva mientras el proceso viva; si el proceso muere, el sistema lo libera y otro
+        worker lo toma en su siguiente pasada.
+
+        :return: True si este proceso tiene el bloqueo.
+        """
+        if self._eviction_lock_fd is not None:
+            return True
+        if fcntl is None:
+            return True
+        lock_fd = os.open(os.path.join(self.root, self.eviction_lock_filename), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(lock_fd)
+            return False
+        self._eviction_lock_fd = lock_fd
+        logger.info(f"Proceso {os.getpid()} elegido para aplicar la retención de {self.root}")
+        return True
+
+    def evict(self, max_age_seconds: Optional[float] = None, max_total_bytes: Optional[int] = None,
+              endpoint_quota_bytes: Optional[Dict[str, int]] = None,
+              chunk_size: Optional[int] = None) -> Dict[str, int]:
+        """
+        Aplica la política de retención: referencias más antiguas que max_age_seconds, referencias más
+        antiguas de cada endpoint que supera su cuota y, por último, contenidos menos usados hasta quedar
+        por debajo de max_total_bytes. Los contenidos sin referencias se borran del disco.
+
+        Los candidatos y los cortes de cuota y de tamaño se calculan con lecturas fuera de la transacción
+        de escritura (en modo WAL no bloquean a put()); después se borran en bloques de chunk_size, cada
+        uno en una transacción corta, y los archivos se eliminan después de cada COMMIT.
+
+        :return: Número de referencias, contenidos y bytes expulsados.
+        """
+        max_age_seconds = ImageStoreProperties.max_age_seconds if max_age_seconds is None else max_age_seconds
+        max_total_bytes = ImageStoreProperties.max_total_bytes if max_total_bytes is None else max_total_bytes
+        endpoint_quota_bytes = (ImageStoreProperties.endpoint_quota_bytes if endpoint_quota_bytes is None
+                                else endpoint_quota_bytes)
+        chunk_size = chunk_size or ImageStoreProperties.eviction_chunk_size
+        connection = self._connection()
+        result = {"references": 0, "objects": 0, "bytes": 0}
+
+        if max_age_seconds:
+            cutoff = time.time() - max_age_seconds
+            while True:
+                deleted = self._write(connection, lambda: connection.execute(
+                    "DELETE FROM refs WHERE rowid IN (SELECT rowid FROM refs WHERE created_at < ? LIMIT ?)",
+                    (cutoff, chunk_size)).rowcount)
+                result["references"] += deleted
+                if deleted < chunk_size:
+                    break
+
+        for endpoint, quota in (endpoint_quota_bytes or {}).items():
+            # Se recorren las referencias de la más reciente a la más antigua acumulando su tamaño.
+            used = 0
+            over_quota = []
+            for name, created_at, size in connection.execute(
+                    "SELECT refs.name, refs.created_at, objects.size FROM refs "
+                    "JOIN objects ON objects.digest = refs.digest WHERE refs.endpoint = ? "
+                    "ORDER BY refs.created_at DESC, refs.name", (endpoint,)):
+                used += size
+                if used > quota:
+                    over_quota.append((name, created_at))
+            for start in range(0, len(over_quota), chunk_size):
+                chunk = over_quota[start:start + chunk_size]
+                # created_at descarta las referencias que un put() ha reescrito desde la lectura.
+                result["references"] += self._write(connection, lambda: sum(
+                    connection.execute("DELETE FROM refs WHERE name = ? AND created_at = ?", row).rowcount
+                    for row in chunk))
+
+        orphans = connection.execute(
+            "SELECT digest, path, size, last_referenced_at FROM objects "
+            "WHERE NOT EXISTS (SELECT 1 FROM refs WHERE refs.digest = objects.digest)").fetchall()
+        self._evict_objects(connection, orphans, chunk_size, result)
+
+        if max_total_bytes:
+            used = 0
+            over_limit = []
+            for row in connection.execute("SELECT digest, path, size, last_referenced_at FROM objects "
+                                          "ORDER BY last_referenced_at DESC, digest"):
+                used += row[2]
+                if used > max_total_bytes:
+                    over_limit.append(row)
+            self._evict_objects(connection, over_limit, chunk_size, result)
+
+        self._increment("evicted_references", result["references"])
+        self._increment("evicted_objects", result["objects"])
+        self._increment("evicted_bytes", result["bytes"])
+        if result["references"] or result["objects"]:
+            logger.info("Retención del almacén de imágenes: %d referencias y %d archivos expulsados (%d bytes)",
+                        result["references"], result["objects"], result["bytes"])
+        return result
+
+    @staticmethod
+    def _write(connection: sqlite3.Connection, operation: Callable[[], Any]) -> Any:
+        """
+        Ejecuta la operación en una transacción de escritura corta.
+        """
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            value = operation()
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return value
+
+    def _evict_objects(self, connection: sqlite3.Connection, candidates: Sequence[Tuple[str, str, int, float]],
+                       chunk_size: int, result: Dict[str, int]):
+        """
+        Expulsa los contenidos candidatos (digest, ruta, tamaño, last_referenced_at) en bloques de chunk_size.
+        Cada bloque borra sus filas y referencias en una transacción corta; los contenidos que un put() ha
+        vuelto a usar desde la lectura (last_referenced_at distinto) se conservan. Los archivos se eliminan
+        después del COMMIT.
+
+        Si un put() concurrente vuelve a registrar el mismo contenido entre el COMMIT y el borrado del
+        archivo, su fila quedaría apuntando a un archivo inexistente: tras borrar los archivos se eliminan
+        esas filas (la imagen se trata como expulsada y el siguiente put() del mismo contenido la reescribe).
+        """
+        for start in range(0, len(candidates), chunk_size):
+            chunk = candidates[start:start + chunk_size]
+
+            def delete_chunk():
+                removed = []
+                for digest, path, size, last_referenced_at in chunk:
+                    if connection.execute("DELETE FROM objects WHERE digest = ? AND last_referenced_at = ?",
+                                          (digest, last_referenced_at)).rowcount:
+                        result["references"] += connection.execute("DELETE FROM refs WHERE digest = ?",
+                                                                    (digest,)).rowcount
+                        removed.append((digest, path, size))
+                return removed
+
+            removed = self._write(connection, delete_chunk)
+            for _, path, size in removed:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                result["objects"] += 1
+                result["bytes"] += size
+            if not removed:
+                continue
+
+            def drop_readded():
+                placeholders = ", ".join("?" for _ in removed)
+                readded = connection.execute(f"SELECT digest, path FROM objects WHERE digest IN ({placeholders})",
+                                             [digest for digest, _, _ in removed]).fetchall()
+                for digest, path in readded:
+                    if not os.path.exists(path):
+                        logger.warning("Contenido %s registrado de nuevo durante su expulsión; se descarta.", digest)
+                        connection.execute("DELETE FROM refs WHERE digest = ?", (digest,))
+                        connection.execute("DELETE FROM objects WHERE digest = ?", (digest,))
+
+            self._write(connection, drop_readded)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Devuelve el tamaño del almacén y los contadores de escrituras, duplicados y expulsiones del proceso.
+        """
+        connection = self._connection()
+        objects, total_bytes = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects").fetchone()
+        references = connection.execute("SELECT COUNT(*) FROM refs").fetchone()[0]
+        by_endpoint = dict(connection.execute(
+            "SELECT refs.endpoint, SUM(objects.size) FROM refs JOIN objects ON objects.digest = refs.digest "
+            "GROUP BY refs.endpoint").fetchall())
+        with self._stats_lock:
+            counters = dict(self._stats)
+        return {"objects": objects, "references": references, "bytes": total_bytes,
+                "bytes_by_endpoint": by_endpoint, **counters}
+
+class _EvictionThread(threading.Thread):
+    """
+    Hilo que aplica la política de retención de los almacenes del proceso cada cierto intervalo.
+    Con varios workers de gunicorn cada proceso tiene su hilo, pero solo el que obtiene el bloqueo de
+    expulsión de un almacén (ImageStore.acquire_eviction_lock) aplica su retención.
+    """
+    def __init__(self, interval_seconds: float):
+        super().__init__(name="image-store-eviction", daemon=True)
+        self.interval_seconds = interval_seconds
+
+    def run(self):
+        while True:
+            time.sleep(self.interval_seconds)
+            for store in list(_image_stores.values()):
+                try:
+                    if store.acquire_eviction_lock():
+                        store.evict()
+                except Exception as e:
+                    logger.error(f"Error al aplicar la retención del almacén de imágenes: {e}", exc_info=True)
+
+_image_stores: Dict[str, ImageStore] = {}
+_image_stores_pid: Optional[int] = None
+_image_stores_lock = threading.Lock()
+
+def get_image_store(root: str) -> ImageStore:
+    """
+    Devuelve el almacén de imágenes del proceso actual para el directorio indicado y arranca, la primera
+    vez, el hilo de retención. Se recrea tras un fork porque los hilos y las conexiones no se heredan.
+    """
+    global _image_stores_pid
+    root = os.path.normpath(root)
+    with _image_stores_lock:
+        if _image_stores_pid != os.getpid():
+            _image_stores.clear()
+            _image_stores_pid = os.getpid()
+            if ImageStoreProperties.eviction_interval_seconds:
+                _EvictionThread(ImageStoreProperties.eviction_interval_seconds).start()
+        store = _image_stores.get(root)
+        if store is None:
+            store = _image_stores[root] = ImageStore(root)
+        return store
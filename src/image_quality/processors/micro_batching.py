@@ -0,0 +1,93 @@
+from src.image_quality.utils.properties import MicroBatchingProperties
+from src.image_quality.utils.metrics import observe_batch
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+import threading
+import logging
+import queue
+import time
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """
+    Planificador de micro-lotes para un modelo: los hilos de las peticiones entregan una entrada cada uno
+    y esperan su resultado, mientras un hilo propio agrupa las entradas pendientes hasta alcanzar
+    max_batch_size o hasta que la más antigua lleva max_wait_ms esperando, ejecuta el modelo una vez
+    sobre todo el lote y reparte los resultados. Así las peticiones concurrentes de /analyze_image_real_time
+    y /analyze_image_gallery comparten una única inferencia por lote.
+    """
+    def __init__(self, name: str, infer: Callable[[List[Any]], List[Any]], max_batch_size: Optional[int] = None,
+                 max_wait_ms: Optional[float] = None, timeout_seconds: Optional[float] = None):
+        """
+        Inicializa el planificador y arranca su hilo.
+
+        :param name: Nombre de la métrica (etiqueta de las métricas de Prometheus).
+        :param infer: Función que recibe la lista de entradas de un lote y devuelve un resultado por entrada, en el mismo orden.
+        :param max_batch_size: Tamaño máximo del lote (por defecto MicroBatchingProperties.max_batch_size).
+        :param max_wait_ms: Espera máxima de la primera entrada del lote (por defecto MicroBatchingProperties.max_wait_ms).
+        :param timeout_seconds: Tiempo máximo que una petición espera su resultado.
+        """
+        self.name = name
+        self.infer = infer
+        self.max_batch_size = max(1, max_batch_size or MicroBatchingProperties.max_batch_size)
+        self.max_wait_seconds = (MicroBatchingProperties.max_wait_ms if max_wait_ms is None else max_wait_ms) / 1000
+        self.timeout_seconds = timeout_seconds or MicroBatchingProperties.timeout_seconds
+        self._queue: "queue.Queue[Tuple[Any, Future, float]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"micro-batch-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Any:
+        """
+        Entrega una entrada y bloquea hasta que su lote se ha procesado.
+
+        :param item: Entrada del modelo (por ejemplo un tensor [1, 3, H, W]).
+        :return: Resultado de la entrada.
+        """
+        future: Future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future.result(timeout=self.timeout_seconds)
+
+    def _collect(self) -> List[Tuple[Any, Future, float]]:
+        """
+        Espera la primera entrada y añade las que lleguen hasta llenar el lote o agotar la espera máxima.
+        """
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.max_wait_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """
+        Bucle del hilo del planificador. Cualquier error se registra y el bucle continúa, para que un fallo
+        inesperado no deje sin hilo a las peticiones que esperan su resultado.
+        """
+        while True:
+            batch: List[Tuple[Any, Future, float]] = []
+            try:
+                batch = self._collect()
+                started = time.perf_counter()
+                items = [item for item, _, _ in batch]
+                results = self.infer(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"El modelo devolvió {len(results)} resultados para un lote de {len(items)}.")
+                inference_seconds = time.perf_counter() - started
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"Error en el lote de {self.name}: {e}", exc_info=True)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            try:
+                observe_batch(self.name, len(batch), [started - enqueued for _, _, enqueued in batch],
+                              inference_seconds)
+            except Exception as e:
+                logger.warning(f"No se pudieron registrar las métricas del lote de {self.name}: {e}")
@@ -0,0 +1,318 @@
+from src.image_quality.processors.response_handler import ResponseHandler
+from src.image_quality.processors.image_output import ImageOutput
+from src.image_quality.processors.image_store import get_image_store
+from src.image_quality.utils.properties import ImageStoreProperties, PersistenceProperties
+from src.image_quality.utils.metrics import current_endpoint, record_error, stage_timer
+from typing import Any, Dict, List, Optional
+from collections import defaultdict
+import threading
+import logging
+import atexit
+import queue
+import time
+import cv2
+import os
+
+logger = logging.getLogger(__name__)
+
+class PersistenceQueue:
+    """
+    Cola acotada de persistencia en segundo plano (write-behind) para imágenes y respuestas.
+
+    Las peticiones encolan las escrituras y devuelven la respuesta en cuanto termina el análisis;
+    uno o varios hilos vacían la cola agrupando las respuestas por almacén en un único bloqueo.
+    """
+    def __init__(self, max_queue_size: Optional[int] = None, workers: Optional[int] = None,
+                 batch_size: Optional[int] = None, full_queue_policy: Optional[str] = None,
+                 block_timeout_seconds: Optional[float] = None):
+        """
+        Inicializa la cola con la configuración de PersistenceProperties salvo que se indique otra.
+
+        :param max_queue_size: Número máximo de tareas pendientes.
+        :param workers: Número de hilos de escritura.
+        :param batch_size: Número máximo de tareas agrupadas por iteración.
+        :param full_queue_policy: "block", "drop" o "spill".
+        :param block_timeout_seconds: Espera máxima con la política "block".
+        """
+        self.max_queue_size = max_queue_size or PersistenceProperties.max_queue_size
+        self.workers = workers or PersistenceProperties.workers
+        self.batch_size = batch_size or PersistenceProperties.batch_size
+        self.full_queue_policy = full_queue_policy or PersistenceProperties.full_queue_policy
+        self.block_timeout_seconds = (block_timeout_seconds if block_timeout_seconds is not None
+                                      else PersistenceProperties.block_timeout_seconds)
+        if self.full_queue_policy not in ("block", "drop", "spill"):
+            raise ValueError(f"Política de cola llena no soportada: {self.full_queue_policy}")
+
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=self.max_queue_size)
+        self._threads: List[threading.Thread] = []
+        self._stats_lock = threading.Lock()
+        self._handlers: Dict[str, ResponseHandler] = {}
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "failed": 0,
+            "dropped": 0,
+            "spilled": 0,
+            "blocked": 0,
+            "max_depth": 0,
+        }
+        self._running = False
+
+    def start(self):
+        """
+        Arranca los hilos de escritura si no están en marcha.
+        """
+        if self._running:
+            return
+        self._running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"persistence-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit_image(self, image_path: str, image: Any) -> bool:
+        """
+        Encola la escritura de una imagen.
+
+        :param image_path: Ruta de destino.
+        :param image: ImageOutput, imagen en formato OpenCV (numpy array) o bytes ya codificados.
+        :return: True si la tarea se encoló o escribió, False si se descartó.
+        """
+        return self._submit({"kind": "image", "path": image_path, "image": image, "endpoint": current_endpoint()})
+
+    def submit_response(self, store_dir: str, response_data: Dict[str, Any]) -> bool:
+        """
+        Encola la escritura de una respuesta en un almacén de ResponseHandler.
+
+        :param store_dir: Directorio del almacén de respuestas.
+        :param response_data: Diccionario con los datos de la respuesta.
+        :return: True si la tarea se encoló o escribió, False si se descartó.
+        """
+        return self._submit({"kind": "response", "store_dir": store_dir, "data": response_data,
+                             "timestamp": time.time(), "endpoint": current_endpoint()})
+
+    def _submit(self, task: Dict[str, Any]) -> bool:
+        try:
+            self._queue.put_nowait(task)
+        except queue.Full:
+            if self.full_queue_policy == "drop":
+                self._increment("dropped")
+                logger.warning(f"Cola de persistencia llena; tarea descartada ({task['kind']}).")
+                return False
+            if self.full_queue_policy == "block":
+                self._increment("blocked")
+                try:
+                    self._queue.put(task, timeout=self.block_timeout_seconds)
+                except queue.Full:
+                    logger.warning("Cola de persistencia llena tras esperar; se escribe en la petición.")
+                    self._write_batch([task])
+                    self._increment("spilled")
+                    return True
+            else:
+                self._write_batch([task])
+                self._increment("spilled")
+                return True
+
+        self._increment("enqueued")
+        with self._stats_lock:
+            self._stats["max_depth"] = max(self._stats["max_depth"], self._queue.qsize())
+        return True
+
+    def _increment(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _worker_loop(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                self._queue.task_done()
+                return
+            batch = [task]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    next_task = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if next_task is None:
+                    stop = True
+                    break
+                batch.append(next_task)
+
+            try:
+                self._write_batch(batch)
+            except Exception:
+                # Un error inesperado no debe detener el hilo: la cola dejaría de vaciarse.
+                logger.exception(f"Error al escribir un lote de {len(batch)} tareas en segundo plano.")
+                record_error("persistence")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+                if stop:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _handler(self, store_dir: str) -> ResponseHandler:
+        handler = self._handlers.get(store_dir)
+        if handler is None:
+            handler = self._handlers.setdefault(store_dir, ResponseHandler(store_dir))
+        return handler
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        """
+        Escribe un lote de tareas: imágenes una a una y respuestas agrupadas por almacén y endpoint.
+        """
+        responses_by_store = defaultdict(list)
+        for task in batch:
+            if task["kind"] == "response":
+                responses_by_store[(task["store_dir"], task["endpoint"])].append((task["data"], task["timestamp"]))
+                continue
+            try:
+                write_image(task["path"], task["image"], task["endpoint"])
+                self._increment("written")
+            except Exception as e:
+                self._increment("failed")
+                logger.error(f"Error al guardar la imagen en segundo plano: {e}", exc_info=True)
+
+        for (store_dir, endpoint), records in responses_by_store.items():
+            try:
+                with stage_timer("response_persist", endpoint):
+                    result = self._handler(store_dir).save_responses(records)
+            except Exception as e:
+                self._increment("failed", len(records))
+                logger.error(f"Error al guardar {len(records)} respuestas en {store_dir}: {e}", exc_info=True)
+                continue
+            if result.get("is_valid"):
+                self._increment("written", len(records))
+            else:
+                self._increment("failed", len(records))
+                record_error("response_persist", endpoint)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Espera a que se escriban todas las tareas pendientes.
+
+        :param timeout: Tiempo máximo de espera en segundos (None para esperar indefinidamente).
+        :return: True si la cola quedó vacía.
+        """
+        if not self._running:
+            pending = []
+            while True:
+                try:
+                    pending.append(self._queue.get_nowait())
+                    self._queue.task_done()
+                except queue.Empty:
+                    break
+            self._write_batch([task for task in pending if task is not None])
+            return True
+
+        deadline = None if timeout is None else time.time() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def shutdown(self, timeout: Optional[float] = None):
+        """
+        Vacía la cola y detiene los hilos de escritura.
+
+        :param timeout: Tiempo máximo de espera en segundos.
+        """
+        if not self._running:
+            self.flush()
+            return
+        self.flush(timeout)
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._running = False
+        logger.info(f"Cola de persistencia detenida: {self.stats()}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Devuelve las métricas de contrapresión de la cola.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["depth"] = self._queue.qsize()
+        stats["capacity"] = self.max_queue_size
+        stats["full_queue_policy"] = self.full_queue_policy
+        return stats
+
+def write_image(image_path: str, image: Any, endpoint: Optional[str] = None):
+    """
+    Escribe una imagen en disco a partir de un ImageOutput, bytes ya codificados o un numpy array.
+    Con ImageStoreProperties.enabled la ruta es lógica: el contenido se guarda en el almacén de su
+    directorio y la ruta se resuelve con ImageStore.resolve.
+
+    :param image_path: Ruta de destino.
+    :param image: Imagen a escribir.
+    :param endpoint: Endpoint que originó la escritura (para las métricas); por defecto el del contexto actual.
+    """
+    with stage_timer("image_write", endpoint):
+        if isinstance(image, ImageOutput):
+            image = image.encoded()
+        if ImageStoreProperties.enabled:
+            if not isinstance(image, (bytes, bytearray, memoryview)):
+                success, buffer = cv2.imencode(os.path.splitext(image_path)[1], image)
+                if not success:
+                    raise OSError(f"cv2.imencode no pudo codificar {image_path}")
+                image = buffer.tobytes()
+            get_image_store(os.path.dirname(image_path)).put(image_path, bytes(image), endpoint or current_endpoint())
+            return
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            with open(image_path, "wb") as f:
+                f.write(image)
+        elif not cv2.imwrite(image_path, image):
+            raise OSError(f"cv2.imwrite no pudo escribir {image_path}")
+
+_persistence_queue: Optional[PersistenceQueue] = None
+_persistence_queue_pid: Optional[int] = None
+_persistence_queue_lock = threading.Lock()
+
+def get_persistence_queue() -> PersistenceQueue:
+    """
+    Devuelve la cola de persistencia del proceso actual, creándola en el primer uso.
+    Se recrea tras un fork (por ejemplo, workers de gunicorn con preload) porque los hilos no se heredan.
+    """
+    global _persistence_queue, _persistence_queue_pid
+    with _persistence_queue_lock:
+        if _persistence_queue is None or _persistence_queue_pid != os.getpid():
+            _persistence_queue = PersistenceQueue()
+            _persistence_queue.start()
+            _persistence_queue_pid = os.getpid()
+            atexit.register(_persistence_queue.shutdown)
+        return _persistence_queue
+
+def persist_image(image_path: str, image: Any):
+    """
+    Guarda una imagen en segundo plano si la persistencia asíncrona está activa o de forma síncrona si no.
+
+    :param image_path: Ruta de destino.
+    :param image: Imagen en formato OpenCV (numpy array) o bytes ya codificados.
+    """
+    if PersistenceProperties.enabled:
+        get_persistence_queue().submit_image(image_path, image)
+        return
+    write_image(image_path, image)
+
+def persist_response(store_dir: str, response_data: Dict[str, Any]):
+    """
+    Guarda una respuesta en segundo plano si la persistencia asíncrona está activa o de forma síncrona si no.
+
+    :param store_dir: Directorio del almacén de respuestas.
+    :param response_data: Diccionario con los datos de la respuesta.
+    """
+    if PersistenceProperties.enabled:
+        get_persistence_queue().submit_response(store_dir, response_data)
+        return
+    with stage_timer("response_persist"):
+        result = ResponseHandler(store_dir).save_response(response_data)
+    if not result.get("is_valid"):
+        record_error("response_persist")
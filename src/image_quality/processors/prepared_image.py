@@ -0,0 +1,74 @@
+from typing import Optional, Tuple, Union
+import numpy as np
+import cv2
+
+class PreparedImage:
+    """
+    Clase que envuelve una imagen BGR y calcula de forma perezosa, una única vez por fotograma,
+    las conversiones de color compartidas por los analizadores (escala de grises, HSV y canales HSV).
+    """
+    def __init__(self, image: np.ndarray):
+        """
+        Inicializa el contenedor con la imagen original.
+
+        :param image: Imagen en formato BGR (o escala de grises) como numpy array.
+        """
+        self.image = image
+        self._gray: Optional[np.ndarray] = None
+        self._hsv: Optional[np.ndarray] = None
+        self._hsv_channels: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    @classmethod
+    def from_image(cls, image: Union["PreparedImage", np.ndarray, None]) -> Optional["PreparedImage"]:
+        """
+        Devuelve un PreparedImage a partir de una imagen o reutiliza el existente.
+
+        :param image: Imagen en formato OpenCV o un PreparedImage ya construido.
+        :return: Instancia de PreparedImage o None si la imagen no es válida.
+        """
+        if isinstance(image, cls):
+            return image
+        if image is None or not isinstance(image, np.ndarray) or image.size == 0:
+            return None
+        return cls(image)
+
+    @property
+    def is_color(self) -> bool:
+        """
+        Indica si la imagen tiene tres canales de color.
+        """
+        return len(self.image.shape) == 3
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        """
+        Dimensiones de la imagen original.
+        """
+        return self.image.shape
+
+    @property
+    def gray(self) -> np.ndarray:
+        """
+        Imagen en escala de grises, calculada en el primer acceso.
+        """
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY) if self.is_color else self.image
+        return self._gray
+
+    @property
+    def hsv(self) -> np.ndarray:
+        """
+        Imagen en espacio HSV, calculada en el primer acceso.
+        """
+        if self._hsv is None:
+            self._hsv = cv2.cvtColor(self.image, cv2.COLOR_BGR2HSV)
+        return self._hsv
+
+    @property
+    def hsv_channels(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Canales H, S y V separados, calculados en el primer acceso.
+        """
+        if self._hsv_channels is None:
+            self._hsv_channels = tuple(cv2.split(self.hsv))
+        return self._hsv_channels
@@ -0,0 +1,49 @@
+from typing import Any, Dict, Optional
+from flask import request
+import logging
+import json
+
+logger = logging.getLogger(__name__)
+
+CLIENT_INFO_HEADER = "X-Client-Info"
+CLIENT_INFO_FORM_FIELD = "client_info"
+IMAGE_FORM_FIELD = "image"
+
+def parse_client_fields(raw: Optional[str]) -> Dict[str, Any]:
+    """
+    Convierte el JSON de información del cliente (cabecera o campo de formulario) en un diccionario.
+
+    :param raw: Cadena JSON o None.
+    :return: Diccionario con los campos del cliente (vacío si no hay o es inválido).
+    """
+    if not raw:
+        return {}
+    try:
+        fields = json.loads(raw)
+        return fields if isinstance(fields, dict) else {}
+    except ValueError:
+        logger.warning("La información del cliente no es un JSON válido; se ignora.")
+        return {}
+
+def request_payload() -> Dict[str, Any]:
+    """
+    Lee la petición actual y devuelve la imagen y los campos del cliente con independencia del formato:
+    - application/json: imagen en Base64 en el campo "image" (formato heredado).
+    - multipart/form-data: archivo "image" y campo "client_info" con JSON.
+    - image/jpeg, image/png, application/octet-stream: cuerpo binario y cabecera "X-Client-Info" con JSON.
+
+    :return: Diccionario con "image_base64", "image_bytes" y "fields".
+    """
+    if request.is_json:
+        fields = request.get_json(silent=True) or {}
+        return {"image_base64": fields.get("image") or None, "image_bytes": None, "fields": fields}
+
+    if request.mimetype == "multipart/form-data":
+        upload = request.files.get(IMAGE_FORM_FIELD)
+        image_bytes = upload.read() if upload else None
+        fields = parse_client_fields(request.form.get(CLIENT_INFO_FORM_FIELD))
+        return {"image_base64": None, "image_bytes": image_bytes or None, "fields": fields}
+
+    image_bytes = request.get_data(cache=False)
+    fields = parse_client_fields(request.headers.get(CLIENT_INFO_HEADER))
+    return {"image_base64": None, "image_bytes": image_bytes or None, "fields": fields}
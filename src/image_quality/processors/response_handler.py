@@ -1,26 +1,63 @@
-from typing import Any, Dict
+from src.image_quality.processors.result_store import index_responses
+from src.image_quality.utils.properties import ResponseStoreProperties
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import hashlib
 import logging
+import shutil
 import json
+import time
 import os
 import numpy as np
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
 
 class ResponseHandler:
     """
-    Clase para manejar la lectura y escritura de respuestas en un archivo JSON.
+    Clase para manejar la lectura y escritura de respuestas en un almacén JSON Lines segmentado.
+
+    Cada respuesta se anexa como una línea al segmento activo, y un índice lateral (index.jsonl)
+    registra image_id, marca de tiempo, segmento y desplazamiento. Las escrituras están protegidas
+    por un bloqueo de archivo, por lo que varios procesos de gunicorn pueden anexar a la vez.
+
+    Para no recorrer todo el índice en cada búsqueda:
+    - segments.jsonl guarda, al rotar cada segmento, el tramo del índice que ocupan sus entradas y sus
+      marcas de tiempo mínima y máxima; find_by_time_range solo lee los tramos que se solapan con el rango.
+    - ids/<xx>.jsonl reparte las entradas en 256 archivos según el hash del image_id; find_by_image_id
+      solo lee uno.
+    INDEXED_FROM indica desde qué desplazamiento del índice están completas estas estructuras; las
+    entradas anteriores (almacenes creados antes de existir) se recorren enteras hasta que
+    rebuild_sidecar_index() las incorpora.
     """
-    def __init__(self, filename: str):
+    segment_prefix = "segment_"
+    segment_suffix = ".jsonl"
+    index_filename = "index.jsonl"
+    segments_filename = "segments.jsonl"
+    ids_dirname = "ids"
+    indexed_from_filename = "INDEXED_FROM"
+    current_filename = "CURRENT"
+    lock_filename = ".lock"
+
+    def __init__(self, store_dir: str, max_segment_bytes: Optional[int] = None,
+                 max_segment_age_seconds: Optional[float] = None, fsync: Optional[bool] = None):
         """
-        Inicializa la clase con el archivo donde se guardarán las respuestas.
+        Inicializa la clase con el directorio donde se guardarán las respuestas.
 
-        :param filename: Ruta del archivo JSON donde se almacenarán las respuestas.
+        :param store_dir: Directorio del almacén segmentado.
+        :param max_segment_bytes: Tamaño máximo de un segmento antes de rotar.
+        :param max_segment_age_seconds: Antigüedad máxima de un segmento antes de rotar.
+        :param fsync: Si True, fuerza fsync tras cada escritura.
         """
-        self.filename = filename
-        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        self.store_dir = store_dir
+        self.max_segment_bytes = max_segment_bytes or ResponseStoreProperties.max_segment_bytes
+        self.max_segment_age_seconds = (max_segment_age_seconds if max_segment_age_seconds is not None
+                                        else ResponseStoreProperties.max_segment_age_seconds)
+        self.fsync = ResponseStoreProperties.fsync if fsync is None else fsync
+        os.makedirs(self.store_dir, exist_ok=True)
 
     @staticmethod
     def convert_to_native(results: Dict[str, Any]) -> Dict[str, Any]:
@@ -45,47 +82,417 @@ class ResponseHandler:
 
         return {k: _convert_value(v) for k, v in results.items()}
 
-    def _initialize_responses_file(self):
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.store_dir, filename)
+
+    def _acquire_lock(self) -> int:
+        """
+        Abre el archivo de bloqueo y obtiene un bloqueo exclusivo entre procesos.
+
+        :return: Descriptor del archivo de bloqueo.
+        """
+        lock_fd = os.open(self._path(self.lock_filename), os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        return lock_fd
+
+    @staticmethod
+    def _release_lock(lock_fd: int):
+        if fcntl is not None:
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+        os.close(lock_fd)
+
+    def _new_segment_name(self) -> str:
+        return f"{self.segment_prefix}{int(time.time() * 1000):013d}{self.segment_suffix}"
+
+    @classmethod
+    def _segment_created_at(cls, segment_name: str) -> float:
+        return int(segment_name[len(cls.segment_prefix):-len(cls.segment_suffix)]) / 1000
+
+    def _current_segment(self, incoming_bytes: int) -> str:
         """
-        Crea un archivo JSON vacío si no existe.
+        Devuelve el segmento activo, rotando si supera el tamaño o la antigüedad máxima.
+        Debe llamarse con el bloqueo adquirido.
+
+        :param incoming_bytes: Tamaño de la línea que se va a escribir.
+        :return: Nombre del segmento donde anexar.
+        """
+        current_path = self._path(self.current_filename)
+        segment_name = None
+        if os.path.exists(current_path):
+            with open(current_path, "r") as f:
+                segment_name = f.read().strip() or None
+
+        if segment_name is not None:
+            segment_path = self._path(segment_name)
+            size = os.path.getsize(segment_path) if os.path.exists(segment_path) else 0
+            too_big = size > 0 and size + incoming_bytes > self.max_segment_bytes
+            too_old = (self.max_segment_age_seconds is not None and
+                       time.time() - self._segment_created_at(segment_name) > self.max_segment_age_seconds)
+            if not (too_big or too_old):
+                return segment_name
+            logger.info("Rotando segmento de respuestas: %s", segment_name)
+            self._seal_segment(segment_name)
+
+        new_segment_name = self._new_segment_name()
+        if new_segment_name == segment_name:
+            time.sleep(0.001)
+            new_segment_name = self._new_segment_name()
+        tmp_path = current_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(new_segment_name)
+        os.replace(tmp_path, current_path)
+        return new_segment_name
+
+    def _append(self, filename: str, payload: bytes) -> int:
+        """
+        Anexa bytes a un archivo del almacén con una única escritura.
+
+        :return: Desplazamiento en el que comenzó la escritura.
+        """
+        fd = os.open(self._path(filename), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            offset = os.fstat(fd).st_size
+            os.write(fd, payload)
+            if self.fsync:
+                os.fsync(fd)
+            return offset
+        finally:
+            os.close(fd)
+
+    def _read_text(self, filename: str) -> Optional[str]:
+        path = self._path(filename)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return f.read().strip()
+
+    def _write_text(self, filename: str, text: str):
+        tmp_path = self._path(filename) + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, self._path(filename))
+
+    def _indexed_from(self) -> Optional[int]:
         """
-        if not os.path.exists(self.filename):
-            logging.info(f"El archivo no existe. Creando nuevo: {self.filename}")
-            with open(self.filename, "w") as f:
-                json.dump([], f)
+        Desplazamiento del índice desde el que segments.jsonl e ids/ están completos, o None si
+        todavía no existen (en ese caso las búsquedas recorren el índice entero).
+        """
+        text = self._read_text(self.indexed_from_filename)
+        return int(text) if text else None
+
+    def _index_size(self) -> int:
+        index_path = self._path(self.index_filename)
+        return os.path.getsize(index_path) if os.path.exists(index_path) else 0
+
+    def _ensure_indexed_from(self):
+        """
+        Empieza a mantener segments.jsonl e ids/ a partir del final actual del índice.
+        Debe llamarse con el bloqueo adquirido.
+        """
+        if self._indexed_from() is not None:
+            return
+        # Sin INDEXED_FROM, cualquier resto de una reconstrucción interrumpida no es fiable
+        if os.path.exists(self._path(self.segments_filename)):
+            os.remove(self._path(self.segments_filename))
+        shutil.rmtree(self._path(self.ids_dirname), ignore_errors=True)
+        self._write_text(self.indexed_from_filename, str(self._index_size()))
+
+    def _sealed_segments(self) -> List[Dict[str, Any]]:
+        """
+        Entradas de segments.jsonl: segmento, tramo del índice (index_start, index_end) y marcas de tiempo
+        mínima y máxima de sus respuestas.
+        """
+        path = self._path(self.segments_filename)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _active_index_start(self, sealed: List[Dict[str, Any]], indexed_from: int) -> int:
+        """
+        Desplazamiento del índice donde empiezan las entradas del segmento activo.
+        """
+        return max(sealed[-1]["index_end"] if sealed else 0, indexed_from)
+
+    def _read_index_range(self, start: int, end: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Recorre las entradas del índice entre dos desplazamientos (end None para llegar al final).
+        """
+        index_path = self._path(self.index_filename)
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, "rb") as f:
+            f.seek(start)
+            while end is None or f.tell() < end:
+                line = f.readline()
+                if not line:
+                    break
+                if line.strip():
+                    yield json.loads(line)
+
+    def _seal_segment(self, segment_name: str):
+        """
+        Registra en segments.jsonl el tramo del índice y las marcas de tiempo del segmento que se cierra.
+        Debe llamarse con el bloqueo adquirido.
+        """
+        indexed_from = self._indexed_from()
+        if indexed_from is None:
+            return
+        start = self._active_index_start(self._sealed_segments(), indexed_from)
+        end = self._index_size()
+        timestamps = [entry["timestamp"] for entry in self._read_index_range(start, end)]
+        if not timestamps:
+            return
+        summary = {"segment": segment_name, "index_start": start, "index_end": end,
+                   "min_timestamp": min(timestamps), "max_timestamp": max(timestamps)}
+        self._append(self.segments_filename, (json.dumps(summary) + "\n").encode("utf-8"))
+
+    @staticmethod
+    def _id_bucket(image_id: str) -> str:
+        return hashlib.sha1(image_id.encode("utf-8")).hexdigest()[:2] + ".jsonl"
+
+    def _append_records(self, records: List[Tuple[Dict[str, Any], float]]):
+        """
+        Anexa varias respuestas ya convertidas bajo un único bloqueo.
+
+        :param records: Lista de tuplas (respuesta, marca de tiempo).
+        """
+        lock_fd = self._acquire_lock()
+        try:
+            self._ensure_indexed_from()
+            os.makedirs(self._path(self.ids_dirname), exist_ok=True)
+            for native_data, timestamp in records:
+                line = (json.dumps(native_data, ensure_ascii=False) + "\n").encode("utf-8")
+                segment_name = self._current_segment(len(line))
+                offset = self._append(segment_name, line)
+                index_entry = {
+                    "image_id": native_data.get("image_id"),
+                    "timestamp": timestamp,
+                    "segment": segment_name,
+                    "offset": offset,
+                    "length": len(line),
+                }
+                index_line = (json.dumps(index_entry) + "\n").encode("utf-8")
+                self._append(self.index_filename, index_line)
+                if index_entry["image_id"] is not None:
+                    self._append(os.path.join(self.ids_dirname, self._id_bucket(index_entry["image_id"])), index_line)
+        finally:
+            self._release_lock(lock_fd)
+        index_responses(self.store_dir, records)
 
     def save_response(self, response_data: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Guarda una respuesta en el archivo JSON después de convertir los datos a tipos nativos.
+        Anexa una respuesta al almacén después de convertir los datos a tipos nativos.
+        El coste es constante: no se lee ni reescribe el historial existente.
 
         :param response_data: Diccionario con los datos de la respuesta.
         :return: Diccionario con información sobre el éxito o error del proceso.
         """
         if not isinstance(response_data, dict):
-            logging.error("El parámetro response_data debe ser un diccionario.")
+            logger.error("El parámetro response_data debe ser un diccionario.")
             return {"is_valid": False}
 
         try:
-            self._initialize_responses_file()
-
-            with open(self.filename, "r") as f:
-                responses = json.load(f)
-
             native_data = self.convert_to_native(response_data)
-            responses.append(native_data)
-
-            with open(self.filename, "w") as f:
-                json.dump(responses, f, indent=4)
+            self._append_records([(native_data, time.time())])
 
-            logging.info("Respuesta guardada exitosamente.")
+            logger.debug("Respuesta guardada exitosamente.")
             return {"is_valid": True}
 
-        except json.JSONDecodeError as jde:
-            logging.error(f"Error al decodificar JSON: {jde}", exc_info=True)
-            return {"is_valid": False, "error": "JSONDecodeError"}
+        except (TypeError, ValueError) as ve:
+            logger.error(f"Error al serializar la respuesta a JSON: {ve}", exc_info=True)
+            return {"is_valid": False, "error": "SerializationError"}
         except OSError as ose:
-            logging.error(f"Error del sistema al manejar el archivo: {ose}", exc_info=True)
+            logger.error(f"Error del sistema al manejar el archivo: {ose}", exc_info=True)
             return {"is_valid": False, "error": "OSError"}
         except Exception as e:
-            logging.error(f"No se pudo guardar la respuesta en JSON: {e}", exc_info=True)
-            return {"is_valid": False, "error": str(e)}
\ No newline at end of file
+            logger.error(f"No se pudo guardar la respuesta en JSON: {e}", exc_info=True)
+            return {"is_valid": False, "error": str(e)}
+
+    def save_responses(self, records: List[Tuple[Dict[str, Any], float]]) -> Dict[str, Any]:
+        """
+        Anexa un lote de respuestas bajo un único bloqueo.
+
+        :param records: Lista de tuplas (respuesta, marca de tiempo en epoch).
+        :return: Diccionario con el número de respuestas guardadas y la validez del proceso.
+        """
+        try:
+            self._append_records([(self.convert_to_native(data), timestamp) for data, timestamp in records])
+            return {"saved": len(records), "is_valid": True}
+        except Exception as e:
+            logger.error(f"No se pudo guardar el lote de respuestas: {e}", exc_info=True)
+            return {"saved": 0, "is_valid": False, "error": str(e)}
+
+    def iter_index(self) -> Iterator[Dict[str, Any]]:
+        """
+        Recorre las entradas del índice lateral en orden de escritura.
+        """
+        index_path = self._path(self.index_filename)
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, "r") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def read_entry(self, index_entry: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Lee una respuesta concreta a partir de su entrada en el índice.
+
+        :param index_entry: Entrada con segment, offset y length.
+        :return: Respuesta almacenada.
+        """
+        with open(self._path(index_entry["segment"]), "rb") as f:
+            f.seek(index_entry["offset"])
+            return json.loads(f.read(index_entry["length"]))
+
+    def find_by_image_id(self, image_id: str) -> List[Dict[str, Any]]:
+        """
+        Busca las respuestas asociadas a un image_id. Solo se lee el archivo de ids/ que le corresponde
+        (y las entradas anteriores a INDEXED_FROM, si las hay).
+
+        :param image_id: Identificador de la imagen.
+        :return: Lista de respuestas encontradas.
+        """
+        indexed_from = self._indexed_from()
+        if indexed_from is None:
+            entries = self._read_index_range(0)
+        else:
+            entries = list(self._read_index_range(0, indexed_from))
+            bucket_path = self._path(os.path.join(self.ids_dirname, self._id_bucket(image_id)))
+            if os.path.exists(bucket_path):
+                with open(bucket_path, "r") as f:
+                    entries.extend(json.loads(line) for line in f if line.strip())
+        return [self.read_entry(entry) for entry in entries if entry.get("image_id") == image_id]
+
+    def find_by_time_range(self, start: Optional[float] = None, end: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Devuelve las respuestas guardadas entre dos marcas de tiempo (epoch en segundos). De los segmentos
+        cerrados solo se leen los tramos del índice cuyas marcas de tiempo se solapan con el rango.
+
+        :param start: Marca de tiempo inicial (incluida) o None.
+        :param end: Marca de tiempo final (excluida) o None.
+        :return: Lista de respuestas encontradas.
+        """
+        indexed_from = self._indexed_from()
+        if indexed_from is None:
+            ranges = [(0, None)]
+        else:
+            sealed = self._sealed_segments()
+            ranges = [(0, indexed_from)] if indexed_from else []
+            ranges += [(segment["index_start"], segment["index_end"]) for segment in sealed
+                       if (start is None or segment["max_timestamp"] >= start)
+                       and (end is None or segment["min_timestamp"] < end)]
+            ranges.append((self._active_index_start(sealed, indexed_from), None))
+
+        return [self.read_entry(entry) for range_start, range_end in ranges
+                for entry in self._read_index_range(range_start, range_end)
+                if (start is None or entry["timestamp"] >= start) and (end is None or entry["timestamp"] < end)]
+
+    def rebuild_sidecar_index(self) -> Dict[str, Any]:
+        """
+        Reconstruye segments.jsonl e ids/ a partir de todo el índice, para que las búsquedas dejen de
+        recorrer las entradas anteriores a INDEXED_FROM. No hace nada si ya están completos.
+
+        :return: Diccionario con el número de entradas y segmentos cerrados indexados.
+        """
+        lock_fd = self._acquire_lock()
+        try:
+            if self._indexed_from() == 0:
+                return {"entries": 0, "segments": 0, "is_valid": True}
+            # Sin INDEXED_FROM las búsquedas recorren el índice entero mientras se reconstruye
+            if os.path.exists(self._path(self.indexed_from_filename)):
+                os.remove(self._path(self.indexed_from_filename))
+
+            ids_tmp = self._path(self.ids_dirname + ".tmp")
+            shutil.rmtree(ids_tmp, ignore_errors=True)
+            os.makedirs(ids_tmp)
+            sealed: List[Dict[str, Any]] = []
+            current = None
+            entries = 0
+            index_path = self._path(self.index_filename)
+            if os.path.exists(index_path):
+                with open(index_path, "rb") as f:
+                    while True:
+                        offset = f.tell()
+                        line = f.readline()
+                        if not line:
+                            break
+                        if not line.strip():
+                            continue
+                        entry = json.loads(line)
+                        entries += 1
+                        if current is None or current["segment"] != entry["segment"]:
+                            if current is not None:
+                                sealed.append(current)
+                            current = {"segment": entry["segment"], "index_start": offset,
+                                       "min_timestamp": entry["timestamp"], "max_timestamp": entry["timestamp"]}
+                        current["index_end"] = f.tell()
+                        current["min_timestamp"] = min(current["min_timestamp"], entry["timestamp"])
+                        current["max_timestamp"] = max(current["max_timestamp"], entry["timestamp"])
+                        if entry.get("image_id") is not None:
+                            with open(os.path.join(ids_tmp, self._id_bucket(entry["image_id"])), "ab") as bucket:
+                                bucket.write(line)
+            if current is not None and current["segment"] != self._read_text(self.current_filename):
+                sealed.append(current)
+
+            self._write_text(self.segments_filename, "".join(json.dumps(segment) + "\n" for segment in sealed))
+            shutil.rmtree(self._path(self.ids_dirname), ignore_errors=True)
+            os.replace(ids_tmp, self._path(self.ids_dirname))
+            self._write_text(self.indexed_from_filename, "0")
+            logger.info("Índice lateral de %s reconstruido: %d entradas, %d segmentos cerrados",
+                        self.store_dir, entries, len(sealed))
+            return {"entries": entries, "segments": len(sealed), "is_valid": True}
+        finally:
+            self._release_lock(lock_fd)
+
+    def iter_responses(self) -> Iterator[Dict[str, Any]]:
+        """
+        Recorre todas las respuestas de todos los segmentos en orden cronológico.
+        """
+        segments = sorted(name for name in os.listdir(self.store_dir)
+                          if name.startswith(self.segment_prefix) and name.endswith(self.segment_suffix))
+        for segment_name in segments:
+            with open(self._path(segment_name), "r") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    def migrate_legacy_file(self, legacy_filename: str) -> Dict[str, Any]:
+        """
+        Migra un archivo JSON heredado (un array de respuestas) al almacén segmentado.
+        El archivo original se renombra con el sufijo ".migrated" para no migrarlo dos veces.
+
+        :param legacy_filename: Ruta del archivo JSON heredado.
+        :return: Diccionario con el número de respuestas migradas, el de entradas omitidas por no ser
+                 objetos JSON y la validez del proceso.
+        """
+        if not os.path.exists(legacy_filename):
+            logger.info(f"No existe el archivo heredado: {legacy_filename}")
+            return {"migrated": 0, "skipped": 0, "is_valid": True}
+
+        try:
+            with open(legacy_filename, "r") as f:
+                responses = json.load(f)
+            if not isinstance(responses, list):
+                raise ValueError("El archivo heredado no contiene un array JSON.")
+
+            timestamp = os.path.getmtime(legacy_filename)
+            records = [(self.convert_to_native(response), timestamp)
+                       for response in responses if isinstance(response, dict)]
+            skipped = len(responses) - len(records)
+            self._append_records(records)
+            os.replace(legacy_filename, legacy_filename + ".migrated")
+
+            if skipped:
+                logger.warning(f"Se omitieron {skipped} entradas que no son objetos JSON en {legacy_filename}")
+            logger.info(f"Migradas {len(records)} respuestas desde {legacy_filename} a {self.store_dir}")
+            return {"migrated": len(records), "skipped": skipped, "is_valid": True}
+
+        except json.JSONDecodeError as jde:
+            logger.error(f"Error al decodificar JSON: {jde}", exc_info=True)
+            return {"migrated": 0, "is_valid": False, "error": "JSONDecodeError"}
+        except Exception as e:
+            logger.error(f"No se pudo migrar el archivo heredado: {e}", exc_info=True)
+            return {"migrated": 0, "is_valid": False, "error": str(e)}
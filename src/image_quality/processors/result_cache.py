@@ -0,0 +1,227 @@
+from src.image_quality.utils.properties import (ImageDimensionProperties, ImageOutputProperties, SharpnessProperties,
+                                                ExposureProperties, SpecularReflectionsProperties, AnalyzerProperties,
+                                                PyiqaProperties, ResultCacheProperties)
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import threading
+import abc
+import hashlib
+import logging
+import sqlite3
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+_SETTINGS_CLASSES = (ImageDimensionProperties, ImageOutputProperties, SharpnessProperties,
+                     ExposureProperties, SpecularReflectionsProperties, AnalyzerProperties, PyiqaProperties)
+
+def settings_fingerprint() -> str:
+    """
+    Huella de los parámetros que afectan al resultado (dimensiones objetivo, formato de salida y umbrales).
+    Si cambia cualquiera de ellos, las entradas anteriores dejan de coincidir.
+    """
+    settings = {
+        cls.__name__: {name: value for name, value in vars(cls).items() if not name.startswith("_")}
+        for cls in _SETTINGS_CLASSES
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def cache_key(image_bytes: bytes) -> str:
+    """
+    Clave direccionada por contenido: hash de los bytes subidos más la huella de los parámetros activos.
+
+    :param image_bytes: Bytes de la imagen tal como se subieron.
+    :return: Clave hexadecimal.
+    """
+    digest = hashlib.sha256(image_bytes)
+    digest.update(settings_fingerprint().encode("ascii"))
+    return digest.hexdigest()
+
+class ResultCache(abc.ABC):
+    """
+    Base de la caché LRU de resultados con caducidad (TTL) y contadores de aciertos y fallos.
+    Cada backend implementa _get, _put, _count y stats.
+    """
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        """
+        :param max_entries: Número máximo de entradas antes de expulsar la menos usada.
+        :param ttl_seconds: Antigüedad máxima de una entrada en segundos.
+        """
+        self.max_entries = max_entries or ResultCacheProperties.max_entries
+        self.ttl_seconds = ttl_seconds or ResultCacheProperties.ttl_seconds
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Devuelve el resultado guardado para la clave o None, contabilizando el acierto o el fallo.
+        """
+        try:
+            value = self._get(key)
+        except Exception as e:
+            logger.error(f"Error al leer la caché de resultados: {e}")
+            value = None
+        self._count("hits" if value is not None else "misses")
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """
+        Guarda un resultado y expulsa las entradas caducadas o sobrantes.
+        """
+        try:
+            self._put(key, value)
+        except Exception as e:
+            logger.error(f"Error al escribir en la caché de resultados: {e}")
+
+    @abc.abstractmethod
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Lee una entrada sin contabilizar el acierto; None si no existe o ha caducado.
+        """
+
+    @abc.abstractmethod
+    def _put(self, key: str, value: Dict[str, Any]):
+        """
+        Escribe una entrada y aplica la caducidad y el número máximo de entradas.
+        """
+
+    @abc.abstractmethod
+    def _count(self, counter: str):
+        """
+        Incrementa el contador "hits" o "misses".
+        """
+
+    @abc.abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """
+        Backend, número de entradas y contadores de aciertos y fallos.
+        """
+
+class MemoryResultCache(ResultCache):
+    """
+    Caché de resultados en memoria del proceso (un diccionario ordenado por uso).
+    """
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        super().__init__(max_entries, ttl_seconds)
+        # Clave -> (instante de escritura, resultado)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0}
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created_at, value = entry
+            if time.time() - created_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(value)
+
+    def _put(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.time(), dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": "memory", "entries": len(self._entries), **self._counters}
+
+class SQLiteResultCache(ResultCache):
+    """
+    Caché de resultados en un archivo SQLite local, compartida por todos los workers de gunicorn
+    de la máquina (incluidos los contadores de aciertos y fallos).
+    """
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None):
+        """
+        :param path: Ruta del archivo SQLite.
+        """
+        super().__init__(max_entries, ttl_seconds)
+        self.path = path or ResultCacheProperties.sqlite_path
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS results ("
+                               "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, "
+                               "accessed_at REAL NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at)")
+            connection.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            connection.execute("INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Conexión propia de cada hilo (sqlite3 no permite compartirlas entre hilos).
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._connection() as connection:
+            row = connection.execute("SELECT value, created_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                connection.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            connection.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def _put(self, key: str, value: Dict[str, Any]):
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                               (key, json.dumps(value, ensure_ascii=False), now, now))
+            connection.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl_seconds,))
+            connection.execute("DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed_at DESC "
+                               "LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def _count(self, counter: str):
+        try:
+            with self._connection() as connection:
+                connection.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (counter,))
+        except sqlite3.Error as e:
+            logger.error(f"Error al actualizar los contadores de la caché: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        connection = self._connection()
+        counters = dict(connection.execute("SELECT name, value FROM counters").fetchall())
+        entries = connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {"backend": "sqlite", "entries": entries, **counters}
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_pid: Optional[int] = None
+_result_cache_lock = threading.Lock()
+
+def get_result_cache() -> Optional[ResultCache]:
+    """
+    Devuelve la caché de resultados del proceso actual según ResultCacheProperties.backend
+    ("memory" o "sqlite"), o None si la caché está desactivada.
+    """
+    global _result_cache, _result_cache_pid
+    if not ResultCacheProperties.enabled:
+        return None
+    with _result_cache_lock:
+        if _result_cache is None or _result_cache_pid != os.getpid():
+            if ResultCacheProperties.backend == "sqlite":
+                _result_cache = SQLiteResultCache()
+            elif ResultCacheProperties.backend == "memory":
+                _result_cache = MemoryResultCache()
+            else:
+                raise ValueError(f"Backend de caché no soportado: {ResultCacheProperties.backend}")
+            _result_cache_pid = os.getpid()
+        return _result_cache
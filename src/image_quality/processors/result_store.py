@@ -0,0 +1,497 @@
+from src.image_quality.utils.properties import ResultStoreProperties
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from collections import defaultdict
+import threading
+import math
+import logging
+import sqlite3
+import os
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    ("endpoint", "TEXT NOT NULL"),
+    ("image_id", "TEXT"),
+    ("created_at", "REAL NOT NULL"),
+    ("is_valid", "INTEGER"),
+    ("cached", "INTEGER"),
+    ("reused", "INTEGER"),
+    ("platform", "TEXT"),
+    ("user_agent", "TEXT"),
+    ("screen_width", "INTEGER"),
+    ("screen_height", "INTEGER"),
+    ("pixel_ratio", "REAL"),
+    ("cpu_cores", "INTEGER"),
+    ("make", "TEXT"),
+    ("model", "TEXT"),
+    ("software", "TEXT"),
+    ("iso", "REAL"),
+    ("exposure_time", "REAL"),
+    ("f_number", "REAL"),
+    ("focal_length", "REAL"),
+    ("original_width", "INTEGER"),
+    ("original_height", "INTEGER"),
+    ("resized_width", "INTEGER"),
+    ("resized_height", "INTEGER"),
+    ("sharpness_value", "REAL"),
+    ("is_correct_sharpness", "INTEGER"),
+    ("overexposed_percentage", "REAL"),
+    ("underexposed_percentage", "REAL"),
+    ("is_correct_exposure", "INTEGER"),
+    ("specular_score", "REAL"),
+    ("is_correct_specular_reflections", "INTEGER"),
+    ("processing_time_milliseconds", "REAL"),
+)
+COLUMN_NAMES = tuple(name for name, _ in COLUMNS)
+
+"""
+Métricas con validez (tasa de aprobados) y valores numéricos sobre los que se calculan percentiles.
+"""
+PASS_COLUMNS = {
+    "sharpness": "is_correct_sharpness",
+    "exposure": "is_correct_exposure",
+    "specular_reflections": "is_correct_specular_reflections",
+}
+VALUE_COLUMNS = ("sharpness_value", "overexposed_percentage", "underexposed_percentage", "specular_score",
+                 "processing_time_milliseconds")
+PERCENTAGE_COLUMNS = ("overexposed_percentage", "underexposed_percentage", "specular_score")
+
+"""
+Dimensiones de los agregados precalculados: son los filtros de igualdad de stats() y las columnas
+por las que se puede agrupar.
+"""
+FILTER_COLUMNS = ("endpoint", "platform", "make", "model")
+GROUP_COLUMNS = FILTER_COLUMNS
+
+"""
+Contadores de cada fila de agregados: total, filas que cumplen todas las métricas evaluadas y,
+por métrica, filas evaluadas y filas que cumplen.
+"""
+COUNTER_COLUMNS = ("count", "all_passed") + tuple(
+    f"{metric}_{suffix}" for metric in PASS_COLUMNS for suffix in ("evaluated", "passed"))
+
+def _number(value: Any) -> Optional[float]:
+    """
+    Convierte a número los valores de client_info y EXIF (que pueden llegar como "N/A", cadenas o fracciones).
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            if "/" in value:
+                numerator, denominator = value.split("/", 1)
+                return float(numerator) / float(denominator)
+            return float(value)
+        except (ValueError, ZeroDivisionError):
+            return None
+    return None
+
+def _flag(metric: Optional[Dict[str, Any]], key: str) -> Optional[int]:
+    """
+    Validez de una métrica como 0/1, o None si no se evaluó (cascada, error o caché sin la métrica).
+    """
+    if not metric or not metric.get("is_valid") or metric.get(key) is None:
+        return None
+    return int(bool(metric[key]))
+
+def _value(metric: Optional[Dict[str, Any]], key: str) -> Optional[float]:
+    if not metric or not metric.get("is_valid"):
+        return None
+    return _number(metric.get(key))
+
+def value_bin(value: float) -> int:
+    """
+    Contenedor logarítmico del histograma de un valor no negativo (los valores <= 0 van al contenedor -1).
+    """
+    if value <= 0:
+        return -1
+    return int(math.log1p(value) / math.log(ResultStoreProperties.histogram_bin_ratio))
+
+def bin_value(bin_index: int) -> float:
+    """
+    Valor representativo (centro geométrico) de un contenedor del histograma.
+    """
+    if bin_index < 0:
+        return 0.0
+    return math.expm1((bin_index + 0.5) * math.log(ResultStoreProperties.histogram_bin_ratio))
+
+def row_counters(row: Tuple[Any, ...]) -> List[int]:
+    """
+    Contadores (en el orden de COUNTER_COLUMNS) que aporta una fila de results.
+    """
+    flags = [row[COLUMN_NAMES.index(column)] for column in PASS_COLUMNS.values()]
+    all_passed = int(row[COLUMN_NAMES.index("is_valid")] == 1 and all(flag in (None, 1) for flag in flags))
+    counters = [1, all_passed]
+    for flag in flags:
+        counters += [int(flag is not None), int(flag == 1)]
+    return counters
+
+def response_row(endpoint: str, response: Dict[str, Any], timestamp: float) -> Tuple[Any, ...]:
+    """
+    Aplana una respuesta de análisis a una fila de la tabla results.
+
+    :param endpoint: Endpoint que generó la respuesta.
+    :param response: Respuesta tal como se persiste en el almacén JSON Lines.
+    :param timestamp: Marca de tiempo (epoch en segundos).
+    :return: Tupla con los valores en el orden de COLUMN_NAMES.
+    """
+    client = response.get("client_info") or {}
+    metadata = response.get("metadata") or client.get("metadata") or {}
+    original = response.get("original_dimensions") or {}
+    resized = response.get("resized_dimensions") or {}
+    sharpness = response.get("sharpness")
+    exposure = response.get("exposure")
+    specular = response.get("specular_reflections")
+    return (
+        endpoint,
+        response.get("image_id"),
+        timestamp,
+        int(bool(response.get("is_valid"))),
+        int(bool(response.get("cached"))),
+        int(bool(response.get("reused"))),
+        client.get("platform"),
+        client.get("user_agent"),
+        _number(client.get("screen_width")),
+        _number(client.get("screen_height")),
+        _number(client.get("pixel_ratio")),
+        _number(client.get("cpu_cores")),
+        metadata.get("Make"),
+        metadata.get("Model"),
+        metadata.get("Software"),
+        _number(metadata.get("ISOSpeedRatings")),
+        _number(metadata.get("ExposureTime")),
+        _number(metadata.get("FNumber")),
+        _number(metadata.get("FocalLength")),
+        _number(original.get("width")),
+        _number(original.get("height")),
+        _number(resized.get("width")),
+        _number(resized.get("height")),
+        _value(sharpness, "sharpness_value"),
+        _flag(sharpness, "is_correct_sharpness"),
+        _value(exposure, "overexposed_percentage"),
+        _value(exposure, "underexposed_percentage"),
+        _flag(exposure, "is_correct_exposure"),
+        _value(specular, "specular_score"),
+        _flag(specular, "is_correct_specular_reflections"),
+        _number(response.get("processing_time_milliseconds")),
+    )
+
+class ResultStore:
+    """
+    Copia indexada en SQLite de las respuestas persistidas, con las métricas, los campos de client_info
+    y los metadatos EXIF como columnas, y la base de datos es un archivo local compartido por todos los
+    workers de la máquina.
+
+    Además de la tabla de detalle (results), cada inserción actualiza en la misma transacción agregados
+    por intervalo de tiempo y dimensiones (rollups) e histogramas logarítmicos de los valores (histograms),
+    de modo que las tasas de aprobados y los percentiles de stats() se calculan sobre unos pocos miles de
+    filas aunque el detalle tenga millones. Solo los extremos del rango que no cubren un intervalo completo
+    se leen de la tabla de detalle.
+    """
+    def __init__(self, path: Optional[str] = None, bucket_seconds: Optional[int] = None):
+        """
+        :param path: Ruta del archivo SQLite.
+        :param bucket_seconds: Duración en segundos de cada intervalo de los agregados.
+        """
+        self.path = path or ResultStoreProperties.sqlite_path
+        self.bucket_seconds = int(bucket_seconds or ResultStoreProperties.bucket_seconds)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._local = threading.local()
+        dimensions = ", ".join(f"{column} TEXT NOT NULL" for column in FILTER_COLUMNS)
+        with self._connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS results (id INTEGER PRIMARY KEY, "
+                               + ", ".join(f"{name} {kind}" for name, kind in COLUMNS) + ")")
+            connection.execute("CREATE INDEX IF NOT EXISTS results_created_at ON results (created_at)")
+            connection.execute("CREATE INDEX IF NOT EXISTS results_endpoint_created_at "
+                               "ON results (endpoint, created_at)")
+            connection.execute("CREATE INDEX IF NOT EXISTS results_platform_created_at "
+                               "ON results (platform, created_at)")
+            connection.execute("CREATE INDEX IF NOT EXISTS results_device_created_at "
+                               "ON results (make, model, created_at)")
+            connection.execute("CREATE INDEX IF NOT EXISTS results_model_created_at ON results (model, created_at)")
+            # Identidad de una respuesta: permite volver a indexar un almacén sin contarla dos veces
+            connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS results_identity "
+                               "ON results (endpoint, IFNULL(image_id, ''), created_at)")
+
+            connection.execute(f"CREATE TABLE IF NOT EXISTS rollups (bucket INTEGER NOT NULL, {dimensions}, "
+                               + ", ".join(f"{column} INTEGER NOT NULL" for column in COUNTER_COLUMNS)
+                               + f", PRIMARY KEY (bucket, {', '.join(FILTER_COLUMNS)}))")
+            connection.execute(f"CREATE TABLE IF NOT EXISTS histograms (bucket INTEGER NOT NULL, {dimensions}, "
+                               "metric TEXT NOT NULL, bin INTEGER NOT NULL, count INTEGER NOT NULL, "
+                               f"PRIMARY KEY (metric, bucket, {', '.join(FILTER_COLUMNS)}, bin))")
+            for column in FILTER_COLUMNS:
+                connection.execute(f"CREATE INDEX IF NOT EXISTS rollups_{column} ON rollups ({column}, bucket)")
+                connection.execute(f"CREATE INDEX IF NOT EXISTS histograms_{column} "
+                                   f"ON histograms (metric, {column}, bucket)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Conexión propia de cada hilo (sqlite3 no permite compartirlas entre hilos).
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10.0)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _dimensions(self, row: Tuple[Any, ...]) -> Tuple[str, ...]:
+        """
+        Dimensiones de una fila para los agregados ("" en lugar de NULL, para que formen parte de la clave).
+        """
+        return tuple("" if row[COLUMN_NAMES.index(column)] is None else str(row[COLUMN_NAMES.index(column)])
+                     for column in FILTER_COLUMNS)
+
+    def insert(self, endpoint: str, records: Iterable[Tuple[Dict[str, Any], float]]) -> int:
+        """
+        Inserta un lote de respuestas y actualiza sus agregados en una sola transacción. Las respuestas
+        ya guardadas (mismo endpoint, image_id y marca de tiempo) se ignoran y no suman en los agregados,
+        así que volver a indexar un almacén es seguro.
+
+        :param endpoint: Endpoint que generó las respuestas.
+        :param records: Tuplas (respuesta, marca de tiempo en epoch).
+        :return: Número de filas insertadas.
+        """
+        rows = [response_row(endpoint, response, timestamp) for response, timestamp in records]
+        if not rows:
+            return 0
+
+        placeholders = ", ".join("?" for _ in COLUMN_NAMES)
+        key_columns = ", ".join(("bucket",) + FILTER_COLUMNS)
+        insert_sql = f"INSERT OR IGNORE INTO results ({', '.join(COLUMN_NAMES)}) VALUES ({placeholders})"
+        created_at_index = COLUMN_NAMES.index("created_at")
+        with self._connection() as connection:
+            inserted = [row for row in rows if connection.execute(insert_sql, row).rowcount]
+
+            rollups: Dict[Tuple[Any, ...], List[int]] = {}
+            histograms: Dict[Tuple[Any, ...], int] = defaultdict(int)
+            for row in inserted:
+                key = (int(row[created_at_index] // self.bucket_seconds * self.bucket_seconds),) + self._dimensions(row)
+                counters = row_counters(row)
+                if key in rollups:
+                    rollups[key] = [total + value for total, value in zip(rollups[key], counters)]
+                else:
+                    rollups[key] = counters
+                for column in VALUE_COLUMNS:
+                    value = row[COLUMN_NAMES.index(column)]
+                    if value is not None:
+                        histograms[key + (column, value_bin(value))] += 1
+
+            connection.executemany(
+                f"INSERT INTO rollups ({key_columns}, {', '.join(COUNTER_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in range(1 + len(FILTER_COLUMNS) + len(COUNTER_COLUMNS)))}) "
+                f"ON CONFLICT ({key_columns}) DO UPDATE SET "
+                + ", ".join(f"{column} = {column} + excluded.{column}" for column in COUNTER_COLUMNS),
+                [key + tuple(counters) for key, counters in rollups.items()])
+            connection.executemany(
+                f"INSERT INTO histograms ({key_columns}, metric, bin, count) "
+                f"VALUES ({', '.join('?' for _ in range(3 + len(FILTER_COLUMNS) + 1))}) "
+                f"ON CONFLICT (metric, {key_columns}, bin) DO UPDATE SET count = count + excluded.count",
+                [key + (count,) for key, count in histograms.items()])
+        return len(inserted)
+
+    def count(self, endpoint: Optional[str] = None) -> int:
+        """
+        Número de filas guardadas, en total o de un endpoint.
+        """
+        if endpoint is None:
+            return self._connection().execute("SELECT COALESCE(SUM(count), 0) FROM rollups").fetchone()[0]
+        return self._connection().execute("SELECT COALESCE(SUM(count), 0) FROM rollups WHERE endpoint = ?",
+                                          (endpoint,)).fetchone()[0]
+
+    @staticmethod
+    def _filter_clauses(filters: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+        clauses, params = [], []
+        for column in FILTER_COLUMNS:
+            if filters.get(column) is not None:
+                clauses.append(f"{column} = ?")
+                params.append(filters[column])
+        return clauses, params
+
+    def _ranges(self, since: Optional[float], until: Optional[float]) -> Tuple[Optional[Tuple[Optional[int], Optional[int]]],
+                                                                               List[Tuple[Optional[float], Optional[float]]]]:
+        """
+        Divide [since, until) en los intervalos completos que cubren los agregados y los extremos que
+        hay que leer de la tabla de detalle.
+
+        :return: Tupla (rango de intervalos [desde, hasta) o None, lista de rangos de detalle).
+        """
+        first_bucket = None if since is None else int(math.ceil(since / self.bucket_seconds) * self.bucket_seconds)
+        end_bucket = None if until is None else int(until // self.bucket_seconds * self.bucket_seconds)
+        if first_bucket is not None and end_bucket is not None and first_bucket >= end_bucket:
+            return None, [(since, until)]
+        edges = []
+        if since is not None and since < first_bucket:
+            edges.append((since, first_bucket))
+        if until is not None and end_bucket < until:
+            edges.append((end_bucket, until))
+        return (first_bucket, end_bucket), edges
+
+    def _aggregate_where(self, filters: Dict[str, Any], buckets: Tuple[Optional[int], Optional[int]],
+                         metric: Optional[str] = None) -> Tuple[str, List[Any]]:
+        clauses, params = ([], []) if metric is None else (["metric = ?"], [metric])
+        filter_clauses, filter_params = self._filter_clauses(filters)
+        clauses += filter_clauses
+        params += filter_params
+        if buckets[0] is not None:
+            clauses.append("bucket >= ?")
+            params.append(buckets[0])
+        if buckets[1] is not None:
+            clauses.append("bucket < ?")
+            params.append(buckets[1])
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _detail_where(self, filters: Dict[str, Any], since: Optional[float],
+                      until: Optional[float]) -> Tuple[str, List[Any]]:
+        clauses, params = self._filter_clauses(filters)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def stats(self, filters: Optional[Dict[str, Any]] = None, since: Optional[float] = None,
+              until: Optional[float] = None, group_by: Optional[str] = None,
+              percentiles: Optional[List[float]] = None) -> Dict[str, Any]:
+        """
+        Calcula las tasas de aprobados por métrica y los percentiles de los valores numéricos a partir
+        de los agregados precalculados. Los percentiles son aproximados: se devuelve el centro del
+        contenedor del histograma (error relativo acotado por ResultStoreProperties.histogram_bin_ratio).
+
+        :param filters: Filtros de igualdad sobre endpoint, platform, make o model.
+        :param since: Marca de tiempo inicial (incluida) o None.
+        :param until: Marca de tiempo final (excluida) o None.
+        :param group_by: Columna por la que desglosar las tasas de aprobados (endpoint, platform, make o model).
+        :param percentiles: Percentiles (0-100) a calcular; por defecto los de ResultStoreProperties.
+        :return: Diccionario con total, tasas de aprobados, percentiles y, si se pide, el desglose por grupo.
+        """
+        filters = filters or {}
+        percentiles = percentiles or ResultStoreProperties.percentiles
+        if group_by is not None and group_by not in GROUP_COLUMNS:
+            raise ValueError(f"Columna de agrupación no soportada: {group_by}")
+        if any(not 0 <= percentile <= 100 for percentile in percentiles):
+            raise ValueError("Los percentiles deben estar entre 0 y 100.")
+        connection = self._connection()
+        buckets, edges = self._ranges(since, until)
+
+        groups: Dict[Any, List[int]] = defaultdict(lambda: [0] * len(COUNTER_COLUMNS))
+        histograms: Dict[str, Dict[int, int]] = {column: defaultdict(int) for column in VALUE_COLUMNS}
+        group_select = f"{group_by}, " if group_by else "NULL, "
+        group_clause = f" GROUP BY {group_by}" if group_by else ""
+
+        if buckets is not None:
+            where, params = self._aggregate_where(filters, buckets)
+            for row in connection.execute(f"SELECT {group_select}"
+                                          + ", ".join(f"SUM({column})" for column in COUNTER_COLUMNS)
+                                          + f" FROM rollups{where}{group_clause}", params):
+                if row[1] is None:
+                    continue
+                group = None if group_by is None or row[0] == "" else row[0]
+                groups[group] = [total + value for total, value in zip(groups[group], row[1:])]
+            for column in VALUE_COLUMNS:
+                where, params = self._aggregate_where(filters, buckets, column)
+                for bin_index, count in connection.execute(f"SELECT bin, SUM(count) FROM histograms{where} "
+                                                           "GROUP BY bin", params):
+                    histograms[column][bin_index] += count
+
+        for edge_since, edge_until in edges:
+            where, params = self._detail_where(filters, edge_since, edge_until)
+            for row in connection.execute(f"SELECT {', '.join(COLUMN_NAMES)} FROM results{where}", params):
+                group = row[COLUMN_NAMES.index(group_by)] if group_by else None
+                groups[group] = [total + value for total, value in zip(groups[group], row_counters(row))]
+                for column in VALUE_COLUMNS:
+                    value = row[COLUMN_NAMES.index(column)]
+                    if value is not None:
+                        histograms[column][value_bin(value)] += 1
+
+        totals = [sum(values) for values in zip(*groups.values())] if groups else [0] * len(COUNTER_COLUMNS)
+        result = self._summary(totals)
+        result["percentiles"] = {column: self._percentiles(histograms[column], percentiles,
+                                                           100.0 if column in PERCENTAGE_COLUMNS else None)
+                                 for column in VALUE_COLUMNS}
+        if group_by is not None:
+            ranked = sorted(groups.items(), key=lambda item: item[1][0], reverse=True)
+            result["groups"] = [{group_by: group, **self._summary(counters)}
+                                for group, counters in ranked[:ResultStoreProperties.max_groups]]
+        return result
+
+    @staticmethod
+    def _summary(counters: List[int]) -> Dict[str, Any]:
+        """
+        Total y tasas de aprobados a partir de los contadores en el orden de COUNTER_COLUMNS.
+        """
+        values = dict(zip(COUNTER_COLUMNS, counters))
+        rates = {metric: (round(values[f"{metric}_passed"] / values[f"{metric}_evaluated"], 4)
+                          if values[f"{metric}_evaluated"] else None) for metric in PASS_COLUMNS}
+        rates["all"] = round(values["all_passed"] / values["count"], 4) if values["count"] else None
+        return {"count": values["count"], "pass_rates": rates}
+
+    @staticmethod
+    def _percentiles(histogram: Dict[int, int], percentiles: List[float],
+                     upper_bound: Optional[float] = None) -> Dict[str, Optional[float]]:
+        """
+        Percentiles (rango más cercano) a partir de un histograma {contenedor: frecuencia}.
+
+        :param upper_bound: Valor máximo posible (por ejemplo 100 para porcentajes), para no devolver
+                            un centro de contenedor por encima de él.
+        """
+        total = sum(histogram.values())
+        result: Dict[str, Optional[float]] = {}
+        bins = sorted(histogram.items())
+        for percentile in percentiles:
+            if total == 0:
+                result[f"p{percentile:g}"] = None
+                continue
+            rank = max(1, int(math.ceil(percentile / 100 * total)))
+            cumulative = 0
+            for bin_index, count in bins:
+                cumulative += count
+                if cumulative >= rank:
+                    value = bin_value(bin_index)
+                    result[f"p{percentile:g}"] = round(min(value, upper_bound) if upper_bound is not None else value, 4)
+                    break
+        return result
+
+_result_store: Optional[ResultStore] = None
+_result_store_pid: Optional[int] = None
+_result_store_lock = threading.Lock()
+
+def get_result_store() -> Optional[ResultStore]:
+    """
+    Devuelve el almacén SQLite de resultados del proceso actual, o None si está desactivado.
+    """
+    global _result_store, _result_store_pid
+    if not ResultStoreProperties.enabled:
+        return None
+    with _result_store_lock:
+        if _result_store is None or _result_store_pid != os.getpid():
+            _result_store = ResultStore()
+            _result_store_pid = os.getpid()
+        return _result_store
+
+def store_endpoint(store_dir: str) -> str:
+    """
+    Nombre del endpoint asociado a un almacén de respuestas (por defecto, el nombre de su directorio).
+    """
+    return ResultStoreProperties.store_endpoints.get(store_dir, os.path.basename(os.path.normpath(store_dir)))
+
+def index_responses(store_dir: str, records: List[Tuple[Dict[str, Any], float]]):
+    """
+    Copia al almacén SQLite las respuestas recién anexadas a un almacén JSON Lines. Los errores se
+    registran sin propagarse: el almacén JSON Lines sigue siendo la fuente de verdad.
+
+    :param store_dir: Directorio del almacén de respuestas.
+    :param records: Tuplas (respuesta, marca de tiempo en epoch).
+    """
+    result_store = get_result_store()
+    if result_store is None:
+        return
+    try:
+        result_store.insert(store_endpoint(store_dir), records)
+    except sqlite3.Error as e:
+        logger.error(f"Error al indexar las respuestas en SQLite: {e}")
@@ -0,0 +1,113 @@
+from src.image_quality.utils.properties import TemporalReuseProperties
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+import threading
+import time
+import cv2
+
+FrameSignature = Tuple[bool, np.ndarray]
+
+def frame_signature(image_bytes: Optional[bytes]) -> Optional[FrameSignature]:
+    """
+    Calcula una firma barata del fotograma: decodificación JPEG en gris a 1/8 y reducción a una
+    miniatura cuadrada. No requiere decodificar ni redimensionar la imagen completa.
+
+    :param image_bytes: Bytes de la imagen codificada.
+    :return: Tupla (es horizontal, miniatura float32) o None si no se puede decodificar.
+    """
+    if not image_bytes:
+        return None
+    try:
+        gray = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    except cv2.error:
+        return None
+    if gray is None:
+        return None
+
+    size = TemporalReuseProperties.signature_size
+    thumbnail = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    return gray.shape[1] > gray.shape[0], thumbnail
+
+def signature_distance(first: FrameSignature, second: FrameSignature) -> float:
+    """
+    Diferencia media absoluta (en niveles de gris) entre dos firmas; infinita si cambia la orientación.
+    """
+    if first[0] != second[0]:
+        return float("inf")
+    return float(cv2.absdiff(first[1], second[1]).mean())
+
+class TemporalReuseSession:
+    """
+    Estado de un cliente para reutilizar el último análisis completo cuando los fotogramas consecutivos
+    son prácticamente iguales (por ejemplo, con el móvil quieto).
+
+    La comparación se hace siempre contra el último fotograma analizado, no contra el último recibido,
+    para que los cambios lentos no se acumulen sin volver a analizar.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._signature: Optional[FrameSignature] = None
+        self._results: Optional[Dict[str, Any]] = None
+        self._analyzed_at = 0.0
+        self._reuses = 0
+
+    def lookup(self, signature: Optional[FrameSignature]) -> Optional[Dict[str, Any]]:
+        """
+        Devuelve una copia del último resultado si el fotograma está dentro de la tolerancia, no se ha
+        superado el número máximo de reutilizaciones seguidas y el resultado no ha caducado.
+
+        :param signature: Firma del fotograma actual.
+        :return: Resultado reutilizable o None si hay que analizar.
+        """
+        if signature is None:
+            return None
+        with self._lock:
+            if self._signature is None or self._results is None:
+                return None
+            if self._reuses >= TemporalReuseProperties.max_consecutive_reuses:
+                return None
+            if time.monotonic() - self._analyzed_at > TemporalReuseProperties.max_age_seconds:
+                return None
+            if signature_distance(signature, self._signature) > TemporalReuseProperties.tolerance:
+                return None
+            self._reuses += 1
+            return dict(self._results)
+
+    def update(self, signature: Optional[FrameSignature], results: Dict[str, Any]):
+        """
+        Guarda el resultado de un análisis completo como referencia para los siguientes fotogramas.
+
+        :param signature: Firma del fotograma analizado.
+        :param results: Resultado del análisis.
+        """
+        with self._lock:
+            self._signature = signature
+            self._results = results if signature is not None else None
+            self._analyzed_at = time.monotonic()
+            self._reuses = 0
+
+_sessions: "OrderedDict[str, TemporalReuseSession]" = OrderedDict()
+_sessions_lock = threading.Lock()
+
+def get_reuse_session(session_id: Optional[str]) -> Optional[TemporalReuseSession]:
+    """
+    Devuelve el estado de reutilización de un cliente del proceso actual, creándolo si no existe.
+    Se conservan como máximo TemporalReuseProperties.max_sessions sesiones (se expulsa la menos reciente).
+
+    :param session_id: Identificador de sesión enviado por el cliente.
+    :return: Sesión o None si la reutilización está desactivada o no hay identificador.
+    """
+    if not TemporalReuseProperties.enabled or not session_id:
+        return None
+    session_id = str(session_id)
+    with _sessions_lock:
+        session = _sessions.get(session_id)
+        if session is None:
+            session = TemporalReuseSession()
+            _sessions[session_id] = session
+            while len(_sessions) > TemporalReuseProperties.max_sessions:
+                _sessions.popitem(last=False)
+        else:
+            _sessions.move_to_end(session_id)
+        return session
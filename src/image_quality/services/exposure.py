@@ -1,87 +1,114 @@
+from src.image_quality.processors.prepared_image import PreparedImage
 from src.image_quality.utils.properties import ExposureProperties
-from typing import Optional, Dict, Any
+from typing import Optional, Union, Dict, Any, Mapping
 import numpy as np
 import logging
 import time
 import cv2
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-)
+logger = logging.getLogger(__name__)
 
 class ExposureAnalyzer:
     """
     Clase para analizar la exposición de imágenes y determinar si cumple los umbrales aceptables.
     """
     @staticmethod
-    def detect_exposure(image: np.ndarray, thresholds: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    def detect_exposure(image: Union[np.ndarray, PreparedImage], thresholds: Optional[Dict[str, float]] = None,
+                        profiles: Optional[Mapping[str, Dict[str, float]]] = None,
+                        return_histogram: Optional[bool] = None) -> Dict[str, Any]:
         """
         Analiza la exposición de una imagen para determinar el porcentaje de píxeles
         sobreexpuestos y subexpuestos, y valida si la exposición es aceptable.
 
-        :param image: Imagen en formato BGR como numpy array.
+        Se calcula un único histograma de 256 niveles y su suma acumulada; cada conjunto de umbrales
+        se evalúa después sobre ella sin volver a recorrer la imagen.
+
+        :param image: Imagen en formato BGR como numpy array o PreparedImage compartido.
         :param thresholds: Diccionario opcional con los umbrales de exposición:
                            - "overexposed_threshold": Límite superior para sobreexposición.
                            - "underexposed_threshold": Límite inferior para subexposición.
                            - "tolerance": Porcentaje máximo permitido para considerar la imagen válida.
+        :param profiles: Perfiles de umbrales con nombre a evaluar en la misma pasada
+                         (por defecto ExposureProperties.profiles).
+        :param return_histogram: Si True, incluye el histograma (por defecto ExposureProperties.return_histogram).
         :return: Diccionario con los resultados del análisis y la validez del proceso (is_valid).
         """
         start_time = time.time()
-        if image is None or not isinstance(image, np.ndarray):
-            logging.error("La imagen proporcionada es inválida. Se esperaba un numpy array no vacío.")
+        prepared = PreparedImage.from_image(image)
+        if prepared is None:
+            logger.error("La imagen proporcionada es inválida. Se esperaba un numpy array no vacío.")
             return ExposureAnalyzer.error_result_exposure(start_time)
 
         try:
             thresholds = thresholds or ExposureProperties.default_thresholds_exposure
-            overexposed_threshold = thresholds.get("overexposed_threshold", 245)
-            underexposed_threshold = thresholds.get("underexposed_threshold", 10)
+            profiles = ExposureProperties.profiles if profiles is None else profiles
             tolerance = thresholds.get("tolerance", 0.3)
 
-            if len(image.shape) == 3:
-                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            else:
-                gray = image
-
-            total_pixels = gray.size
-            overexposed_count = np.sum(gray >= overexposed_threshold)
-            underexposed_count = np.sum(gray <= underexposed_threshold)
-
-            overexposed_percentage = round((overexposed_count / total_pixels) * 100, 2)
-            underexposed_percentage = round((underexposed_count / total_pixels) * 100, 2)
-
-            is_overexposed_correct = overexposed_percentage < (tolerance * 100)
-            is_underexposed_correct = underexposed_percentage < (tolerance * 100)
-            is_correct_exposure = is_overexposed_correct and is_underexposed_correct
+            histogram = cv2.calcHist([prepared.gray], [0], None, [256], [0, 256]).ravel().astype(np.int64)
+            cumulative = np.cumsum(histogram)
 
-            logging.info(f"SobreExposición: {overexposed_percentage}. "
-             f"La imagen {'cumple' if is_overexposed_correct else 'no cumple'} "
-             f"con el umbral de SobreExposición ({tolerance * 100}%).")
+            evaluation = ExposureAnalyzer.evaluate_thresholds(cumulative, thresholds)
+            overexposed_percentage = evaluation["overexposed_percentage"]
+            underexposed_percentage = evaluation["underexposed_percentage"]
+            is_overexposed_correct = evaluation["is_overexposed_correct"]
+            is_underexposed_correct = evaluation["is_underexposed_correct"]
+            is_correct_exposure = evaluation["is_correct_exposure"]
 
-            logging.info(f"SubExposición: {underexposed_percentage}. "
-                        f"La imagen {'cumple' if is_underexposed_correct else 'no cumple'} "
-                        f"con el umbral de SubExposición ({tolerance * 100}%).")
+            elapsed_time_milliseconds = int((time.time() - start_time) * 1000)
+            logger.info("Exposición: sobreexpuesto %.2f%%, subexpuesto %.2f%%. Tolerancia: %s%%.",
+                        overexposed_percentage, underexposed_percentage, tolerance * 100,
+                        extra={"stage": "exposure", "duration_ms": elapsed_time_milliseconds,
+                               "passed": bool(is_correct_exposure)})
 
-            logging.info(f"Exposición General: {'Correcta' if is_correct_exposure else 'Incorrecta'}.")
-            
-            end_time = time.time()
-            elapsed_time_seconds = round(end_time - start_time, 4)
-            elapsed_time_milliseconds = int((end_time - start_time) * 1000)
-            logging.info(f"Tiempo de procesamiento en Exposure: {elapsed_time_seconds}s ({elapsed_time_milliseconds}ms)")
-
-            return {
+            results = {
                 "overexposed_percentage": overexposed_percentage,
                 "underexposed_percentage": underexposed_percentage,
                 "is_overexposed_correct": is_overexposed_correct,
                 "is_underexposed_correct": is_underexposed_correct,
                 "is_correct_exposure": is_correct_exposure,
+                "profiles": {name: ExposureAnalyzer.evaluate_thresholds(cumulative, profile)
+                             for name, profile in profiles.items()},
                 "is_valid": True
             }
+            if ExposureProperties.return_histogram if return_histogram is None else return_histogram:
+                results["histogram"] = histogram.tolist()
+            return results
 
         except Exception as e:
-            logging.error(f"Error al analizar la exposición: {e}", exc_info=True)
+            logger.error(f"Error al analizar la exposición: {e}", exc_info=True)
             return ExposureAnalyzer.error_result_exposure(start_time)
 
+    @staticmethod
+    def evaluate_thresholds(cumulative: np.ndarray, thresholds: Dict[str, float]) -> Dict[str, Any]:
+        """
+        Evalúa un conjunto de umbrales sobre la suma acumulada del histograma, sin recorrer la imagen.
+
+        :param cumulative: Suma acumulada del histograma de 256 niveles.
+        :param thresholds: Umbrales "overexposed_threshold", "underexposed_threshold" y "tolerance".
+        :return: Porcentajes de píxeles sobreexpuestos y subexpuestos y su validez.
+        """
+        overexposed_threshold = int(np.clip(thresholds.get("overexposed_threshold", 245), 0, 256))
+        underexposed_threshold = int(np.clip(thresholds.get("underexposed_threshold", 10), -1, 255))
+        tolerance = thresholds.get("tolerance", 0.3)
+
+        total_pixels = int(cumulative[-1])
+        below_overexposed = int(cumulative[overexposed_threshold - 1]) if overexposed_threshold > 0 else 0
+        overexposed_count = total_pixels - below_overexposed
+        underexposed_count = int(cumulative[underexposed_threshold]) if underexposed_threshold >= 0 else 0
+
+        overexposed_percentage = round((overexposed_count / total_pixels) * 100, 2)
+        underexposed_percentage = round((underexposed_count / total_pixels) * 100, 2)
+        is_overexposed_correct = overexposed_percentage < (tolerance * 100)
+        is_underexposed_correct = underexposed_percentage < (tolerance * 100)
+
+        return {
+            "overexposed_percentage": overexposed_percentage,
+            "underexposed_percentage": underexposed_percentage,
+            "is_overexposed_correct": is_overexposed_correct,
+            "is_underexposed_correct": is_underexposed_correct,
+            "is_correct_exposure": is_overexposed_correct and is_underexposed_correct,
+        }
+
     @staticmethod
     def error_result_exposure(start_time: float) -> Dict[str, Any]:
         """
@@ -94,7 +121,7 @@ class ExposureAnalyzer:
         elapsed_time_seconds = round(end_time - start_time, 4)
         elapsed_time_milliseconds = int((end_time - start_time) * 1000)
 
-        logging.error(f"Error en el análisis de exposición. Tiempo transcurrido: "
+        logger.error(f"Error en el análisis de exposición. Tiempo transcurrido: "
                       f"{elapsed_time_seconds}s ({elapsed_time_milliseconds}ms)")
 
         return {
@@ -103,5 +130,6 @@ class ExposureAnalyzer:
             "is_overexposed_correct": False,
             "is_underexposed_correct": False,
             "is_correct_exposure": False,
+            "profiles": None,
             "is_valid": False
         }
\ No newline at end of file
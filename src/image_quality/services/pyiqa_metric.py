@@ -0,0 +1,117 @@
+from src.image_quality.utils.properties import MicroBatchingProperties, PyiqaProperties
+from src.image_quality.processors.micro_batching import MicroBatcher
+from src.image_quality.processors.prepared_image import PreparedImage
+from typing import Any, Dict, List, Optional, Union
+import numpy as np
+import logging
+import time
+import cv2
+
+logger = logging.getLogger(__name__)
+
+class PyiqaMetric:
+    """
+    Clase que envuelve una métrica sin referencia de pyiqa (por ejemplo NIQE o BRISQUE).
+    pyiqa y torch se importan al crear la instancia, no al importar este módulo, y el modelo se carga
+    una única vez: el registro de analizadores mantiene una instancia por proceso. Con
+    MicroBatchingProperties.enabled, los fotogramas de peticiones concurrentes se evalúan en lotes.
+    """
+    def __init__(self, metric_name: str, threshold: Optional[float] = None):
+        """
+        Importa pyiqa y carga el modelo en el dispositivo configurado.
+
+        :param metric_name: Nombre de la métrica en pyiqa ("niqe", "brisque"...).
+        :param threshold: Umbral de la métrica (por defecto el de PyiqaProperties.thresholds).
+        """
+        import torch
+        import pyiqa
+
+        torch.set_num_threads(PyiqaProperties.torch_threads or max(1, cv2.getNumThreads()))
+
+        start_time = time.time()
+        self.torch = torch
+        self.metric_name = metric_name
+        self.model = pyiqa.create_metric(metric_name, device=torch.device(PyiqaProperties.device), as_loss=False)
+        self.model.eval()
+        self.lower_better = bool(getattr(self.model, "lower_better", False))
+        self.threshold = threshold if threshold is not None else PyiqaProperties.thresholds.get(metric_name)
+        self.batcher = MicroBatcher(metric_name, self.score_batch) if MicroBatchingProperties.enabled else None
+        logger.info("Modelo %s de pyiqa cargado", metric_name,
+                    extra={"stage": f"{metric_name}_load", "duration_ms": int((time.time() - start_time) * 1000)})
+
+    def to_tensor(self, image: np.ndarray) -> Any:
+        """
+        Convierte una imagen BGR de OpenCV en el tensor RGB [1, 3, H, W] con valores en [0, 1] que
+        esperan los modelos de pyiqa, reduciéndola antes a PyiqaProperties.max_side.
+        """
+        max_side = PyiqaProperties.max_side
+        height, width = image.shape[:2]
+        if max_side and max(height, width) > max_side:
+            scale = max_side / max(height, width)
+            image = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        if len(image.shape) == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+        else:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        tensor = self.torch.from_numpy(np.ascontiguousarray(image.transpose(2, 0, 1)))
+        return tensor.unsqueeze(0).float().div_(255.0)
+
+    def score_batch(self, tensors: List[Any]) -> List[float]:
+        """
+        Puntúa una lista de tensores [1, 3, H, W] con una inferencia por cada tamaño distinto
+        (los fotogramas horizontales y verticales no pueden apilarse en el mismo tensor).
+
+        :return: Puntuación de cada tensor, en el mismo orden.
+        """
+        groups: Dict[tuple, List[int]] = {}
+        for index, tensor in enumerate(tensors):
+            groups.setdefault(tuple(tensor.shape), []).append(index)
+
+        scores: List[float] = [0.0] * len(tensors)
+        with self.torch.no_grad():
+            for indexes in groups.values():
+                batch = self.torch.cat([tensors[index] for index in indexes])
+                for index, score in zip(indexes, self.model(batch).flatten().tolist()):
+                    scores[index] = float(score)
+        return scores
+
+    def detect_quality(self, image: Union[np.ndarray, PreparedImage]) -> Dict[str, Any]:
+        """
+        Calcula la puntuación de la métrica y valida si cumple el umbral.
+
+        :param image: Imagen en formato BGR como numpy array o PreparedImage compartido.
+        :return: Diccionario con la puntuación ("score"), si menor es mejor ("lower_better"),
+                 el umbral, el cumplimiento ("is_correct_<métrica>") y la validez del proceso (is_valid).
+        """
+        start_time = time.time()
+        passed_key = f"is_correct_{self.metric_name}"
+        prepared = PreparedImage.from_image(image)
+        if prepared is None:
+            logger.error("La imagen proporcionada es inválida. Se esperaba un numpy array no vacío.")
+            return {"score": None, passed_key: False, "is_valid": False}
+
+        try:
+            tensor = self.to_tensor(prepared.image)
+            score = self.batcher.submit(tensor) if self.batcher is not None else self.score_batch([tensor])[0]
+            if self.threshold is None:
+                passed = True
+            elif self.lower_better:
+                passed = score <= self.threshold
+            else:
+                passed = score >= self.threshold
+
+            logger.info("%s: %.4f. Umbral: %s.", self.metric_name.upper(), score, self.threshold,
+                        extra={"stage": self.metric_name, "duration_ms": int((time.time() - start_time) * 1000),
+                               "value": score, "passed": passed})
+            return {
+                "score": score,
+                "lower_better": self.lower_better,
+                "threshold": self.threshold,
+                passed_key: passed,
+                "is_valid": True
+            }
+
+        except Exception as e:
+            logger.error(f"Error al calcular {self.metric_name}: {e}", exc_info=True)
+            return {"score": None, passed_key: False, "is_valid": False}
@@ -1,72 +1,162 @@
+from src.image_quality.processors.prepared_image import PreparedImage
 from src.image_quality.utils.properties import SharpnessProperties
-from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
 import numpy as np
+import threading
 import logging
 import time
 import cv2
+import os
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-)
+logger = logging.getLogger(__name__)
+
+_tile_executor: Optional[ThreadPoolExecutor] = None
+_tile_executor_pid: Optional[int] = None
+_tile_executor_lock = threading.Lock()
+
+def _get_tile_executor() -> ThreadPoolExecutor:
+    """
+    Conjunto de hilos compartido para analizar las bandas de teselas (OpenCV libera el GIL).
+    Por defecto usa tantos hilos como OpenCV (cv2.getNumThreads), para respetar el mismo presupuesto
+    de CPU por proceso. Se recrea tras un fork porque los hilos no se heredan.
+    """
+    global _tile_executor, _tile_executor_pid
+    with _tile_executor_lock:
+        if _tile_executor is None or _tile_executor_pid != os.getpid():
+            workers = SharpnessProperties.tile_workers or max(1, cv2.getNumThreads())
+            _tile_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sharpness-tile")
+            _tile_executor_pid = os.getpid()
+        return _tile_executor
+
+def _grid_edges(length: int, parts: int) -> List[int]:
+    """
+    Límites de las teselas a lo largo de un eje, repartiendo el resto de forma uniforme.
+    """
+    return [round(i * length / parts) for i in range(parts + 1)]
 
 class SharpnessAnalyzer:
     """
     Clase para analizar la nitidez de imágenes.
     """
-    def __init__(self, default_threshold: Optional[float] = None):
+    def __init__(self, default_threshold: Optional[float] = None, tiled: Optional[bool] = None,
+                 tile_grid: Optional[Tuple[int, int]] = None):
         """
         Inicializa el analizador con un umbral de nitidez predeterminado.
 
         :param default_threshold: Umbral de nitidez predeterminado.
+        :param tiled: Si True, calcula además el mapa de enfoque por teselas (por defecto SharpnessProperties.tiled).
+        :param tile_grid: Rejilla (filas, columnas) del mapa de enfoque.
         """
         self.default_threshold = default_threshold or SharpnessProperties.default_threshold_sharpness
+        self.tiled = SharpnessProperties.tiled if tiled is None else tiled
+        self.tile_grid = tile_grid or SharpnessProperties.tile_grid
 
     def detect_sharpness(self, image: Any, threshold: Optional[float] = None) -> Dict[str, Any]:
         """
         Analiza la nitidez de la imagen y determina si es válida.
 
-        :param image: Imagen en formato OpenCV (numpy array).
+        :param image: Imagen en formato OpenCV (numpy array) o PreparedImage compartido.
         :param threshold: Umbral opcional para considerar una imagen como nítida.
         :return: Diccionario con el valor de nitidez, si la nitidez es correcta,
                  y si el proceso fue exitoso (is_valid).
         """
         start_time = time.time()
-        if image is None or not isinstance(image, (np.ndarray,)):
-            logging.error("La imagen proporcionada es inválida. Se esperaba un numpy array no vacío.")
+        prepared = PreparedImage.from_image(image)
+        if prepared is None:
+            logger.error("La imagen proporcionada es inválida. Se esperaba un numpy array no vacío.")
             return self.error_result_sharpness(start_time)
 
         threshold = threshold or self.default_threshold
 
         try:
-            if len(image.shape) == 3:
-                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            focus_map = None
+            if self.tiled:
+                sharpness, focus_map = self.tiled_laplacian_variance(prepared.gray, self.tile_grid)
             else:
-                gray = image
-
-            sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
+                sharpness = cv2.Laplacian(prepared.gray, cv2.CV_64F).var()
 
             is_correct_sharpness = sharpness >= threshold
-            if is_correct_sharpness:
-                logging.info(f"Nitidez (Varianza Laplaciano): {sharpness}. La imagen cumple con el umbral de nitidez.({threshold}).")
-            else:
-                logging.warning(f"Nitidez (Varianza Laplaciano): {sharpness}. La imagen no cumple con el umbral de nitidez ({threshold}).")
 
-            end_time = time.time()
-            elapsed_time_seconds = round(end_time - start_time, 4)
-            elapsed_time_milliseconds = int((end_time - start_time) * 1000)
-            logging.info(f"Tiempo de procesamiento en Sharpness: {elapsed_time_seconds}s ({elapsed_time_milliseconds}ms)")
+            elapsed_time_milliseconds = int((time.time() - start_time) * 1000)
+            logger.info("Nitidez (Varianza Laplaciano): %.2f. Umbral: %s.", sharpness, threshold,
+                        extra={"stage": "sharpness", "duration_ms": elapsed_time_milliseconds,
+                               "value": float(sharpness), "passed": bool(is_correct_sharpness)})
 
-            return {
+            results = {
                 "sharpness_value": sharpness,
                 "is_correct_sharpness": is_correct_sharpness,
                 "is_valid": True
             }
+            if focus_map is not None:
+                results["focus_map"] = np.round(focus_map, 2).tolist()
+                results["focus_summary"] = self.focus_summary(focus_map, threshold)
+            return results
 
         except Exception as e:
-            logging.error(f"Error inesperado al analizar la nitidez: {e}", exc_info=True)
+            logger.error(f"Error inesperado al analizar la nitidez: {e}", exc_info=True)
             return self.error_result_sharpness(start_time)
         
+    @staticmethod
+    def tiled_laplacian_variance(gray: np.ndarray, grid: Tuple[int, int]) -> Tuple[float, np.ndarray]:
+        """
+        Calcula la varianza del Laplaciano por teselas y la global a partir de las sumas de cada tesela.
+
+        Cada fila de teselas se procesa en paralelo como una banda con una fila de contexto por arriba
+        y por abajo, de modo que el Laplaciano (CV_16S, exacto para imágenes uint8) coincide con el de
+        la imagen completa. La varianza global se combina a partir de la media y la varianza de cada
+        tesela y es igual a la del cálculo de fotograma completo.
+
+        :param gray: Imagen en escala de grises (uint8).
+        :param grid: Rejilla (filas, columnas).
+        :return: Tupla (varianza global, mapa de varianzas con forma (filas, columnas)).
+        """
+        height, width = gray.shape[:2]
+        rows, cols = max(1, min(grid[0], height)), max(1, min(grid[1], width))
+        y_edges, x_edges = _grid_edges(height, rows), _grid_edges(width, cols)
+        means = np.zeros((rows, cols), dtype=np.float64)
+        variances = np.zeros((rows, cols), dtype=np.float64)
+        counts = np.zeros((rows, cols), dtype=np.float64)
+
+        def _band(row: int):
+            y0, y1 = y_edges[row], y_edges[row + 1]
+            top, bottom = max(0, y0 - 1), min(height, y1 + 1)
+            band = cv2.Laplacian(gray[top:bottom], cv2.CV_16S)[y0 - top:y0 - top + (y1 - y0)]
+            for col in range(cols):
+                tile = band[:, x_edges[col]:x_edges[col + 1]]
+                mean, stddev = cv2.meanStdDev(tile)
+                means[row, col] = mean[0, 0]
+                variances[row, col] = stddev[0, 0] ** 2
+                counts[row, col] = tile.size
+
+        list(_get_tile_executor().map(_band, range(rows)))
+
+        total = counts.sum()
+        global_mean = (counts * means).sum() / total
+        global_variance = (counts * (variances + means ** 2)).sum() / total - global_mean ** 2
+        return float(global_variance), variances
+
+    @staticmethod
+    def focus_summary(focus_map: np.ndarray, threshold: float) -> Dict[str, Any]:
+        """
+        Resume el mapa de enfoque: extremos, percentiles, proporción de teselas nítidas y tesela más borrosa.
+
+        :param focus_map: Mapa de varianzas por tesela.
+        :param threshold: Umbral de nitidez aplicado a cada tesela.
+        :return: Diccionario con las estadísticas del mapa.
+        """
+        blurriest = np.unravel_index(int(np.argmin(focus_map)), focus_map.shape)
+        return {
+            "grid": [int(focus_map.shape[0]), int(focus_map.shape[1])],
+            "min": round(float(focus_map.min()), 2),
+            "max": round(float(focus_map.max()), 2),
+            "mean": round(float(focus_map.mean()), 2),
+            "median": round(float(np.median(focus_map)), 2),
+            "p10": round(float(np.percentile(focus_map, 10)), 2),
+            "sharp_tile_ratio": round(float((focus_map >= threshold).mean()), 4),
+            "blurriest_tile": [int(blurriest[0]), int(blurriest[1])],
+        }
+
     @staticmethod
     def error_result_sharpness(start_time: float) -> Dict[str, Any]:
         """
@@ -77,10 +167,12 @@ class SharpnessAnalyzer:
         end_time = time.time()
         elapsed_time_seconds = round(end_time - start_time, 4)
         elapsed_time_milliseconds = int((end_time - start_time) * 1000)
-        logging.error(f"Error en el análisis de Nitidez. Tiempo transcurrido: "
+        logger.error(f"Error en el análisis de Nitidez. Tiempo transcurrido: "
                       f"{elapsed_time_seconds}s ({elapsed_time_milliseconds}ms)")
         return {
             "sharpness_value": None,
             "is_correct_sharpness": False,
+            "focus_map": None,
+            "focus_summary": None,
             "is_valid": False
         }
\ No newline at end of file
@@ -1,14 +1,12 @@
 from src.image_quality.utils.properties import SpecularReflectionsProperties
-from typing import Dict, Any
+from src.image_quality.processors.prepared_image import PreparedImage
+from typing import Union, Dict, Any
 import numpy as np
 import logging
 import time
 import cv2
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-)
+logger = logging.getLogger(__name__)
 
 class SpecularReflections:
     """
@@ -23,21 +21,25 @@ class SpecularReflections:
         self.min_region_size = SpecularReflectionsProperties.min_region_size
         self.sensitivity = SpecularReflectionsProperties.sensitivity
 
-    def detect_specular_reflections(self, image: np.ndarray) -> Dict[str, Any]:
+    def detect_specular_reflections(self, image: Union[np.ndarray, PreparedImage], return_mask: bool = False) -> Dict[str, Any]:
         """
         Detecta reflejos especulares en una imagen y calcula un puntaje para determinar su validez.
 
-        :param image: Imagen en formato OpenCV (numpy array).
+        El puntaje se obtiene sumando directamente las áreas de las regiones válidas a partir de
+        las estadísticas de componentes conexas; la máscara final solo se construye si se solicita.
+
+        :param image: Imagen en formato OpenCV (numpy array) o PreparedImage compartido.
+        :param return_mask: Si True, incluye en el resultado la máscara binaria de reflejos ("mask").
         :return: Diccionario con el puntaje de reflejo especular y si es válido.
         """
         start_time = time.time()
-        if image is None or not isinstance(image, np.ndarray):
-            logging.error("La imagen proporcionada no es válida. Se esperaba un numpy array no vacío.")
+        prepared = PreparedImage.from_image(image)
+        if prepared is None:
+            logger.error("La imagen proporcionada no es válida. Se esperaba un numpy array no vacío.")
             return self.error_result_specular_reflections(start_time)
 
         try:
-            image_hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-            canal_h, canal_s, canal_v = cv2.split(image_hsv)
+            canal_h, canal_s, canal_v = prepared.hsv_channels
 
             _, mask_intensity = cv2.threshold(canal_v, self.intensity_threshold, 255, cv2.THRESH_BINARY)
             _, mask_saturation = cv2.threshold(canal_s, self.saturation_threshold, 255, cv2.THRESH_BINARY_INV)
@@ -48,40 +50,49 @@ class SpecularReflections:
             mask_refined = cv2.morphologyEx(mask_specular, cv2.MORPH_CLOSE, kernel)
 
             num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(mask_refined, connectivity=8)
-            mask_final = np.zeros_like(mask_refined)
-            for i in range(1, num_labels):
-                area = stats[i, cv2.CC_STAT_AREA]
-                if area >= self.min_region_size:
-                    mask_final[labels == i] = 255
+            areas = stats[1:, cv2.CC_STAT_AREA]
+            valid_regions = areas >= self.min_region_size
 
             total_pixels = canal_v.size
-            specular_pixels = np.count_nonzero(mask_final)
+            specular_pixels = int(areas[valid_regions].sum())
             specular_score = (specular_pixels / total_pixels) * 100
 
             is_correct_specular_reflections = specular_score < float(self.sensitivity)
             
-            logging.info(f"Reflexión Especular: {specular_score:.2f}%. La imagen "
-             f"{'cumple' if is_correct_specular_reflections else 'no cumple'} "
-             f"con el umbral Especular ({float(self.sensitivity)}).")
-
-            end_time = time.time()
-            elapsed_time_seconds = round(end_time - start_time, 4)
-            elapsed_time_milliseconds = int((end_time - start_time) * 1000)
-            logging.info(f"Tiempo de procesamiento en Specular Reflection: {elapsed_time_seconds}s ({elapsed_time_milliseconds}ms)")
+            elapsed_time_milliseconds = int((time.time() - start_time) * 1000)
+            logger.info("Reflexión Especular: %.2f%%. Umbral: %s.", specular_score, float(self.sensitivity),
+                        extra={"stage": "specular_reflections", "duration_ms": elapsed_time_milliseconds,
+                               "value": float(specular_score), "passed": bool(is_correct_specular_reflections)})
 
-            return {
+            result = {
                 "specular_score": specular_score,
                 "is_correct_specular_reflections": is_correct_specular_reflections,
                 "is_valid": True
             }
+            if return_mask:
+                result["mask"] = self.build_specular_mask(labels, valid_regions)
+            return result
 
         except cv2.error as e:
-            logging.error(f"Error de OpenCV durante el análisis: {e}", exc_info=True)
+            logger.error(f"Error de OpenCV durante el análisis: {e}", exc_info=True)
             return self.error_result_specular_reflections(start_time)
         except Exception as e:
-            logging.error(f"Error inesperado al analizar los reflejos especulares: {e}", exc_info=True)
+            logger.error(f"Error inesperado al analizar los reflejos especulares: {e}", exc_info=True)
             return self.error_result_specular_reflections(start_time)
 
+    @staticmethod
+    def build_specular_mask(labels: np.ndarray, valid_regions: np.ndarray) -> np.ndarray:
+        """
+        Construye la máscara final en una sola pasada vectorizada usando una tabla de consulta por etiqueta.
+
+        :param labels: Matriz de etiquetas devuelta por connectedComponentsWithStats.
+        :param valid_regions: Vector booleano (sin el fondo) que indica qué etiquetas superan el área mínima.
+        :return: Máscara binaria (0/255) con las regiones especulares válidas.
+        """
+        lookup_table = np.zeros(len(valid_regions) + 1, dtype=np.uint8)
+        lookup_table[1:][valid_regions] = 255
+        return lookup_table[labels]
+
     @staticmethod
     def error_result_specular_reflections(start_time: float) -> Dict[str, Any]:
         """
@@ -92,7 +103,7 @@ class SpecularReflections:
         end_time = time.time()
         elapsed_time_seconds = round(end_time - start_time, 4)
         elapsed_time_milliseconds = int((end_time - start_time) * 1000)
-        logging.error(f"Error en el análisis de Reflexión Especular. Tiempo transcurrido: "
+        logger.error(f"Error en el análisis de Reflexión Especular. Tiempo transcurrido: "
                       f"{elapsed_time_seconds}s ({elapsed_time_milliseconds}ms)")
         return {
             "specular_score": None,
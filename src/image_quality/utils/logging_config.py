@@ -0,0 +1,109 @@
+from src.image_quality.utils.properties import LoggingProperties
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+import contextvars
+import threading
+import datetime
+import logging
+import random
+import atexit
+import queue
+import json
+import sys
+import os
+
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_request_sampled: "contextvars.ContextVar[Optional[bool]]" = contextvars.ContextVar("log_request_sampled", default=None)
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formatea cada registro como una línea JSON. Los campos pasados con extra={...} (por ejemplo
+    "stage" o "duration_ms") se añaden como claves propias.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        data: Dict[str, Any] = {
+            "timestamp": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRIBUTES and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+class SuccessSamplingFilter(logging.Filter):
+    """
+    Conserva solo una fracción de los registros por debajo de WARNING; los avisos y errores se conservan siempre.
+    Dentro de una petición la decisión se toma una vez, para conservar o descartar todas sus líneas juntas.
+    """
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1.0:
+            return True
+        sampled = _request_sampled.get()
+        if sampled is None:
+            return random.random() < self.rate
+        return sampled
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler que no formatea en el hilo que registra: el mensaje se compone en el hilo escritor.
+    Es seguro porque la cola es de hilos del mismo proceso.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def start_request_sampling():
+    """
+    Decide si se conservan las líneas de éxito de la petición actual (llamar al inicio de cada petición).
+    """
+    _request_sampled.set(random.random() < LoggingProperties.success_sample_rate)
+
+_listener: Optional[QueueListener] = None
+_configured_pid: Optional[int] = None
+_configure_lock = threading.Lock()
+
+def configure_logging():
+    """
+    Configura el logging del proceso una sola vez (también tras un fork): los registros pasan por un
+    QueueHandler a un hilo escritor en segundo plano, con formato JSON, niveles por módulo y muestreo
+    de las líneas de éxito según LoggingProperties.
+    """
+    global _listener, _configured_pid
+    if _configured_pid == os.getpid():
+        return
+    with _configure_lock:
+        if _configured_pid == os.getpid():
+            return
+
+        stream_handler = logging.StreamHandler(sys.stderr)
+        if LoggingProperties.json_format:
+            stream_handler.setFormatter(JsonFormatter())
+        else:
+            stream_handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s"))
+
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        queue_handler = _DeferredQueueHandler(log_queue)
+        queue_handler.addFilter(SuccessSamplingFilter(LoggingProperties.success_sample_rate))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(LoggingProperties.level)
+        for name, level in LoggingProperties.module_levels.items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        _configured_pid = os.getpid()
+        atexit.register(_listener.stop)
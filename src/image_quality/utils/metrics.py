@@ -0,0 +1,169 @@
+from src.image_quality.utils.properties import MetricsProperties
+from contextlib import contextmanager
+from typing import Iterator, Optional, Sequence, Tuple
+import contextvars
+import logging
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+if MetricsProperties.multiprocess_dir and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+    os.makedirs(MetricsProperties.multiprocess_dir, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = MetricsProperties.multiprocess_dir
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+except ImportError:
+    Counter = Histogram = None
+    logger.warning("prometheus_client no está instalado; las métricas de latencia están desactivadas.")
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REQUEST_BYTES_BUCKETS = (16e3, 64e3, 256e3, 512e3, 1e6, 2e6, 4e6, 8e6, 16e6, 32e6, 64e6)
+BATCH_SIZE_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 64)
+
+_endpoint: "contextvars.ContextVar[str]" = contextvars.ContextVar("metrics_endpoint", default="none")
+
+if Histogram is not None:
+    STAGE_SECONDS = Histogram("image_quality_stage_seconds", "Duración de cada etapa del procesamiento.",
+                              ["endpoint", "stage"], buckets=STAGE_BUCKETS)
+    STAGE_ERRORS = Counter("image_quality_stage_errors_total", "Errores por etapa del procesamiento.",
+                           ["endpoint", "stage"])
+    REQUEST_SECONDS = Histogram("image_quality_request_seconds", "Duración total de cada petición.",
+                                ["endpoint"], buckets=STAGE_BUCKETS)
+    REQUEST_BYTES = Histogram("image_quality_request_bytes", "Tamaño del cuerpo de cada petición.",
+                              ["endpoint"], buckets=REQUEST_BYTES_BUCKETS)
+    REQUESTS = Counter("image_quality_requests_total", "Peticiones atendidas por código de estado.",
+                       ["endpoint", "status"])
+    UPLOADS = Counter("image_quality_uploads_total", "Imágenes recibidas según si el cliente las redujo.",
+                      ["endpoint", "client_downscaled"])
+    UPLOAD_BYTES = Counter("image_quality_upload_bytes_total", "Bytes de imagen recibidos.", ["endpoint"])
+    UPLOAD_BYTES_SAVED = Counter("image_quality_upload_bytes_saved_total",
+                                 "Estimación de los bytes de subida ahorrados por la reducción en el cliente.",
+                                 ["endpoint"])
+    BATCH_SIZE = Histogram("image_quality_batch_size", "Fotogramas por lote de inferencia de cada modelo.",
+                           ["metric"], buckets=BATCH_SIZE_BUCKETS)
+    BATCH_QUEUE_SECONDS = Histogram("image_quality_batch_queue_seconds",
+                                    "Espera de cada fotograma en la cola de micro-lotes hasta su inferencia.",
+                                    ["metric"], buckets=STAGE_BUCKETS)
+    BATCH_INFERENCE_SECONDS = Histogram("image_quality_batch_inference_seconds",
+                                        "Duración de la inferencia de cada lote.", ["metric"], buckets=STAGE_BUCKETS)
+
+def set_endpoint(endpoint: Optional[str]):
+    """
+    Fija el endpoint con el que se etiquetan las métricas del contexto actual (hilo o petición).
+    """
+    _endpoint.set(endpoint or "none")
+
+def current_endpoint() -> str:
+    """
+    Devuelve el endpoint del contexto actual, para propagarlo a tareas en otros hilos.
+    """
+    return _endpoint.get()
+
+def observe_stage(stage: str, seconds: float, endpoint: Optional[str] = None):
+    """
+    Registra la duración de una etapa.
+
+    :param stage: Nombre de la etapa (por ejemplo "image_decode" o "sharpness").
+    :param seconds: Duración en segundos.
+    :param endpoint: Endpoint de la etiqueta; por defecto el del contexto actual.
+    """
+    if MetricsProperties.enabled and Histogram is not None:
+        STAGE_SECONDS.labels(endpoint or _endpoint.get(), stage).observe(seconds)
+
+def record_error(stage: str, endpoint: Optional[str] = None):
+    """
+    Contabiliza un error en una etapa.
+    """
+    if MetricsProperties.enabled and Counter is not None:
+        STAGE_ERRORS.labels(endpoint or _endpoint.get(), stage).inc()
+
+@contextmanager
+def stage_timer(stage: str, endpoint: Optional[str] = None) -> Iterator[None]:
+    """
+    Mide la duración del bloque como una etapa y contabiliza un error si el bloque lanza una excepción.
+    """
+    start_time = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        record_error(stage, endpoint)
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - start_time, endpoint)
+
+def observe_request(endpoint: Optional[str], status_code: int, seconds: float, request_bytes: Optional[int]):
+    """
+    Registra la duración, el tamaño y el código de estado de una petición.
+    """
+    if not MetricsProperties.enabled or Histogram is None:
+        return
+    endpoint = endpoint or "none"
+    REQUEST_SECONDS.labels(endpoint).observe(seconds)
+    REQUESTS.labels(endpoint, str(status_code)).inc()
+    if request_bytes:
+        REQUEST_BYTES.labels(endpoint).observe(request_bytes)
+
+def observe_upload(uploaded_bytes: int, uploaded_dimensions: Tuple[int, int],
+                   capture_dimensions: Optional[Tuple[int, int]] = None):
+    """
+    Contabiliza una imagen recibida y el ahorro de ancho de banda de la reducción en el cliente.
+    El ahorro se estima escalando los bytes recibidos por la proporción de píxeles entre la captura
+    original que declara el cliente y la imagen subida.
+
+    :param uploaded_bytes: Tamaño de la imagen recibida.
+    :param uploaded_dimensions: (ancho, alto) de la imagen recibida.
+    :param capture_dimensions: (ancho, alto) de la captura original según el cliente, o None si no lo declara.
+    """
+    if not MetricsProperties.enabled or Counter is None:
+        return
+    endpoint = _endpoint.get()
+    UPLOAD_BYTES.labels(endpoint).inc(uploaded_bytes)
+    uploaded_pixels = uploaded_dimensions[0] * uploaded_dimensions[1]
+    if capture_dimensions is None or uploaded_pixels <= 0:
+        UPLOADS.labels(endpoint, "unknown").inc()
+        return
+    capture_pixels = capture_dimensions[0] * capture_dimensions[1]
+    downscaled = capture_pixels > uploaded_pixels
+    UPLOADS.labels(endpoint, "yes" if downscaled else "no").inc()
+    if downscaled:
+        UPLOAD_BYTES_SAVED.labels(endpoint).inc(uploaded_bytes * (capture_pixels / uploaded_pixels - 1))
+
+def observe_batch(metric: str, size: int, queue_seconds: Sequence[float], inference_seconds: float):
+    """
+    Registra un lote del planificador de micro-lotes.
+
+    :param metric: Nombre de la métrica del modelo.
+    :param size: Número de fotogramas del lote.
+    :param queue_seconds: Espera en cola de cada fotograma del lote.
+    :param inference_seconds: Duración de la inferencia del lote.
+    """
+    if not MetricsProperties.enabled or Histogram is None:
+        return
+    BATCH_SIZE.labels(metric).observe(size)
+    for seconds in queue_seconds:
+        BATCH_QUEUE_SECONDS.labels(metric).observe(seconds)
+    BATCH_INFERENCE_SECONDS.labels(metric).observe(inference_seconds)
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Genera el texto en formato Prometheus. Con PROMETHEUS_MULTIPROC_DIR se agregan los valores
+    de todos los workers de gunicorn; si no, solo los del proceso actual.
+
+    :return: Tupla (cuerpo, content type).
+    """
+    if Histogram is None:
+        return b"# prometheus_client no esta instalado\n", "text/plain; charset=utf-8"
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+def mark_process_dead(pid: int):
+    """
+    Limpia los ficheros de métricas de un worker terminado (llamar desde el hook child_exit de gunicorn).
+    """
+    if Histogram is not None and "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid)
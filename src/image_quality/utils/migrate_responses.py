@@ -0,0 +1,61 @@
+"""
+Migración única de los archivos JSON heredados a los almacenes JSON Lines segmentados.
+
+También rellena el almacén SQLite de resultados con las respuestas ya guardadas.
+
+Uso: python -m src.image_quality.utils.migrate_responses
+"""
+from src.image_quality.processors.result_store import get_result_store, store_endpoint
+from src.image_quality.processors.response_handler import ResponseHandler
+from src.image_quality.utils.properties import ResponseHandlerPaths
+from src.image_quality.utils.logging_config import configure_logging
+import logging
+
+logger = logging.getLogger(__name__)
+
+LEGACY_MIGRATIONS = [
+    (ResponseHandlerPaths.legacy_responses_images_real_time, ResponseHandlerPaths.responses_hander_images_real_time),
+    (ResponseHandlerPaths.legacy_responses_images_gallery, ResponseHandlerPaths.responses_hander_images_gallery),
+]
+
+def migrate_responses():
+    """
+    Migra todos los archivos heredados conocidos, registra el resultado de cada uno y completa el
+    índice lateral de cada almacén (segmentos e ids).
+    """
+    for legacy_filename, store_dir in LEGACY_MIGRATIONS:
+        handler = ResponseHandler(store_dir)
+        result = handler.migrate_legacy_file(legacy_filename)
+        logger.info("Migración %s -> %s: %s", legacy_filename, store_dir, result)
+        handler.rebuild_sidecar_index()
+
+def backfill_result_store(chunk_size: int = 1000):
+    """
+    Copia al almacén SQLite de resultados las respuestas ya guardadas en los almacenes JSON Lines.
+    El almacén ignora las respuestas que ya tiene, así que puede ejecutarse más de una vez, con el
+    servidor indexando respuestas nuevas o tras una ejecución interrumpida.
+
+    :param chunk_size: Número de respuestas insertadas por transacción.
+    """
+    result_store = get_result_store()
+    if result_store is None:
+        return
+    for _, store_dir in LEGACY_MIGRATIONS:
+        endpoint = store_endpoint(store_dir)
+        handler = ResponseHandler(store_dir)
+        chunk, total, inserted = [], 0, 0
+        for entry in handler.iter_index():
+            chunk.append((handler.read_entry(entry), entry["timestamp"]))
+            if len(chunk) >= chunk_size:
+                inserted += result_store.insert(endpoint, chunk)
+                total += len(chunk)
+                chunk = []
+        inserted += result_store.insert(endpoint, chunk)
+        total += len(chunk)
+        logger.info("Indexadas %d de %d respuestas de %s en el almacén SQLite (el resto ya estaban)",
+                    inserted, total, store_dir)
+
+if __name__ == "__main__":
+    configure_logging()
+    migrate_responses()
+    backfill_result_store()
@@ -13,6 +13,64 @@ class ImageDimensionProperties:
     """
     target_vertical = (1080, 1920)
 
+    """
+    Si False, las imágenes más pequeñas que el objetivo no se amplían y se conservan tal cual.
+    """
+    allow_upscale = True
+
+    """
+    Si True, las imágenes JPEG grandes se decodifican directamente a 1/2, 1/4 u 1/8 de su tamaño
+    (IMREAD_REDUCED_COLOR_*) cuando la escala reducida sigue cubriendo las dimensiones objetivo.
+    """
+    reduced_decode = True
+
+class CaptureProperties:
+    """
+    Parámetros de captura que el servidor recomienda a los clientes (endpoint /capabilities), para que
+    reduzcan y compriman la imagen en el dispositivo antes de subirla.
+    """
+
+    """
+    Si False, /capabilities indica a los clientes que suban la imagen a su resolución original.
+    """
+    client_downscale = True
+
+    """
+    Calidad JPEG recomendada (0-1, como en canvas.toBlob).
+    """
+    client_jpeg_quality = 0.9
+
+class ImageOutputProperties:
+    """
+    Propiedades del formato de almacenamiento de las imágenes procesadas.
+    """
+
+    """
+    Formato de almacenamiento: "jpg", "webp" o "png".
+    """
+    storage_format = "jpg"
+
+    """
+    Calidad JPEG (0-100).
+    """
+    jpeg_quality = 95
+
+    """
+    Calidad WebP (1-100).
+    """
+    webp_quality = 90
+
+    """
+    Nivel de compresión PNG (0-9).
+    """
+    png_compression = 3
+
+    """
+    Si True y la imagen no necesita redimensionarse, se guardan los bytes originales sin recodificar
+    (solo cuando el formato original coincide con el de almacenamiento).
+    """
+    passthrough_original = True
+
 class SharpnessProperties:
     """
     Propiedades relacionadas con el análisis de la nitidez de las imágenes.
@@ -23,6 +81,21 @@ class SharpnessProperties:
     """
     default_threshold_sharpness = 150.0
 
+    """
+    Si True, la nitidez se calcula por teselas en paralelo y se devuelve además un mapa de enfoque.
+    """
+    tiled = True
+
+    """
+    Rejilla (filas, columnas) del mapa de enfoque.
+    """
+    tile_grid = (4, 4)
+
+    """
+    Hilos para procesar las filas de teselas (None para usar los mismos que OpenCV, cv2.getNumThreads()).
+    """
+    tile_workers = None
+
 class ExposureProperties:
     """
     Propiedades relacionadas con los umbrales de exposición (sobreexposición y subexposición).
@@ -49,6 +122,21 @@ class ExposureProperties:
         "tolerance": tolerance
     }
 
+    """
+    Perfiles de umbrales con nombre (por ejemplo, por clase de dispositivo). Todos se evalúan en la
+    misma pasada sobre un único histograma y se devuelven en "profiles".
+    """
+    profiles = {
+        "default": default_thresholds_exposure,
+        "budget_phone": {"overexposed_threshold": 240, "underexposed_threshold": 15, "tolerance": 0.35},
+        "flagship_phone": {"overexposed_threshold": 250, "underexposed_threshold": 5, "tolerance": 0.25},
+    }
+
+    """
+    Si True, la respuesta incluye el histograma de 256 niveles de gris para que el cliente pueda dibujarlo.
+    """
+    return_histogram = False
+
 class SpecularReflectionsProperties:
     """
     Parámetros utilizados para la detección de reflejos especulares en imágenes.
@@ -75,9 +163,504 @@ class SpecularReflectionsProperties:
     """
     sensitivity = 1.5
 
+class AnalyzerProperties:
+    """
+    Métricas que se ejecutan en cada endpoint. Los nombres corresponden al registro de analizadores
+    (processors/analyzer_registry.py): "sharpness", "exposure", "specular_reflections" y las métricas
+    de pyiqa registradas ("niqe", "brisque"). Los módulos pesados solo se importan si alguna métrica
+    activa los necesita.
+    """
+
+    """
+    Métricas por endpoint ("real_time" incluye la sesión en directo; "gallery" incluye el análisis por lotes).
+    """
+    endpoints = {
+        "real_time": ("sharpness", "exposure", "specular_reflections"),
+        "gallery": ("sharpness", "exposure", "specular_reflections"),
+    }
+
+class PyiqaProperties:
+    """
+    Parámetros de las métricas sin referencia de pyiqa (NIQE, BRISQUE), ejecutadas en CPU.
+    """
+
+    """
+    Dispositivo de inferencia.
+    """
+    device = "cpu"
+
+    """
+    Hilos de torch por proceso (None para usar los mismos que OpenCV).
+    """
+    torch_threads = None
+
+    """
+    Lado mayor en píxeles de la imagen que se entrega al modelo (None para usar la completa).
+    Estas métricas son mucho más costosas que las de OpenCV y apenas cambian al reducir la imagen.
+    """
+    max_side = 512
+
+    """
+    Umbral de cada métrica: en las métricas en las que una puntuación menor es mejor (NIQE, BRISQUE)
+    la imagen cumple si la puntuación no supera el umbral; en las demás, si lo alcanza.
+    """
+    thresholds = {
+        "niqe": 6.0,
+        "brisque": 45.0,
+    }
+
+class MicroBatchingProperties:
+    """
+    Planificador de micro-lotes de las métricas basadas en modelos (pyiqa): los fotogramas de peticiones
+    concurrentes se agrupan en un único tensor por lote. Solo actúa en el análisis en el hilo de la
+    petición; los procesos del motor de análisis reciben un fotograma cada vez y no agrupan.
+    """
+
+    """
+    Si False, cada petición ejecuta el modelo sobre su propio fotograma.
+    """
+    enabled = True
+
+    """
+    Número máximo de fotogramas por lote.
+    """
+    max_batch_size = 8
+
+    """
+    Espera máxima en milisegundos desde que llega el primer fotograma de un lote hasta que se ejecuta,
+    aunque el lote no esté lleno. Es la latencia máxima que se añade a una petición aislada.
+    """
+    max_wait_ms = 10
+
+    """
+    Tiempo máximo en segundos que una petición espera el resultado de su lote.
+    """
+    timeout_seconds = 30.0
+
 class ResponseHandlerPaths:
     """
-    Clase que contiene las rutas a archivos JSON utilizados para gestionar respuestas relacionadas con imágenes.
+    Clase que contiene las rutas utilizadas para gestionar respuestas relacionadas con imágenes.
+    """
+
+    """
+    Directorios de los almacenes de respuestas en formato JSON Lines segmentado (solo anexado).
+    """
+    responses_hander_images_real_time = "data/responses/responses_images_real_time"
+    responses_hander_images_gallery = "data/responses/responses_images_gallery"
+
+    """
+    Archivos JSON heredados (un único array por archivo) que se migran a los almacenes segmentados.
+    """
+    legacy_responses_images_real_time = "data/responses/responses_images_real_time.json"
+    legacy_responses_images_gallery = "data/responses/responses_images_gallery.json"
+
+class ResultStoreProperties:
+    """
+    Parámetros del almacén SQLite indexado de resultados (consultas agregadas de /stats).
+    """
+
+    """
+    Si False, las respuestas solo se guardan en los almacenes JSON Lines.
+    """
+    enabled = True
+
+    """
+    Ruta del archivo SQLite, compartido por todos los workers de la máquina.
+    """
+    sqlite_path = "data/results/results.sqlite3"
+
+    """
+    Nombre de endpoint con el que se guardan las respuestas de cada almacén JSON Lines.
+    """
+    store_endpoints = {
+        ResponseHandlerPaths.responses_hander_images_real_time: "analyze_image_real_time",
+        ResponseHandlerPaths.responses_hander_images_gallery: "analyze_image_gallery",
+    }
+
+    """
+    Duración en segundos de cada intervalo de los agregados precalculados. Los extremos de un rango
+    de /stats que no cubren un intervalo completo se calculan a partir de la tabla de detalle.
+    """
+    bucket_seconds = 3600
+
+    """
+    Razón entre contenedores consecutivos de los histogramas logarítmicos (1.02 = error relativo
+    de los percentiles en torno al 1%).
+    """
+    histogram_bin_ratio = 1.02
+
+    """
+    Percentiles (0-100) que devuelve /stats por defecto.
+    """
+    percentiles = [50, 90, 99]
+
+    """
+    Número máximo de grupos devueltos al desglosar con group_by.
+    """
+    max_groups = 100
+
+class ResponseStoreProperties:
+    """
+    Parámetros de rotación y durabilidad del almacén de respuestas segmentado.
+    """
+
+    """
+    Tamaño máximo en bytes de un segmento antes de abrir uno nuevo.
+    """
+    max_segment_bytes = 64 * 1024 * 1024
+
+    """
+    Antigüedad máxima en segundos de un segmento antes de abrir uno nuevo (None para desactivar).
+    """
+    max_segment_age_seconds = 24 * 60 * 60
+
+    """
+    Si True, fuerza fsync tras cada escritura (más durable, pero más lento).
+    """
+    fsync = False
+
+class PersistenceProperties:
+    """
+    Parámetros de la cola de persistencia en segundo plano (imágenes y respuestas).
+    """
+
+    """
+    Si False, las imágenes y respuestas se escriben de forma síncrona dentro de la petición.
+    """
+    enabled = True
+
+    """
+    Número máximo de tareas pendientes en la cola.
+    """
+    max_queue_size = 256
+
+    """
+    Número de hilos de escritura.
+    """
+    workers = 1
+
+    """
+    Número máximo de tareas que un hilo agrupa en cada iteración.
+    """
+    batch_size = 32
+
+    """
+    Política cuando la cola está llena:
+    - "block": espera hasta block_timeout_seconds y, si sigue llena, escribe en el hilo de la petición.
+    - "drop": descarta la tarea y la contabiliza.
+    - "spill": escribe directamente en el hilo de la petición.
+    """
+    full_queue_policy = "block"
+
+    """
+    Tiempo máximo de espera en segundos con la política "block".
+    """
+    block_timeout_seconds = 2.0
+
+class ImageStoreProperties:
+    """
+    Parámetros del almacén de imágenes direccionado por contenido y de su política de retención.
+    """
+
+    """
+    Si False, las imágenes se guardan como antes, en un único directorio plano y sin limpieza.
+    """
+    enabled = True
+
+    """
+    Número de niveles de subdirectorios y caracteres del hash por nivel (2 y 2 -> objects/ab/cd/<hash>.jpg).
+    """
+    shard_depth = 2
+    shard_width = 2
+
+    """
+    Nombre del índice SQLite dentro del directorio del almacén.
+    """
+    index_filename = "index.sqlite3"
+
+    """
+    Antigüedad máxima en segundos de una imagen (None para no expulsar por antigüedad).
+    """
+    max_age_seconds = 30 * 24 * 60 * 60
+
+    """
+    Tamaño total máximo en bytes del almacén (None para no limitarlo).
+    """
+    max_total_bytes = 20 * 1024 * 1024 * 1024
+
+    """
+    Cuota en bytes por endpoint; al superarla se expulsan primero sus imágenes más antiguas.
+    """
+    endpoint_quota_bytes = {
+        "analyze_image_real_time": 10 * 1024 * 1024 * 1024,
+    }
+
+    """
+    Intervalo en segundos entre pasadas de retención en segundo plano (None para desactivarlas).
+    """
+    eviction_interval_seconds = 300
+
+    """
+    Contenidos expulsados por transacción. Los archivos de cada bloque se borran tras su COMMIT, así que
+    put() nunca espera más que el borrado de un bloque en el índice.
+    """
+    eviction_chunk_size = 500
+
+class BatchProperties:
+    """
+    Parámetros del endpoint de análisis por lotes.
+    """
+
+    """
+    Número de hilos que analizan imágenes en paralelo (None para usar el número de núcleos).
+    """
+    max_workers = None
+
+    """
+    Número máximo de imágenes leídas y pendientes de resultado por cada hilo.
+    La memoria queda acotada por max_workers * max_in_flight_per_worker imágenes.
+    """
+    max_in_flight_per_worker = 2
+
+    """
+    Extensiones aceptadas dentro de un archivo tar.
+    """
+    tar_image_extensions = (".jpg", ".jpeg", ".png", ".webp")
+
+class AnalysisEngineProperties:
+    """
+    Parámetros del motor opcional de análisis en un conjunto de procesos con memoria compartida.
+    """
+
+    """
+    Si True, los analizadores se ejecutan en procesos persistentes en lugar del hilo de la petición.
+    Solo afecta a los análisis completos (galería, lotes y tiempo real con CascadeProperties.enabled a
+    False): la cascada ejecuta cada etapa en el hilo de la petición para poder detenerse tras la primera
+    métrica que no cumple, así que con ella activa el tiempo real y la sesión en directo no usan el motor.
+    """
+    enabled = False
+
+    """
+    Número de procesos de análisis (None para usar el número de núcleos).
+    """
+    workers = None
+
+    """
+    Hilos internos de OpenCV por proceso (1 evita sobresuscribir la CPU con varios procesos).
+    """
+    opencv_threads_per_worker = 1
+
+    """
+    Tiempo máximo en segundos para analizar un fotograma antes de considerar caído el proceso.
+    """
+    task_timeout_seconds = 30.0
+
+class ServingProperties:
+    """
+    Parámetros del modo de producción con gunicorn (gunicorn.conf.py).
+    """
+
+    """
+    Puerto por defecto si no se define la variable de entorno PORT.
+    """
+    port = 5001
+
+    """
+    Número de workers (None para uno por núcleo: el análisis está limitado por CPU).
+    """
+    workers = None
+
+    """
+    Hilos por worker (worker gthread). Cada sesión WebSocket de /stream_real_time ocupa un hilo mientras dura.
+    """
+    threads = 4
+
+    """
+    Hilos internos de OpenCV por worker (None para repartir los núcleos entre los workers, mínimo 1).
+    """
+    opencv_threads_per_worker = None
+
+    """
+    Si True, la aplicación se importa en el proceso maestro antes de crear los workers, que comparten
+    los módulos cargados (copy-on-write).
+    """
+    preload = True
+
+    """
+    Si True, cada worker ejecuta un análisis completo sobre una imagen sintética antes de aceptar peticiones.
+    """
+    warmup = True
+
+    """
+    Tiempo máximo en segundos de una petición antes de reiniciar el worker, y espera del cierre ordenado.
+    """
+    timeout = 60
+    graceful_timeout = 30
+
+    """
+    Peticiones tras las que se recicla un worker (0 para no reciclarlos) y variación aleatoria para no
+    reciclarlos todos a la vez.
+    """
+    max_requests = 5000
+    max_requests_jitter = 500
+
+    """
+    Directorio de métricas multiproceso si no se define PROMETHEUS_MULTIPROC_DIR ni MetricsProperties.multiprocess_dir.
+    """
+    metrics_multiprocess_dir = "/tmp/image_quality_metrics"
+
+class StreamingProperties:
+    """
+    Parámetros de la sesión persistente (WebSocket) de captura en tiempo real.
+    """
+
+    """
+    Segundos sin recibir fotogramas antes de cerrar la sesión.
+    """
+    idle_timeout_seconds = 60
+
+    """
+    Tamaño máximo en bytes de un fotograma; los mayores se descartan.
+    """
+    max_frame_bytes = 10 * 1024 * 1024
+
+class TemporalReuseProperties:
+    """
+    Parámetros de la reutilización de resultados entre fotogramas consecutivos en tiempo real.
+    """
+
+    """
+    Si True, los fotogramas casi idénticos al último analizado reutilizan su resultado.
+    """
+    enabled = True
+
+    """
+    Lado en píxeles de la miniatura en gris usada como firma del fotograma.
+    """
+    signature_size = 32
+
+    """
+    Diferencia media absoluta máxima (niveles de gris, 0-255) para considerar dos fotogramas iguales.
+    """
+    tolerance = 2.0
+
+    """
+    Número máximo de fotogramas seguidos que reutilizan un resultado antes de forzar un análisis completo.
+    """
+    max_consecutive_reuses = 10
+
+    """
+    Antigüedad máxima en segundos de un resultado reutilizable.
+    """
+    max_age_seconds = 2.0
+
+    """
+    Número máximo de sesiones HTTP recordadas por proceso.
+    """
+    max_sessions = 1024
+
+class ResultCacheProperties:
+    """
+    Parámetros de la caché de resultados direccionada por contenido para las imágenes de galería.
+    """
+
+    """
+    Si True, una imagen ya analizada (mismos bytes y mismos parámetros) devuelve el resultado guardado.
+    """
+    enabled = True
+
+    """
+    Almacenamiento de la caché:
+    - "memory": en la memoria de cada proceso.
+    - "sqlite": archivo SQLite local compartido por todos los workers.
+    """
+    backend = "memory"
+
+    """
+    Número máximo de resultados guardados (se expulsa el menos usado).
+    """
+    max_entries = 1024
+
+    """
+    Antigüedad máxima en segundos de un resultado guardado.
+    """
+    ttl_seconds = 60 * 60
+
+    """
+    Ruta del archivo SQLite con el backend "sqlite".
+    """
+    sqlite_path = "data/cache/results.sqlite3"
+
+class MetricsProperties:
+    """
+    Parámetros de las métricas de latencia por etapa expuestas en /metrics (formato Prometheus).
+    """
+
+    """
+    Si False, no se registra ninguna métrica.
+    """
+    enabled = True
+
+    """
+    Directorio compartido por los workers de gunicorn para agregar las métricas entre procesos
+    (PROMETHEUS_MULTIPROC_DIR). Debe vaciarse al arrancar el servidor. None para métricas por proceso.
+    """
+    multiprocess_dir = None
+
+class CascadeProperties:
+    """
+    Parámetros de la evaluación en cascada del endpoint de tiempo real: las comprobaciones baratas se
+    ejecutan primero y, si el fotograma ya se ha rechazado, las siguientes se marcan como no evaluadas.
+    La galería mantiene siempre la evaluación completa.
+    """
+
+    """
+    Si True, /analyze_image_real_time y la sesión en directo usan la cascada, que se ejecuta siempre en
+    el hilo de la petición aunque AnalysisEngineProperties.enabled sea True.
+    """
+    enabled = True
+
+    """
+    Orden de evaluación de las métricas ("exposure", "sharpness", "specular_reflections"). Solo se evalúan
+    las activas en AnalyzerProperties.endpoints["real_time"]; las activas que no aparecen aquí se evalúan al final.
+    """
+    order = ("exposure", "sharpness", "specular_reflections")
+
+    """
+    Política de cortocircuito:
+    - "first_failure": se detiene en la primera métrica que no cumple su umbral.
+    - "never": evalúa siempre todas las métricas (mismo orden).
+    """
+    short_circuit = "first_failure"
+
+    """
+    Lado mayor en píxeles de la muestra sobre la que se evalúa la exposición: un píxel de cada paso, sin
+    promediar, para no borrar los brillos saturados pequeños (None para usar el fotograma completo).
+    """
+    exposure_max_side = 480
+
+class LoggingProperties:
+    """
+    Parámetros del logging estructurado del servidor.
+    """
+
+    """
+    Nivel general del logging.
+    """
+    level = "INFO"
+
+    """
+    Niveles por módulo, por ejemplo {"src.image_quality.services": "WARNING", "werkzeug": "WARNING"}.
+    """
+    module_levels = {}
+
+    """
+    Si True, cada registro se escribe como una línea JSON; si False, en texto plano.
+    """
+    json_format = True
+
+    """
+    Fracción (0-1) de las líneas de éxito (por debajo de WARNING) que se conservan.
+    Los avisos y errores se conservan siempre.
     """
-    responses_hander_images_real_time = "data/responses/responses_images_real_time.json"
-    responses_hander_images_gallery = "data/responses/responses_images_gallery.json"
\ No newline at end of file
+    success_sample_rate = 1.0
@@ -0,0 +1,89 @@
+"""
+Utilidades del modo de producción con gunicorn: dimensionado de workers e hilos, configuración de
+cada worker tras el fork y calentamiento de los analizadores.
+"""
+from src.image_quality.utils.properties import CascadeProperties, ServingProperties
+from src.image_quality.utils.logging_config import configure_logging
+from src.image_quality.utils.metrics import set_endpoint
+from typing import Optional
+import numpy as np
+import logging
+import time
+import cv2
+import os
+
+logger = logging.getLogger(__name__)
+
+def worker_count(cores: Optional[int] = None) -> int:
+    """
+    Número de workers de gunicorn: el configurado o uno por núcleo.
+
+    :param cores: Núcleos disponibles; por defecto os.cpu_count().
+    """
+    return ServingProperties.workers or max(1, cores or os.cpu_count() or 1)
+
+def thread_count() -> int:
+    """
+    Número de hilos por worker.
+    """
+    return max(1, ServingProperties.threads or 1)
+
+def opencv_thread_count(workers: Optional[int] = None, cores: Optional[int] = None) -> int:
+    """
+    Hilos internos de OpenCV por worker: los configurados o los núcleos repartidos entre los workers,
+    para que la suma no supere la CPU disponible.
+    """
+    if ServingProperties.opencv_threads_per_worker:
+        return ServingProperties.opencv_threads_per_worker
+    cores = cores or os.cpu_count() or 1
+    return max(1, cores // (workers or worker_count(cores)))
+
+def configure_worker(opencv_threads: Optional[int] = None):
+    """
+    Configura un worker recién creado (llamar desde el hook post_fork de gunicorn): fija los hilos
+    de OpenCV y reconfigura el logging del proceso.
+
+    :param opencv_threads: Hilos de OpenCV; por defecto opencv_thread_count().
+    """
+    cv2.setNumThreads(opencv_threads or opencv_thread_count())
+    configure_logging()
+
+def warm_up():
+    """
+    Ejecuta una pasada completa (decodificación, redimensionado y todos los analizadores) sobre una
+    imagen sintética sin guardar nada, para que la primera petición real no pague la inicialización
+    perezosa de OpenCV, de los conjuntos de hilos y de los analizadores activos (incluidos los modelos
+    de pyiqa, que la cascada podría no llegar a ejecutar sobre la imagen sintética).
+    Las métricas de esta pasada se etiquetan con el endpoint "warmup".
+    """
+    from src.image_quality.processors.analyzer_registry import endpoint_analyzers, load_analyzers
+    from src.image_quality.processors.evaluation_cascade import analyze_cascade
+    from src.image_quality.processors.analysis_engine import analyze_frame
+    from src.image_quality.processors.image_processor import ImageProcessor
+
+    start_time = time.time()
+    set_endpoint("warmup")
+    try:
+        width, height = ImageProcessor().target_horizontal
+        gradient = np.linspace(0, 255, width, dtype=np.uint8)
+        image = cv2.merge([np.tile(gradient, (height * 2, 2))] * 3)
+        success, buffer = cv2.imencode(".jpg", image)
+        if not success:
+            raise ValueError("No se pudo codificar la imagen de calentamiento.")
+
+        processor = ImageProcessor()
+        decoded, (original_width, original_height) = processor.decode_for_target(buffer.tobytes())
+        target_width, target_height = processor.target_dimensions(original_width, original_height)
+        resized = cv2.resize(decoded, (target_width, target_height), interpolation=cv2.INTER_LINEAR)
+        load_analyzers(set(endpoint_analyzers("real_time")) | set(endpoint_analyzers("gallery")))
+        analyze_frame(resized, endpoint_analyzers("gallery"))
+        if CascadeProperties.enabled:
+            analyze_cascade(resized, endpoint_analyzers("real_time"))
+    except Exception as e:
+        logger.error(f"Error durante el calentamiento de los analizadores: {e}", exc_info=True)
+        return
+    finally:
+        set_endpoint(None)
+
+    logger.info("Calentamiento de los analizadores completado",
+                extra={"stage": "warmup", "duration_ms": int((time.time() - start_time) * 1000)})
@@ -0,0 +1,43 @@
+// Parámetros de captura recomendados por el servidor (resolución objetivo y calidad JPEG)
+let captureSettings = null;
+
+async function loadCaptureSettings() {
+    if (captureSettings) return captureSettings;
+    try {
+        const response = await fetch("/capabilities");
+        if (!response.ok) throw new Error(`Error en la respuesta del servidor: ${response.status}`);
+        captureSettings = await response.json();
+    } catch (error) {
+        // Sin parámetros del servidor se sube la imagen completa, como antes
+        console.error("No se pudieron obtener los parámetros de captura:", error);
+        captureSettings = { client_downscale: false, jpeg_quality: 0.9 };
+    }
+    return captureSettings;
+}
+
+// Dimensiones finales con la misma regla que el servidor (conserva la relación de aspecto y nunca amplía)
+function fitToTarget(width, height, settings) {
+    if (!settings?.client_downscale) return [width, height];
+    const target = width > height ? settings.target_horizontal : settings.target_vertical;
+    if (width <= target.width && height <= target.height) return [width, height];
+    const aspectRatio = width / height;
+    if (aspectRatio > target.width / target.height) {
+        return [target.width, Math.trunc(target.width / aspectRatio)];
+    }
+    return [Math.trunc(target.height * aspectRatio), target.height];
+}
+
+// Dibuja la fuente (vídeo o imagen) reducida a la resolución objetivo y la codifica como JPEG
+async function encodeForUpload(source, sourceWidth, sourceHeight, canvas) {
+    const settings = await loadCaptureSettings();
+    const [width, height] = fitToTarget(sourceWidth, sourceHeight, settings);
+    canvas.width = width;
+    canvas.height = height;
+    const context = canvas.getContext("2d");
+    context.imageSmoothingQuality = "high";
+    context.drawImage(source, 0, 0, width, height);
+    return new Promise((resolve) => canvas.toBlob(resolve, "image/jpeg", settings.jpeg_quality));
+}
+
+// Pedir los parámetros en cuanto carga la página para no retrasar la primera captura
+loadCaptureSettings();
@@ -72,96 +72,97 @@ document.addEventListener("DOMContentLoaded", () => {
             return;
         }
 
-        // Leer el archivo como Base64
-        const reader = new FileReader();
-        reader.onload = async (e) => {
-            const imageBase64 = e.target.result.split(",")[1];
-
-            // Mostrar spinner y ocultar botón de analizar
-            spinnerContainer.style.display = "flex";
-            galleryAnalyzeButton.style.display = "none";
-
-            try {
-                // Llamar al endpoint del backend
-                const response = await fetch("/analyze_image_gallery", {
-                    method: "POST",
-                    headers: { "Content-Type": "application/json" },
-                    body: JSON.stringify({
-                        image: imageBase64, // Imagen en formato Base64
-                        metadata: imageMetadata, // Metadatos extraídos
-                        userAgent: deviceInfo.userAgent,
-                        platform: deviceInfo.platform,
-                        screenWidth: deviceInfo.screenWidth,
-                        screenHeight: deviceInfo.screenHeight,
-                        pixelRatio: deviceInfo.pixelRatio,
-                        colorDepth: deviceInfo.colorDepth,
-                        touchPoints: deviceInfo.touchPoints,
-                        cpuCores: deviceInfo.cpuCores,
-                })
-                });
-
-                if (!response.ok) {
-                    throw new Error(`Error en la respuesta del servidor: ${response.status}`);
-                }
+        // Mostrar spinner y ocultar botón de analizar
+        spinnerContainer.style.display = "flex";
+        galleryAnalyzeButton.style.display = "none";
+
+        try {
+            // Reducir la imagen en el dispositivo si supera la resolución objetivo del servidor;
+            // si no, se envía el archivo original (los metadatos EXIF ya se extrajeron en el cliente)
+            const settings = await loadCaptureSettings();
+            const captureWidth = galleryImage.naturalWidth;
+            const captureHeight = galleryImage.naturalHeight;
+            const [width, height] = fitToTarget(captureWidth, captureHeight, settings);
+            const upload = width < captureWidth || height < captureHeight
+                ? await encodeForUpload(galleryImage, captureWidth, captureHeight, document.createElement("canvas"))
+                : file;
+
+            // Enviar la imagen como multipart (sin Base64) junto con la información del cliente
+            const formData = new FormData();
+            formData.append("image", upload, file.name);
+            formData.append("client_info", JSON.stringify({
+                ...deviceInfo,
+                captureWidth,
+                captureHeight,
+                metadata: imageMetadata, // Metadatos extraídos
+            }));
+
+            // Llamar al endpoint del backend
+            const response = await fetch("/analyze_image_gallery", {
+                method: "POST",
+                body: formData
+            });
 
-                const data = await response.json();
-
-                // Mostrar resultados
-                resultadoContainer.innerHTML = `
-                <h3><b>Información del Dispositivo:</b></h3>
-                <p><strong>User-Agent:</strong> ${data.client_info?.user_agent || "N/A"}</p>
-                <p><strong>Platform:</strong> ${data.client_info?.platform || "N/A"}</p>
-                <p><strong>Screen Width:</strong> ${data.client_info?.screen_width || "N/A"}</p>
-                <p><strong>Screen Height:</strong> ${data.client_info?.screen_height || "N/A"}</p>
-                <p><strong>Pixel Ratio:</strong> ${data.client_info?.pixel_ratio || "N/A"}</p>
-                <p><strong>Color Depth:</strong> ${data.client_info?.color_depth || "N/A"}</p>
-                <p><strong>Touch Points:</strong> ${data.client_info?.touch_points || "N/A"}</p>
-                <p><strong>CPU Cores:</strong> ${data.client_info?.cpu_cores || "N/A"}</p>
-
-                <h3><b>Metadata:</b></h3>
-                <p><strong>MetaData:</strong> <pre>${JSON.stringify(data.metadata || {}, null, 2)}</pre></p>
-                <h3><b>Resultados del Análisis:</b></h3>
-                <p><strong>ID Imagen:</strong> ${data.image_id || "N/A"}</p>
-                <p><strong>Dimensiones Originales:</strong> 
-                ${data.original_dimensions?.width || "N/A"}x${data.original_dimensions?.height || "N/A"}</p>
-                <p><strong>Dimensiones Redimensionadas:</strong> 
-                ${data.resized_dimensions?.width || "N/A"}x${data.resized_dimensions?.height || "N/A"}</p>
-
-                <p><strong>Nitidez:</strong> ${data.sharpness?.sharpness_value?.toFixed(4) || "N/A"} 
-                (${data.sharpness?.is_correct_sharpness ? "Válida" : "No válida"})</p>
-
-                <p><strong>Exposición (Sobreexpuesta):</strong> 
-                ${data.exposure?.overexposed_percentage?.toFixed(2) || "N/A"}% 
-                (${data.exposure?.is_overexposed_correct ? "Válida" : "No válida"})</p>
-
-                <p><strong>Exposición (Subexpuesta):</strong> 
-                ${data.exposure?.underexposed_percentage?.toFixed(2) || "N/A"}% 
-                (${data.exposure?.is_underexposed_correct ? "Válida" : "No válida"})</p>
-
-                <p><strong>Exposición General:</strong> 
-                ${data.exposure?.is_correct_exposure ? "Válida" : "No válida"}</p>
-
-                <p><strong>Reflejo Especular:</strong> 
-                ${data.specular_reflections?.specular_score?.toFixed(2) || "N/A"}% 
-                (${data.specular_reflections?.is_correct_specular_reflections ? "Válida" : "No válida"})</p>
-
-                <p><strong>Tiempo de Procesamiento:</strong> 
-                ${data.processing_time_seconds?.toFixed(4) || "N/A"} s 
-                (${data.processing_time_milliseconds?.toFixed(2) || "N/A"} ms)</p>
-
-                <p><strong>Ruta de la Imagen Guardada:</strong> 
-                ${data.saved_path || "N/A"}</p>
-                `;
-                arrowGallery.style.display = "block"; // Mostrar el texto "Resultados abajo"
-            } catch (error) {
-                console.error("Error durante el análisis:", error);
-                alert("Ocurrió un error al procesar la imagen.");
-            } finally {
-                spinnerContainer.style.display = "none"; // Ocultar el spinner
-                galleryAnalyzeButton.style.display = "block"; // Mostrar botón nuevamente
+            if (!response.ok) {
+                throw new Error(`Error en la respuesta del servidor: ${response.status}`);
             }
-        };
-        reader.readAsDataURL(file);
+
+            const data = await response.json();
+
+            // Mostrar resultados
+            resultadoContainer.innerHTML = `
+            <h3><b>Información del Dispositivo:</b></h3>
+            <p><strong>User-Agent:</strong> ${data.client_info?.user_agent || "N/A"}</p>
+            <p><strong>Platform:</strong> ${data.client_info?.platform || "N/A"}</p>
+            <p><strong>Screen Width:</strong> ${data.client_info?.screen_width || "N/A"}</p>
+            <p><strong>Screen Height:</strong> ${data.client_info?.screen_height || "N/A"}</p>
+            <p><strong>Pixel Ratio:</strong> ${data.client_info?.pixel_ratio || "N/A"}</p>
+            <p><strong>Color Depth:</strong> ${data.client_info?.color_depth || "N/A"}</p>
+            <p><strong>Touch Points:</strong> ${data.client_info?.touch_points || "N/A"}</p>
+            <p><strong>CPU Cores:</strong> ${data.client_info?.cpu_cores || "N/A"}</p>
+
+            <h3><b>Metadata:</b></h3>
+            <p><strong>MetaData:</strong> <pre>${JSON.stringify(data.metadata || {}, null, 2)}</pre></p>
+            <h3><b>Resultados del Análisis:</b></h3>
+            <p><strong>ID Imagen:</strong> ${data.image_id || "N/A"}</p>
+            <p><strong>Dimensiones Originales:</strong> 
+            ${data.original_dimensions?.width || "N/A"}x${data.original_dimensions?.height || "N/A"}</p>
+            <p><strong>Dimensiones Redimensionadas:</strong> 
+            ${data.resized_dimensions?.width || "N/A"}x${data.resized_dimensions?.height || "N/A"}</p>
+
+            <p><strong>Nitidez:</strong> ${data.sharpness?.sharpness_value?.toFixed(4) || "N/A"} 
+            (${data.sharpness?.is_correct_sharpness ? "Válida" : "No válida"})</p>
+
+            <p><strong>Exposición (Sobreexpuesta):</strong> 
+            ${data.exposure?.overexposed_percentage?.toFixed(2) || "N/A"}% 
+            (${data.exposure?.is_overexposed_correct ? "Válida" : "No válida"})</p>
+
+            <p><strong>Exposición (Subexpuesta):</strong> 
+            ${data.exposure?.underexposed_percentage?.toFixed(2) || "N/A"}% 
+            (${data.exposure?.is_underexposed_correct ? "Válida" : "No válida"})</p>
+
+            <p><strong>Exposición General:</strong> 
+            ${data.exposure?.is_correct_exposure ? "Válida" : "No válida"}</p>
+
+            <p><strong>Reflejo Especular:</strong> 
+            ${data.specular_reflections?.specular_score?.toFixed(2) || "N/A"}% 
+            (${data.specular_reflections?.is_correct_specular_reflections ? "Válida" : "No válida"})</p>
+
+            <p><strong>Tiempo de Procesamiento:</strong> 
+            ${data.processing_time_seconds?.toFixed(4) || "N/A"} s 
+            (${data.processing_time_milliseconds?.toFixed(2) || "N/A"} ms)</p>
+
+            <p><strong>Ruta de la Imagen Guardada:</strong> 
+            ${data.saved_path || "N/A"}</p>
+            `;
+            arrowGallery.style.display = "block"; // Mostrar el texto "Resultados abajo"
+        } catch (error) {
+            console.error("Error durante el análisis:", error);
+            alert("Ocurrió un error al procesar la imagen.");
+        } finally {
+            spinnerContainer.style.display = "none"; // Ocultar el spinner
+            galleryAnalyzeButton.style.display = "block"; // Mostrar botón nuevamente
+        }
     });
 
     // Borrar la imagen y los resultados
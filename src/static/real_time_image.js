@@ -10,6 +10,8 @@ let deviceInfo = {
     colorDepth: window.screen.colorDepth,
     touchPoints: navigator.maxTouchPoints,
     cpuCores: navigator.hardwareConcurrency,
+    // Identificador de la sesión para que el servidor reutilice el análisis de fotogramas casi idénticos
+    sessionId: `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`,
 };
 
 // Función para inicializar la cámara
@@ -41,6 +43,9 @@ async function initCamera() {
         await new Promise((resolve) => {
             video.onloadedmetadata = () => {
                 console.log(`Resolución del video: ${video.videoWidth}x${video.videoHeight}`);
+                // Resolución original de la captura, para que el servidor estime el ancho de banda ahorrado
+                deviceInfo.captureWidth = video.videoWidth;
+                deviceInfo.captureHeight = video.videoHeight;
                 resolve();
             };
         });
@@ -55,7 +60,6 @@ async function initCamera() {
 async function captureImage() {
     const video = document.getElementById("video");
     const canvas = document.getElementById("canvas");
-    const context = canvas.getContext("2d");
     const spinnerContainer = document.getElementById("spinner-container");
     const clearButton = document.getElementById("clearButton");
     const arrow = document.getElementById("arrow");
@@ -66,19 +70,14 @@ async function captureImage() {
     }
 
     if (video.readyState === video.HAVE_ENOUGH_DATA) {
-        canvas.width = video.videoWidth;
-        canvas.height = video.videoHeight;
-
-        // Dibujar la imagen en el canvas
-        context.drawImage(video, 0, 0, canvas.width, canvas.height);
-
-        // Convertir la imagen a formato Base64
-        const imageBase64 = canvas.toDataURL("image/jpeg", 1).split(",")[1];
+        // Reducir el fotograma a la resolución objetivo del servidor y convertirlo a un Blob JPEG binario
+        const imageBlob = await encodeForUpload(video, video.videoWidth, video.videoHeight, canvas);
 
         // Mostrar la imagen capturada dentro del contenedor #resultado
         const resultadoDiv = document.getElementById("resultado");
         const img = document.createElement("img");
-        img.src = canvas.toDataURL("image/jpeg", 1.0);
+        img.src = URL.createObjectURL(imageBlob);
+        img.onload = () => URL.revokeObjectURL(img.src);
         img.style.width = "200px"; // Ajustar el tamaño para mostrar como miniatura
         img.style.margin = "10px auto";
         img.style.display = "block"; // Centrar la imagen
@@ -95,18 +94,11 @@ async function captureImage() {
 
             const response = await fetch("/analyze_image_real_time", {
                 method: "POST",
-                headers: { "Content-Type": "application/json" },
-                body: JSON.stringify({
-                    image: imageBase64,
-                    userAgent: deviceInfo.userAgent,
-                    platform: deviceInfo.platform,
-                    screenWidth: deviceInfo.screenWidth,
-                    screenHeight: deviceInfo.screenHeight,
-                    pixelRatio: deviceInfo.pixelRatio,
-                    colorDepth: deviceInfo.colorDepth,
-                    touchPoints: deviceInfo.touchPoints,
-                    cpuCores: deviceInfo.cpuCores,
-                })
+                headers: {
+                    "Content-Type": "image/jpeg",
+                    "X-Client-Info": JSON.stringify(deviceInfo),
+                },
+                body: imageBlob
             });
 
             if (!response.ok) {
@@ -116,49 +108,7 @@ async function captureImage() {
             const data = await response.json();
 
             // Mostrar los resultados dentro de #resultado
-            resultadoDiv.innerHTML += `
-            <h3><b>Información del Dispositivo:</b></h3>
-            <p><strong>User-Agent:</strong> ${data.client_info?.user_agent || "N/A"}</p>
-            <p><strong>Platform:</strong> ${data.client_info?.platform || "N/A"}</p>
-            <p><strong>Screen Width:</strong> ${data.client_info?.screen_width || "N/A"}</p>
-            <p><strong>Screen Height:</strong> ${data.client_info?.screen_height || "N/A"}</p>
-            <p><strong>Pixel Ratio:</strong> ${data.client_info?.pixel_ratio || "N/A"}</p>
-            <p><strong>Color Depth:</strong> ${data.client_info?.color_depth || "N/A"}</p>
-            <p><strong>Touch Points:</strong> ${data.client_info?.touch_points || "N/A"}</p>
-            <p><strong>CPU Cores:</strong> ${data.client_info?.cpu_cores || "N/A"}</p>
-
-            <h3><b>Resultados del Análisis:</b></h3>
-            <p><strong>ID Imagen:</strong> ${data.image_id || "N/A"}</p>
-            <p><strong>Dimensiones Originales:</strong> 
-            ${data.original_dimensions?.width || "N/A"}x${data.original_dimensions?.height || "N/A"}</p>
-            <p><strong>Dimensiones Redimensionadas:</strong> 
-            ${data.resized_dimensions?.width || "N/A"}x${data.resized_dimensions?.height || "N/A"}</p>
-
-            <p><strong>Nitidez:</strong> ${data.sharpness?.sharpness_value?.toFixed(4) || "N/A"} 
-            (${data.sharpness?.is_correct_sharpness ? "Válida" : "No válida"})</p>
-
-            <p><strong>Exposición (Sobreexpuesta):</strong> 
-            ${data.exposure?.overexposed_percentage?.toFixed(2) || "N/A"}% 
-            (${data.exposure?.is_overexposed_correct ? "Válida" : "No válida"})</p>
-
-            <p><strong>Exposición (Subexpuesta):</strong> 
-            ${data.exposure?.underexposed_percentage?.toFixed(2) || "N/A"}% 
-            (${data.exposure?.is_underexposed_correct ? "Válida" : "No válida"})</p>
-
-            <p><strong>Exposición General:</strong> 
-            ${data.exposure?.is_correct_exposure ? "Válida" : "No válida"}</p>
-
-            <p><strong>Reflejo Especular:</strong> 
-            ${data.specular_reflections?.specular_score?.toFixed(2) || "N/A"}% 
-            (${data.specular_reflections?.is_correct_specular_reflections ? "Válida" : "No válida"})</p>
-
-            <p><strong>Tiempo de Procesamiento:</strong> 
-            ${data.processing_time_seconds?.toFixed(4) || "N/A"} s 
-            (${data.processing_time_milliseconds?.toFixed(2) || "N/A"} ms)</p>
-
-            <p><strong>Ruta de la Imagen Guardada:</strong> 
-            ${data.saved_path || "N/A"}</p>
-            `;
+            resultadoDiv.innerHTML += renderResults(data);
         } catch (error) {
             console.error("Error al enviar la imagen:", error);
             alert("Ocurrió un error al procesar la imagen.");
@@ -175,6 +125,59 @@ async function captureImage() {
     }
 }
 
+// Texto de validez de una métrica; las omitidas por la evaluación en cascada se muestran como no evaluadas
+function validity(metric, key) {
+    if (metric?.evaluated === false) return "No evaluada";
+    return metric?.[key] ? "Válida" : "No válida";
+}
+
+// Genera el HTML con la información del dispositivo y los resultados del análisis
+function renderResults(data) {
+    return `
+    <h3><b>Información del Dispositivo:</b></h3>
+    <p><strong>User-Agent:</strong> ${data.client_info?.user_agent || "N/A"}</p>
+    <p><strong>Platform:</strong> ${data.client_info?.platform || "N/A"}</p>
+    <p><strong>Screen Width:</strong> ${data.client_info?.screen_width || "N/A"}</p>
+    <p><strong>Screen Height:</strong> ${data.client_info?.screen_height || "N/A"}</p>
+    <p><strong>Pixel Ratio:</strong> ${data.client_info?.pixel_ratio || "N/A"}</p>
+    <p><strong>Color Depth:</strong> ${data.client_info?.color_depth || "N/A"}</p>
+    <p><strong>Touch Points:</strong> ${data.client_info?.touch_points || "N/A"}</p>
+    <p><strong>CPU Cores:</strong> ${data.client_info?.cpu_cores || "N/A"}</p>
+
+    <h3><b>Resultados del Análisis:</b></h3>
+    <p><strong>ID Imagen:</strong> ${data.image_id || "N/A"}</p>
+    <p><strong>Dimensiones Originales:</strong> 
+    ${data.original_dimensions?.width || "N/A"}x${data.original_dimensions?.height || "N/A"}</p>
+    <p><strong>Dimensiones Redimensionadas:</strong> 
+    ${data.resized_dimensions?.width || "N/A"}x${data.resized_dimensions?.height || "N/A"}</p>
+
+    <p><strong>Nitidez:</strong> ${data.sharpness?.sharpness_value?.toFixed(4) || "N/A"} 
+    (${validity(data.sharpness, "is_correct_sharpness")})</p>
+
+    <p><strong>Exposición (Sobreexpuesta):</strong> 
+    ${data.exposure?.overexposed_percentage?.toFixed(2) || "N/A"}% 
+    (${validity(data.exposure, "is_overexposed_correct")})</p>
+
+    <p><strong>Exposición (Subexpuesta):</strong> 
+    ${data.exposure?.underexposed_percentage?.toFixed(2) || "N/A"}% 
+    (${validity(data.exposure, "is_underexposed_correct")})</p>
+
+    <p><strong>Exposición General:</strong> 
+    ${validity(data.exposure, "is_correct_exposure")}</p>
+
+    <p><strong>Reflejo Especular:</strong> 
+    ${data.specular_reflections?.specular_score?.toFixed(2) || "N/A"}% 
+    (${validity(data.specular_reflections, "is_correct_specular_reflections")})</p>
+
+    <p><strong>Tiempo de Procesamiento:</strong> 
+    ${data.processing_time_seconds?.toFixed(4) || "N/A"} s 
+    (${data.processing_time_milliseconds?.toFixed(2) || "N/A"} ms)</p>
+
+    <p><strong>Ruta de la Imagen Guardada:</strong> 
+    ${data.saved_path || "N/A"}</p>
+    `;
+}
+
 // Función para limpiar resultados previos
 function clearPreviousResults() {
     const resultadoDiv = document.getElementById("resultado");
@@ -199,8 +202,76 @@ document.addEventListener("DOMContentLoaded", () => {
     });
 });
 
+// Sesión persistente de análisis en directo (WebSocket)
+const LIVE_FRAME_INTERVAL_MS = 250; // Intervalo entre fotogramas enviados
+const LIVE_MAX_BUFFERED_BYTES = 1024 * 1024; // No se envía si la conexión aún tiene datos pendientes
+let liveSocket = null;
+let liveTimer = null;
+
+// Abre la sesión, envía la información del dispositivo y empieza a enviar fotogramas
+function startLive() {
+    const protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
+    const socket = new WebSocket(`${protocol}//${window.location.host}/stream_real_time`);
+    const resultadoDiv = document.getElementById("resultado");
+    const liveButton = document.getElementById("live");
+
+    socket.binaryType = "arraybuffer";
+    socket.onopen = () => {
+        socket.send(JSON.stringify({ type: "client_info", ...deviceInfo }));
+        liveTimer = setInterval(sendLiveFrame, LIVE_FRAME_INTERVAL_MS);
+        liveButton.textContent = "Detener Directo";
+    };
+    socket.onmessage = (event) => {
+        // Solo se muestra el resultado más reciente
+        const data = JSON.parse(event.data);
+        resultadoDiv.innerHTML = renderResults(data) + `
+            <p><strong>Resultado reutilizado:</strong> ${data.reused ? "Sí" : "No"}</p>
+            <p><strong>Fotogramas:</strong> ${data.stream?.frames_analyzed ?? 0} analizados,
+            ${data.stream?.frames_dropped ?? 0} descartados de ${data.stream?.frames_received ?? 0}</p>
+        `;
+    };
+    socket.onerror = (error) => console.error("Error en la sesión en directo:", error);
+    socket.onclose = () => stopLive();
+    liveSocket = socket;
+}
+
+// Captura el fotograma actual y lo envía en binario si la conexión no está saturada
+function sendLiveFrame() {
+    const video = document.getElementById("video");
+    const canvas = document.getElementById("canvas");
+    if (!liveSocket || liveSocket.readyState !== WebSocket.OPEN) return;
+    if (liveSocket.bufferedAmount > LIVE_MAX_BUFFERED_BYTES) return;
+    if (video.readyState !== video.HAVE_ENOUGH_DATA) return;
+
+    encodeForUpload(video, video.videoWidth, video.videoHeight, canvas).then((blob) => {
+        if (blob && liveSocket && liveSocket.readyState === WebSocket.OPEN) {
+            liveSocket.send(blob);
+        }
+    });
+}
+
+// Cierra la sesión en directo
+function stopLive() {
+    clearInterval(liveTimer);
+    liveTimer = null;
+    if (liveSocket && liveSocket.readyState <= WebSocket.OPEN) {
+        liveSocket.close();
+    }
+    liveSocket = null;
+    document.getElementById("live").textContent = "Análisis en Directo";
+}
+
+function toggleLive() {
+    if (liveSocket) {
+        stopLive();
+    } else {
+        startLive();
+    }
+}
+
 // Función para detener la cámara
 function stopCamera() {
+    stopLive();
     if (window.stream) {
         window.stream.getTracks().forEach(track => track.stop());
         window.stream = null;
@@ -211,4 +282,7 @@ function stopCamera() {
 window.addEventListener("load", initCamera);
 
 // Agregar el evento de captura de imagen al botón
-document.getElementById("capture").addEventListener("click", captureImage);
\ No newline at end of file
+document.getElementById("capture").addEventListener("click", captureImage);
+
+// Activar o detener el análisis en directo
+document.getElementById("live").addEventListener("click", toggleLive);